@@ -1,6 +1,19 @@
+import os
+
 from flask import Flask
 from flask_bcrypt import Bcrypt
 from config.db_config import init_db
+from config.sql_profiler import SQLProfiler
+from config.migrations import db_cli
+from modules.common.stock_summary import stock_summary_cli
+from modules.common.message_counters import messages_cli
+from modules.common.search_index import SearchService
+from modules.common.backfill import BackfillRunner, backfill_cli
+from modules.common.name_sync import NameSync
+from modules.common.exports import EXPORT_FORMATS
+from modules.common.catalog_cache import CatalogCache
+from modules.common.notifications import NotificationDispatcher
+from modules.common.pubsub import PubSub
 
 # Import routes from admin, distributor, category, and product modules
 from modules.admin import routes as admin_routes
@@ -9,6 +22,10 @@ from modules.admin import category_routes as category_mgmt_routes
 from modules.admin import product_routes as product_mgmt_routes
 from modules.admin import stock_routes as stock_mgmt_routes
 from modules.admin import orderad_routes as orderad_mgmt_routes
+from modules.admin import perf_routes as perf_mgmt_routes
+from modules.admin import search_routes as search_mgmt_routes
+from modules.admin import backfill_routes as backfill_mgmt_routes
+from modules.admin import message_routes as message_mgmt_routes
 
 from modules.distributor import routes as distributor_routes
 from modules.distributor import order_routes as distributor_order_routes
@@ -28,6 +45,57 @@ mysql = init_db(app)
 if mysql is None:
     raise RuntimeError("MySQL connection is not initialized.")
 
+# Per-request SQL profiling (Server-Timing header + /admin/_perf)
+app.config['SQL_PROFILER_EXPLAIN'] = os.environ.get('SQL_PROFILER_EXPLAIN', '0') == '1'
+app.config['SQL_PROFILER_EXPLAIN_MS'] = float(os.environ.get('SQL_PROFILER_EXPLAIN_MS', 50))
+profiler = SQLProfiler(app, mysql)
+
+# Schema migrations: flask db upgrade / status / check-queries
+app.cli.add_command(db_cli)
+app.cli.add_command(stock_summary_cli)
+app.cli.add_command(messages_cli)
+
+# In-process search index (built in the background on startup, then caught
+# up from search_changes)
+app.config['SEARCH_INDEX_MAX_AGE'] = float(os.environ.get('SEARCH_INDEX_MAX_AGE', 300))
+app.config['SEARCH_INDEX_CHECK_SECONDS'] = float(os.environ.get('SEARCH_INDEX_CHECK_SECONDS', 2))
+app.config['SEARCH_INDEX_BUILD_ON_STARTUP'] = os.environ.get('SEARCH_INDEX_BUILD_ON_STARTUP', '1') == '1'
+search_index = SearchService(app, mysql)
+
+# Chunked background data fixes: /admin/backfill, flask backfill run / resume
+app.config['BACKFILL_CHUNK_SIZE'] = int(os.environ.get('BACKFILL_CHUNK_SIZE', 1000))
+app.config['BACKFILL_PAUSE_MS'] = float(os.environ.get('BACKFILL_PAUSE_MS', 50))
+app.config['BACKFILL_MAX_LOCK_WAITS'] = int(os.environ.get('BACKFILL_MAX_LOCK_WAITS', 0))
+app.config['BACKFILL_MAX_REPLICA_LAG'] = float(os.environ.get('BACKFILL_MAX_REPLICA_LAG', 5))
+backfill = BackfillRunner(app, mysql)
+app.cli.add_command(backfill_cli)
+
+# Product / category renames copied onto denormalized name columns
+app.config['NAME_SYNC_BATCH'] = int(os.environ.get('NAME_SYNC_BATCH', 500))
+app.config['NAME_SYNC_WORKER'] = os.environ.get('NAME_SYNC_WORKER', '1') == '1'
+name_sync = NameSync(app, mysql)
+
+# Categories / products / product defaults for forms, shared per process
+app.config['CATALOG_CACHE_MAX_ENTRIES'] = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 2000))
+app.config['CATALOG_CACHE_TTL'] = float(os.environ.get('CATALOG_CACHE_TTL', 300))
+app.config['CATALOG_CACHE_CHECK_SECONDS'] = float(os.environ.get('CATALOG_CACHE_CHECK_SECONDS', 2))
+catalog = CatalogCache(app, mysql)
+
+# In-process pub/sub: unread message counts pushed over Server-Sent Events
+app.config['UNREAD_SSE_MAX_STREAMS'] = int(os.environ.get('UNREAD_SSE_MAX_STREAMS', 200))
+app.config['UNREAD_SSE_KEEPALIVE'] = float(os.environ.get('UNREAD_SSE_KEEPALIVE', 15))
+app.config['UNREAD_SSE_RECHECK'] = float(os.environ.get('UNREAD_SSE_RECHECK', 120))
+app.config['UNREAD_SSE_LIFETIME'] = float(os.environ.get('UNREAD_SSE_LIFETIME', 600))
+pubsub = PubSub(app)
+
+# Distributor notifications: queued with the order change, delivered in batches
+app.config['NOTIFY_BATCH'] = int(os.environ.get('NOTIFY_BATCH', 200))
+app.config['NOTIFY_WORKER'] = os.environ.get('NOTIFY_WORKER', '1') == '1'
+notifications = NotificationDispatcher(app, mysql, pubsub)
+
+# Export buttons offer XLSX only when openpyxl is installed
+app.jinja_env.globals['export_formats'] = EXPORT_FORMATS
+
 # ── Inject bcrypt and mysql into routes ──────────────────────────────────────
 
 admin_routes.bcrypt = bcrypt
@@ -38,33 +106,61 @@ distributor_routes.mysql = mysql
 
 distributor_mgmt_routes.bcrypt = bcrypt
 distributor_mgmt_routes.mysql = mysql
+distributor_mgmt_routes.search_index = search_index
 
 category_mgmt_routes.bcrypt = bcrypt
 category_mgmt_routes.mysql = mysql
+category_mgmt_routes.name_sync = name_sync
+category_mgmt_routes.catalog = catalog
 
 product_mgmt_routes.bcrypt = bcrypt
 product_mgmt_routes.mysql = mysql
+product_mgmt_routes.search_index = search_index
+product_mgmt_routes.name_sync = name_sync
+product_mgmt_routes.catalog = catalog
 
 stock_mgmt_routes.bcrypt = bcrypt
 stock_mgmt_routes.mysql = mysql
+stock_mgmt_routes.search_index = search_index
+stock_mgmt_routes.backfill = backfill
+stock_mgmt_routes.catalog = catalog
 
 orderad_mgmt_routes.bcrypt = bcrypt
 orderad_mgmt_routes.mysql = mysql
+orderad_mgmt_routes.notifications = notifications
+
+perf_mgmt_routes.mysql = mysql
+perf_mgmt_routes.profiler = profiler
+perf_mgmt_routes.catalog = catalog
+
+search_mgmt_routes.mysql = mysql
+search_mgmt_routes.search_index = search_index
+
+backfill_mgmt_routes.mysql = mysql
+backfill_mgmt_routes.backfill = backfill
+
+message_mgmt_routes.mysql = mysql
+message_mgmt_routes.notifications = notifications
 
 distributor_order_routes.bcrypt = bcrypt
 distributor_order_routes.mysql = mysql
+distributor_order_routes.catalog = catalog
+distributor_order_routes.pubsub = pubsub
 
 distributor_stock_routes.bcrypt = bcrypt
 distributor_stock_routes.mysql = mysql
 
 distributor_profile_routes.bcrypt = bcrypt
 distributor_profile_routes.mysql = mysql
+distributor_profile_routes.search_index = search_index
 
 distributor_return_stock_routes.bcrypt = bcrypt   # ✅ Return Stock
 distributor_return_stock_routes.mysql = mysql     # ✅ Return Stock
 
 distributor_sell_routes.bcrypt = bcrypt
 distributor_sell_routes.mysql  = mysql
+distributor_sell_routes.search_index = search_index
+distributor_sell_routes.catalog = catalog
 
 # ── Register Blueprints ───────────────────────────────────────────────────────
 
@@ -74,6 +170,10 @@ app.register_blueprint(category_mgmt_routes.category_mgmt_bp,      url_prefix='/
 app.register_blueprint(product_mgmt_routes.product_mgmt_bp,         url_prefix='/admin')
 app.register_blueprint(stock_mgmt_routes.stock_mgmt_bp,             url_prefix='/admin')
 app.register_blueprint(orderad_mgmt_routes.orderad_mgmt_bp,         url_prefix='/admin')
+app.register_blueprint(perf_mgmt_routes.perf_mgmt_bp,               url_prefix='/admin')
+app.register_blueprint(search_mgmt_routes.search_mgmt_bp,           url_prefix='/admin')
+app.register_blueprint(backfill_mgmt_routes.backfill_mgmt_bp,       url_prefix='/admin')
+app.register_blueprint(message_mgmt_routes.message_mgmt_bp,         url_prefix='/admin')
 
 app.register_blueprint(distributor_routes.distributor_bp,             url_prefix='/distributor')
 app.register_blueprint(distributor_order_routes.distributor_order_bp, url_prefix='/distributor')
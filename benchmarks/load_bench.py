@@ -0,0 +1,299 @@
+"""
+Endpoint load benchmark
+Drives the real Flask routes (in-process test client, or a running server
+with --base-url) and reports per endpoint: p50/p95/p99 latency, throughput,
+queries per request (from the SQL profiler's Server-Timing header) and
+peak RSS, as JSON. Against a running server, peak RSS is only reported
+for the server process given with --server-pid (Linux /proc); otherwise
+it is null.
+
+    python -m benchmarks.load_bench --requests 200 --concurrency 4 -o before.json
+    python -m benchmarks.load_bench --requests 200 --compare before.json -o after.json
+
+Seed data first with `python -m benchmarks.seed_data`.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_ENDPOINTS = [
+    ('admin', '/admin/manage_stock'),
+    ('admin', '/admin/stock_summary'),
+    ('admin', '/admin/manage_adorders'),
+    ('distributor', '/distributor/manage_sales'),
+    ('distributor', '/distributor/my_stock'),
+    ('distributor', '/distributor/unread_count'),
+]
+
+_QUERIES_RE = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+# ==========================================
+# MEASUREMENT HELPERS
+# ==========================================
+def current_rss_kb(pid='self'):
+    """Resident set size of this (or another) process in KB (None if unavailable)."""
+    try:
+        with open(f'/proc/{pid}/statm') as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        if resource is None or pid != 'self':
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class RssSampler:
+    """
+    Samples a process's RSS in a background thread and keeps the peak.
+    pid=None samples nothing (peak_kb stays None).
+    """
+
+    def __init__(self, pid='self', interval=0.01):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = current_rss_kb(pid) if pid is not None else None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        if self.pid is None:
+            return
+        while not self._stop.is_set():
+            rss = current_rss_kb(self.pid)
+            if rss is not None and (self.peak_kb is None or rss > self.peak_kb):
+                self.peak_kb = rss
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _round(value):
+    """Round a millisecond figure for the report; None (no samples) stays None."""
+    return round(value, 2) if value is not None else None
+
+
+def parse_server_timing(header_values):
+    """(queries, db_ms) from the profiler's Server-Timing entry."""
+    for value in header_values:
+        match = _QUERIES_RE.search(value)
+        if match:
+            return int(match.group(2)), float(match.group(1))
+    return None, None
+
+
+# ==========================================
+# CLIENTS
+# ==========================================
+class TestClientDriver:
+    """Runs requests in-process through app.test_client()."""
+
+    def __init__(self, admin_id, distributor_id):
+        from app import app
+        self.app = app
+        # The app runs in this process
+        self.rss_pid = 'self'
+        self.sessions = {
+            'admin': {'user_id': admin_id, 'username': 'bench_admin', 'admin_id': admin_id},
+            'distributor': {'distributor_id': distributor_id, 'distributor_name': 'Bench Distributor'},
+        }
+        self._local = threading.local()
+
+    def _client(self, role):
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        if role not in clients:
+            client = self.app.test_client()
+            with client.session_transaction() as sess:
+                sess.update(self.sessions[role])
+            clients[role] = client
+        return clients[role]
+
+    def get(self, role, path):
+        response = self._client(role).get(path)
+        response.get_data()  # consume streamed bodies
+        return response.status_code, response.headers.get_all('Server-Timing')
+
+
+class HttpDriver:
+    """Runs requests against a live server, with a signed session cookie."""
+
+    def __init__(self, base_url, admin_id, distributor_id, server_pid=None):
+        from app import app
+        # The client's own memory says nothing about the server: sample its PID or nothing
+        self.rss_pid = server_pid
+        serializer = app.session_interface.get_signing_serializer(app)
+        self.base_url = base_url.rstrip('/')
+        self.cookie_name = app.config['SESSION_COOKIE_NAME']
+        self.cookies = {
+            'admin': serializer.dumps({'user_id': admin_id, 'username': 'bench_admin',
+                                       'admin_id': admin_id}),
+            'distributor': serializer.dumps({'distributor_id': distributor_id,
+                                             'distributor_name': 'Bench Distributor'}),
+        }
+
+    def get(self, role, path):
+        req = urllib.request.Request(self.base_url + path,
+                                     headers={'Cookie': f"{self.cookie_name}={self.cookies[role]}"})
+        try:
+            with urllib.request.urlopen(req) as resp:
+                resp.read()
+                return resp.status, resp.headers.get_all('Server-Timing') or []
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.headers.get_all('Server-Timing') or []
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+def bench_endpoint(driver, role, path, requests, concurrency, warmup):
+    for _ in range(warmup):
+        driver.get(role, path)
+
+    latencies, queries, db_times, errors = [], [], [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        started = time.perf_counter()
+        status, timing = driver.get(role, path)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        n_queries, db_ms = parse_server_timing(timing)
+        with lock:
+            latencies.append(elapsed_ms)
+            if n_queries is not None:
+                queries.append(n_queries)
+                db_times.append(db_ms)
+            if status >= 400:
+                errors += 1
+
+    with RssSampler(driver.rss_pid) as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'endpoint': path,
+        'role': role,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'p50_ms': _round(percentile(latencies, 50)),
+        'p95_ms': _round(percentile(latencies, 95)),
+        'p99_ms': _round(percentile(latencies, 99)),
+        'max_ms': _round(latencies[-1] if latencies else None),
+        'throughput_rps': round(requests / wall, 2) if wall else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'db_ms_per_request': round(sum(db_times) / len(db_times), 2) if db_times else None,
+        'peak_rss_kb': sampler.peak_kb,
+    }
+
+
+def compare(previous, current):
+    """Print p95 / queries deltas against an earlier run."""
+    before = {row['endpoint']: row for row in previous.get('results', [])}
+    print(f"{'endpoint':<32} {'p95 before':>11} {'p95 after':>10} {'change':>8} {'q/req':>12}",
+          file=sys.stderr)
+    for row in current['results']:
+        old = before.get(row['endpoint'])
+        if not old or old['p95_ms'] is None or row['p95_ms'] is None:
+            continue
+        change = ((row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100) if old['p95_ms'] else 0
+        print(f"{row['endpoint']:<32} {old['p95_ms']:>11.1f} {row['p95_ms']:>10.1f} {change:>+7.1f}% "
+              f"{str(old['queries_per_request']):>5} -> {str(row['queries_per_request']):<5}",
+              file=sys.stderr)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100, help='Measured requests per endpoint.')
+    parser.add_argument('--concurrency', type=int, default=1, help='Parallel client threads.')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per endpoint.')
+    parser.add_argument('--base-url', help='Benchmark a running server instead of the test client.')
+    parser.add_argument('--server-pid', type=int,
+                        help='With --base-url: server process whose peak RSS is reported.')
+    parser.add_argument('--admin-id', type=int, default=1)
+    parser.add_argument('--distributor-id', type=int, default=1)
+    parser.add_argument('--endpoint', action='append', metavar='ROLE:PATH',
+                        help='Override the endpoint list, e.g. admin:/admin/manage_stock')
+    parser.add_argument('-o', '--output', help='Write JSON results here (default stdout).')
+    parser.add_argument('--compare', help='Earlier JSON result to diff against.')
+    args = parser.parse_args(argv)
+
+    endpoints = DEFAULT_ENDPOINTS
+    if args.endpoint:
+        endpoints = [tuple(item.split(':', 1)) for item in args.endpoint]
+
+    if args.base_url:
+        driver = HttpDriver(args.base_url, args.admin_id, args.distributor_id, args.server_pid)
+    else:
+        driver = TestClientDriver(args.admin_id, args.distributor_id)
+
+    results = []
+    for role, path in endpoints:
+        print(f"  {path} ...", file=sys.stderr)
+        results.append(bench_endpoint(driver, role, path, args.requests, args.concurrency, args.warmup))
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': _git_revision(),
+        'mode': 'http' if args.base_url else 'test_client',
+        'results': results,
+    }
+    if not args.base_url:
+        report['pool'] = driver.app.extensions['mysql_pool'].stats()
+
+    payload = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(payload + '\n')
+    else:
+        print(payload)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(json.load(fh), report)
+
+
+if __name__ == '__main__':
+    main()
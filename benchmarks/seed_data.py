@@ -0,0 +1,281 @@
+"""
+Scale data seeder for the endpoint benchmarks
+Fills a local MySQL (schema from `flask db upgrade`) with production-sized
+data: thousands of distributors/products, 100k stock rows and millions of
+sales, orders/order_items and messages.
+
+    python -m benchmarks.seed_data --scale 1.0
+    python -m benchmarks.seed_data --scale 0.05 --truncate   # quick smoke run
+
+Connection settings come from the same MYSQL_* environment variables as
+the app. Never point this at a production database.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import bcrypt
+from flask import Flask
+
+from config.db_config import init_db
+from modules.common.message_counters import rebuild_threads, reconcile_unread
+from modules.common.stock_summary import rebuild_stock_summary
+
+# Row counts at --scale 1.0
+BASE_COUNTS = {
+    'categories': 60,
+    'products': 4000,
+    'distributors': 3000,
+    'stock': 100_000,
+    'orders': 1_000_000,
+    'sales': 2_000_000,
+    'messages': 1_000_000,
+    'returns': 100_000,
+}
+
+CHUNK = 5000
+
+VARIANTS = ['250g', '500g', '1kg', '2kg', '5kg', '100ml', '250ml', '500ml', '1L', 'Standard']
+DISTRICTS = ['Colombo', 'Gampaha', 'Kandy', 'Galle', 'Matara', 'Kurunegala', 'Jaffna',
+             'Anuradhapura', 'Badulla', 'Ratnapura', 'Trincomalee', 'Batticaloa']
+PROVINCES = ['Western', 'Central', 'Southern', 'Northern', 'Eastern',
+             'North Western', 'North Central', 'Uva', 'Sabaragamuwa']
+ORDER_STATUSES = ['pending'] * 3 + ['accepted'] * 5 + ['rejected', 'cancelled']
+SALE_STATUSES = ['completed'] * 8 + ['pending', 'cancelled']
+WORDS = ['Golden', 'Honey', 'Bee', 'Pure', 'Wild', 'Forest', 'Organic', 'Royal',
+         'Jelly', 'Comb', 'Nectar', 'Pollen', 'Propolis', 'Wax', 'Blossom', 'Amber']
+
+# Every seeded distributor shares this password; hashed once with low rounds
+BENCH_PASSWORD = b'benchmark'
+
+
+def _name(rng, n=2):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def _date(rng, days_back=730):
+    return datetime.now() - timedelta(seconds=rng.randint(0, days_back * 86400))
+
+
+def _insert_chunks(conn, sql, rows, label):
+    """executemany in CHUNK-sized transactions; ``rows`` may be a generator."""
+    cur = conn.cursor()
+    total, batch = 0, []
+    started = time.time()
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            cur.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+            batch = []
+            print(f"\r  {label}: {total:,}", end='', file=sys.stderr)
+    if batch:
+        cur.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    cur.close()
+    print(f"\r  {label}: {total:,} rows in {time.time() - started:.1f}s", file=sys.stderr)
+    return total
+
+
+def _max_id(conn, table, column):
+    cur = conn.cursor()
+    cur.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    value = cur.fetchone()[0]
+    cur.close()
+    return value
+
+
+def truncate(conn):
+    cur = conn.cursor()
+    cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in ('messages', 'order_items', 'orders', 'sales', 'stock_returns',
+                  'distributor_stock', 'stock', 'products', 'category', 'distributor'):
+        cur.execute(f"TRUNCATE TABLE {table}")
+    cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+    conn.commit()
+    cur.close()
+
+
+def seed(conn, counts, rng):
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD, bcrypt.gensalt(rounds=4)).decode('utf-8')
+
+    # ── Catalog ──────────────────────────────────────────────────────────────
+    _insert_chunks(conn,
+        "INSERT INTO category (category_name, description) VALUES (%s, %s)",
+        ((f"{_name(rng)} {i}", 'Benchmark category') for i in range(counts['categories'])),
+        'category')
+    cat_lo = _max_id(conn, 'category', 'category_id') - counts['categories'] + 1
+    cat_hi = cat_lo + counts['categories'] - 1
+
+    categories = {}
+    cur = conn.cursor()
+    cur.execute("SELECT category_id, category_name FROM category WHERE category_id >= %s", (cat_lo,))
+    categories.update(cur.fetchall())
+    cur.close()
+
+    products = []
+
+    def product_rows():
+        for i in range(counts['products']):
+            category_id = rng.randint(cat_lo, cat_hi)
+            row = (f"{_name(rng, 3)} {i}", category_id, round(rng.uniform(100, 5000), 2),
+                   rng.choice(VARIANTS), rng.choice([90, 180, 365, 730]))
+            products.append(row)
+            yield row
+
+    _insert_chunks(conn,
+        """INSERT INTO products (product_name, category_id, unit_price, variant_size, shelf_life_days)
+           VALUES (%s, %s, %s, %s, %s)""",
+        product_rows(), 'products')
+    prod_lo = _max_id(conn, 'products', 'product_id') - counts['products'] + 1
+    product_ids = list(range(prod_lo, prod_lo + counts['products']))
+
+    def product(pid):
+        return products[pid - prod_lo]
+
+    _insert_chunks(conn,
+        """INSERT INTO distributor (distributor_name, district, province, owner_name,
+                                    contact_no, address, email, password)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+        ((f"{_name(rng)} Traders {i}", rng.choice(DISTRICTS), rng.choice(PROVINCES),
+          f"Owner {i}", f"07{rng.randint(10000000, 99999999)}", f"No. {i}, Main Street",
+          f"bench{i}_{rng.randint(0, 10**9)}@example.com", password_hash)
+         for i in range(counts['distributors'])),
+        'distributor')
+    dist_lo = _max_id(conn, 'distributor', 'distributor_id') - counts['distributors'] + 1
+    dist_hi = dist_lo + counts['distributors'] - 1
+
+    # ── Admin stock ─────────────────────────────────────────────────────────
+    def stock_rows():
+        for _ in range(counts['stock']):
+            pid = rng.choice(product_ids)
+            name, category_id, price, variant, shelf = product(pid)
+            yield (pid, name, category_id, categories.get(category_id), price, variant,
+                   shelf, rng.randint(0, 2000), _date(rng, 365))
+
+    _insert_chunks(conn,
+        """INSERT INTO stock (product_id, product_name, category_id, category_name, unit_price,
+                              variant_size, shelf_life_days, quantity, add_date)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        stock_rows(), 'stock')
+
+    # ── Orders + one line each (matches add_order) ──────────────────────────
+    order_lines = []
+
+    def order_rows():
+        for _ in range(counts['orders']):
+            pid = rng.choice(product_ids)
+            name, category_id, price, variant, _shelf = product(pid)
+            qty = rng.randint(1, 200)
+            status = rng.choice(ORDER_STATUSES)
+            order_lines.append((pid, category_id, name, categories.get(category_id),
+                                price, variant, qty, round(price * qty, 2), status))
+            yield (rng.randint(dist_lo, dist_hi), _date(rng), status, round(price * qty, 2))
+
+    _insert_chunks(conn,
+        "INSERT INTO orders (distributor_id, order_date, status, total_amount) VALUES (%s, %s, %s, %s)",
+        order_rows(), 'orders')
+    order_lo = _max_id(conn, 'orders', 'order_id') - counts['orders'] + 1
+
+    _insert_chunks(conn,
+        """INSERT INTO order_items (order_id, product_id, category_id, product_name, category_name,
+                                    unit_price, variant_size, quantity, subtotal, status)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        ((order_lo + i,) + line for i, line in enumerate(order_lines)),
+        'order_items')
+    order_lines.clear()
+
+    # ── Messages (mix of admin notes and distributor questions) ─────────────
+    def message_rows():
+        for _ in range(counts['messages']):
+            order_id = rng.randint(order_lo, order_lo + counts['orders'] - 1)
+            from_admin = rng.random() < 0.7
+            yield (order_id, rng.randint(dist_lo, dist_hi), 1 if from_admin else None,
+                   'Benchmark message ' + _name(rng, 4),
+                   'general' if from_admin else 'question', _date(rng),
+                   int(rng.random() < 0.8))
+
+    _insert_chunks(conn,
+        """INSERT INTO messages (order_id, distributor_id, admin_id, message, message_type,
+                                 created_at, is_read)
+           VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+        message_rows(), 'messages')
+
+    # ── Distributor stock: a handful of products per distributor ────────────
+    def distributor_stock_rows():
+        for distributor_id in range(dist_lo, dist_hi + 1):
+            for pid in rng.sample(product_ids, min(15, len(product_ids))):
+                name, category_id, price, variant, _shelf = product(pid)
+                yield (distributor_id, pid, name, category_id, categories.get(category_id),
+                       variant, rng.randint(0, 500), price, _date(rng, 90))
+
+    ds_count = _insert_chunks(conn,
+        """INSERT INTO distributor_stock (distributor_id, product_id, product_name, category_id,
+                                          category_name, variant_size, quantity,
+                                          unit_price, last_updated)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        distributor_stock_rows(), 'distributor_stock')
+    ds_hi = _max_id(conn, 'distributor_stock', 'stock_id')
+    ds_lo = ds_hi - ds_count + 1
+
+    # ── Sales ───────────────────────────────────────────────────────────────
+    def sale_rows():
+        for _ in range(counts['sales']):
+            pid = rng.choice(product_ids)
+            name, _cat, price, variant, _shelf = product(pid)
+            qty = rng.randint(1, 20)
+            yield (rng.randint(dist_lo, dist_hi), rng.randint(ds_lo, ds_hi), pid, name, variant,
+                   qty, price, round(price * qty, 2), f"Customer {rng.randint(1, 50000)}",
+                   f"07{rng.randint(10000000, 99999999)}", '', rng.choice(SALE_STATUSES), _date(rng))
+
+    _insert_chunks(conn,
+        """INSERT INTO sales (distributor_id, stock_id, product_id, product_name, variant_size,
+                              quantity_sold, unit_price, total_amount, customer_name,
+                              customer_contact, notes, status, sale_date)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        sale_rows(), 'sales')
+
+    # ── Returns ─────────────────────────────────────────────────────────────
+    _insert_chunks(conn,
+        """INSERT INTO stock_returns (stock_id, distributor_id, product_id, variant_size,
+                                      quantity_returned, reason, status, created_at)
+           VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+        ((rng.randint(ds_lo, ds_hi), rng.randint(dist_lo, dist_hi), pid, product(pid)[3],
+          rng.randint(1, 20), 'Damaged in transit', rng.choice(['pending', 'approved']), _date(rng))
+         for pid in (rng.choice(product_ids) for _ in range(counts['returns']))),
+        'stock_returns')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplier applied to every base row count (default 1.0).')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for repeatable data.')
+    parser.add_argument('--truncate', action='store_true',
+                        help='Empty the data tables first (admin_user is kept).')
+    args = parser.parse_args(argv)
+
+    counts = {key: max(1, int(value * args.scale)) for key, value in BASE_COUNTS.items()}
+    rng = random.Random(args.seed)
+
+    app = Flask(__name__)
+    mysql = init_db(app)
+    with mysql.pool.connection() as conn:
+        if args.truncate:
+            truncate(conn)
+        print(f"Seeding with {counts}", file=sys.stderr)
+        seed(conn, counts, rng)
+        # Seeded stock bypasses the routes, so rebuild the aggregate in one go
+        print(f"stock_summary: {rebuild_stock_summary(conn)} rows", file=sys.stderr)
+        # Same for the seeded messages' per-distributor unread counters
+        print(f"message_unread_counters: {reconcile_unread(conn)} rows", file=sys.stderr)
+        # ... and the admin inbox's thread summaries
+        print(f"message_threads: {rebuild_threads(conn)} threads", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,37 @@
+import os
+
 from flask import Flask
-from flask_mysqldb import MySQL
+from config.db_pool import PooledMySQL
+
+
+def _env(name, default):
+    return os.environ.get(name, default)
+
+
+def _env_flag(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
 
 
 def init_db(app):
-    app.config['MYSQL_HOST'] = 'localhost'
-    app.config['MYSQL_USER'] = 'root'
-    app.config['MYSQL_PASSWORD'] = '' 
-    app.config['MYSQL_DB'] = 'golden_bee_db'
-    app.config['MYSQL_PORT'] = 3307     
-    return MySQL(app)
+    # Connection settings (defaults match the local XAMPP setup)
+    app.config['MYSQL_HOST'] = _env('MYSQL_HOST', 'localhost')
+    app.config['MYSQL_USER'] = _env('MYSQL_USER', 'root')
+    app.config['MYSQL_PASSWORD'] = _env('MYSQL_PASSWORD', '')
+    app.config['MYSQL_DB'] = _env('MYSQL_DB', 'golden_bee_db')
+    app.config['MYSQL_PORT'] = int(_env('MYSQL_PORT', 3307))
+    app.config['MYSQL_CONNECT_TIMEOUT'] = int(_env('MYSQL_CONNECT_TIMEOUT', 10))
+
+    # Pool settings
+    app.config['MYSQL_POOL_SIZE'] = int(_env('MYSQL_POOL_SIZE', 5))
+    app.config['MYSQL_POOL_MAX_OVERFLOW'] = int(_env('MYSQL_POOL_MAX_OVERFLOW', 10))
+    app.config['MYSQL_POOL_TIMEOUT'] = float(_env('MYSQL_POOL_TIMEOUT', 30))
+    app.config['MYSQL_POOL_RECYCLE'] = float(_env('MYSQL_POOL_RECYCLE', 1800))
+    app.config['MYSQL_POOL_PRE_PING'] = _env_flag('MYSQL_POOL_PRE_PING', True)
+
+    return PooledMySQL(app)
 
 
 if __name__ == '__main__':
@@ -21,6 +44,6 @@ if __name__ == '__main__':
             cursor.execute("SELECT DATABASE();")
             db_name = cursor.fetchone()
             print(f"Connected to database: {db_name[0]}")
+            print("Pool stats:", mysql.stats())
         except Exception as e:
             print("Database connection failed:", e)
-
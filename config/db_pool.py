@@ -0,0 +1,257 @@
+"""
+Pooled MySQL connections
+Drop-in replacement for flask_mysqldb.MySQL: blueprints keep calling
+mysql.connection.cursor() / commit() / rollback(), but the connection is
+checked out of a shared pool on first use in a request and handed back at
+teardown instead of being opened and closed every time.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+import MySQLdb
+from MySQLdb import cursors
+from flask import g
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within pool_timeout seconds."""
+
+
+class _PooledEntry:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of MySQLdb connections.
+
+    pool_size      connections kept open while idle
+    max_overflow   extra connections allowed during bursts (closed on return)
+    pool_timeout   seconds to wait for a free connection before PoolTimeout
+    pool_recycle   idle connections older than this many seconds are reopened
+    pre_ping       ping() each connection on checkout and reconnect if dead
+    """
+
+    def __init__(self, connect_kwargs, pool_size=5, max_overflow=10,
+                 pool_timeout=30, pool_recycle=1800, pre_ping=True):
+        self.connect_kwargs = connect_kwargs
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.pre_ping = pre_ping
+
+        self._idle = []
+        self._checked_out = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'timeouts': 0,
+            'connects': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'discarded': 0,
+        }
+
+    # ── Internals ────────────────────────────────────────────────────────────
+
+    def _count(self, name):
+        """Bump a counter from outside the pool lock (connect / ping run unlocked)."""
+        with self._cond:
+            self._stats[name] += 1
+
+    def _connect(self):
+        conn = MySQLdb.connect(**self.connect_kwargs)
+        self._count('connects')
+        return _PooledEntry(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_stale(self, entry):
+        return (self.pool_recycle is not None and self.pool_recycle >= 0 and
+                time.monotonic() - entry.last_used > self.pool_recycle)
+
+    def _validate(self, entry):
+        """Recycle / ping an idle entry; returns a usable entry."""
+        if self._is_stale(entry):
+            self._close_quietly(entry.conn)
+            self._count('recycled')
+            return self._connect()
+
+        if self.pre_ping:
+            try:
+                entry.conn.ping()
+            except Exception:
+                self._count('ping_failures')
+                self._close_quietly(entry.conn)
+                return self._connect()
+
+        return entry
+
+    # ── Public API ───────────────────────────────────────────────────────────
+
+    def checkout(self):
+        """Take a connection from the pool (or open one if under the limit)."""
+        deadline = None
+        waited_from = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._checked_out < self.pool_size + self.max_overflow:
+                    entry = None
+                    break
+
+                if deadline is None:
+                    waited_from = time.monotonic()
+                    deadline = waited_from + self.pool_timeout
+                    self._stats['waits'] += 1
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No MySQL connection available within {self.pool_timeout}s "
+                        f"(size={self.pool_size}, overflow={self.max_overflow})"
+                    )
+                self._cond.wait(remaining)
+
+            self._checked_out += 1
+            self._stats['checkouts'] += 1
+            if waited_from is not None:
+                self._stats['wait_time_ms'] += (time.monotonic() - waited_from) * 1000
+
+        # Connecting / pinging happens outside the lock
+        try:
+            entry = self._validate(entry) if entry else self._connect()
+        except Exception:
+            with self._cond:
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+        return entry
+
+    def checkin(self, entry, discard=False):
+        """Return a connection; rolls back any open transaction first."""
+        if not discard:
+            try:
+                entry.conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._checked_out -= 1
+            if discard or len(self._idle) >= self.pool_size:
+                self._stats['discarded'] += 1
+                self._close_quietly(entry.conn)
+            else:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Use a pooled connection outside of a request (CLI, background jobs)."""
+        entry = self.checkout()
+        try:
+            yield entry.conn
+        finally:
+            self.checkin(entry)
+
+    def dispose(self):
+        """Close every idle connection (e.g. after fork)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._close_quietly(entry.conn)
+
+    def stats(self):
+        """Snapshot of pool counters."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'checked_out': self._checked_out,
+                'idle': len(self._idle),
+                'wait_time_ms': round(self._stats['wait_time_ms'], 2),
+            })
+        return snapshot
+
+
+class PooledMySQL:
+    """
+    Same surface as flask_mysqldb.MySQL (``mysql.connection``) backed by a
+    ConnectionPool. One connection per app context, returned at teardown.
+    """
+
+    def __init__(self, app=None):
+        self.pool = None
+        # Callables conn -> conn applied once per checkout (e.g. the SQL profiler)
+        self.connection_wrappers = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        kwargs = {
+            'host': config['MYSQL_HOST'],
+            'user': config['MYSQL_USER'],
+            'passwd': config['MYSQL_PASSWORD'],
+            'db': config['MYSQL_DB'],
+            'port': int(config['MYSQL_PORT']),
+            'connect_timeout': int(config.get('MYSQL_CONNECT_TIMEOUT', 10)),
+            'charset': config.get('MYSQL_CHARSET', 'utf8'),
+            'use_unicode': True,
+        }
+        if config.get('MYSQL_CURSORCLASS'):
+            kwargs['cursorclass'] = getattr(cursors, config['MYSQL_CURSORCLASS'])
+
+        self.pool = ConnectionPool(
+            kwargs,
+            pool_size=int(config['MYSQL_POOL_SIZE']),
+            max_overflow=int(config['MYSQL_POOL_MAX_OVERFLOW']),
+            pool_timeout=float(config['MYSQL_POOL_TIMEOUT']),
+            pool_recycle=float(config['MYSQL_POOL_RECYCLE']),
+            pre_ping=bool(config['MYSQL_POOL_PRE_PING']),
+        )
+        app.teardown_appcontext(self.teardown)
+        app.extensions['mysql_pool'] = self
+
+    @property
+    def connection(self):
+        """Connection bound to the current app context (checked out lazily)."""
+        conn = g.get('_mysql_pool_conn')
+        if conn is None:
+            entry = self.pool.checkout()
+            g._mysql_pool_entry = entry
+            conn = entry.conn
+            for wrap in self.connection_wrappers:
+                conn = wrap(conn)
+            g._mysql_pool_conn = conn
+        return conn
+
+    def teardown(self, exception):
+        g.pop('_mysql_pool_conn', None)
+        entry = g.pop('_mysql_pool_entry', None)
+        if entry is not None:
+            self.pool.checkin(entry)
+
+    def stats(self):
+        return self.pool.stats()
@@ -0,0 +1,120 @@
+"""
+Static query audit
+Collects the SQL passed to cursor.execute() in every blueprint module and
+runs EXPLAIN on it, flagging full-table scans (type = ALL) on large tables.
+Used by ``flask db check-queries``.
+"""
+import ast
+import os
+
+MODULES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'modules')
+
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+
+
+class CollectedQuery:
+    __slots__ = ('location', 'sql')
+
+    def __init__(self, location, sql):
+        self.location = location
+        self.sql = sql
+
+
+def _string_value(node):
+    """Literal string for a Constant / implicit concatenation, else None."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left, right = _string_value(node.left), _string_value(node.right)
+        if left is not None and right is not None:
+            return left + right
+    return None
+
+
+def _function_strings(func):
+    """
+    Resolve simple local SQL builders: ``query = "..."`` followed by
+    ``query += "..."``. All fragments are joined, which gives the query with
+    every optional filter switched on.
+    """
+    names = {}
+    nodes = sorted((n for n in ast.walk(func) if isinstance(n, (ast.Assign, ast.AugAssign))),
+                   key=lambda n: (n.lineno, n.col_offset))
+    for node in nodes:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            value = _string_value(node.value)
+            if value is not None:
+                names[node.targets[0].id] = value
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) \
+                and isinstance(node.op, ast.Add):
+            value = _string_value(node.value)
+            if value is not None and node.target.id in names:
+                names[node.target.id] += value
+    return names
+
+
+def collect_queries(root=MODULES_DIR):
+    """Every literal SQL statement handed to ``*.execute(...)`` under ``root``."""
+    queries, seen = [], set()
+    for dirpath, _dirs, files in os.walk(root):
+        for filename in sorted(files):
+            if not filename.endswith('.py'):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, encoding='utf-8') as fh:
+                tree = ast.parse(fh.read(), filename=path)
+
+            for func in ast.walk(tree):
+                if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    continue
+                local_strings = _function_strings(func)
+                for node in ast.walk(func):
+                    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                            and node.func.attr in ('execute', 'executemany') and node.args):
+                        continue
+                    arg = node.args[0]
+                    sql = _string_value(arg)
+                    if sql is None and isinstance(arg, ast.Name):
+                        sql = local_strings.get(arg.id)
+                    if sql is None or (path, func.name, sql) in seen:
+                        continue
+                    seen.add((path, func.name, sql))
+                    location = f"{os.path.relpath(path, os.path.dirname(root))}:{node.lineno} ({func.name})"
+                    queries.append(CollectedQuery(location, sql))
+    return queries
+
+
+def _bind_sample_values(sql):
+    """Replace %s placeholders with a quoted sample so EXPLAIN can plan it."""
+    return sql.replace('%%', '%').replace('%s', "'1'")
+
+
+def explain_queries(conn, queries, min_rows=1000, echo=print, verbose=False):
+    """EXPLAIN each query; returns a list of (query, plan_row) full scans."""
+    failures = []
+    cur = conn.cursor()
+    try:
+        for query in queries:
+            statement = query.sql.strip()
+            if not statement.upper().startswith(_EXPLAINABLE):
+                continue
+            try:
+                cur.execute("EXPLAIN " + _bind_sample_values(statement))
+                columns = [d[0] for d in cur.description]
+                plan = [dict(zip(columns, row)) for row in cur.fetchall()]
+            except Exception as exc:
+                echo(f"  ? {query.location}: EXPLAIN failed ({exc})")
+                conn.rollback()
+                continue
+
+            for row in plan:
+                rows = row.get('rows') or 0
+                if verbose:
+                    echo(f"    {query.location}: {row.get('table')} type={row.get('type')} "
+                         f"key={row.get('key')} rows={rows}")
+                if row.get('type') == 'ALL' and int(rows) >= min_rows:
+                    failures.append((query, row))
+                    echo(f"  ✗ {query.location}: full scan of {row.get('table')} (~{rows} rows)")
+    finally:
+        cur.close()
+    return failures
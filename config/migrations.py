@@ -0,0 +1,174 @@
+"""
+Versioned schema migrations
+Plain .sql files in /migrations named NNNN_description.sql are applied in
+order and recorded in schema_migrations. Exposed as ``flask db ...``.
+"""
+import hashlib
+import os
+import re
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+_FILENAME_RE = re.compile(r'^(\d{4})_([\w\-]+)\.sql$')
+
+# "already exists" style errors: lets migrations adopt a database that was
+# created by hand before migrations existed.
+#   1050 table exists, 1060 duplicate column, 1061 duplicate key name,
+#   1091 can't drop (already dropped)
+_IGNORABLE_ERRORS = {1050, 1060, 1061, 1091}
+
+
+class Migration:
+    __slots__ = ('version', 'name', 'path', 'checksum')
+
+    def __init__(self, version, name, path, checksum):
+        self.version = version
+        self.name = name
+        self.path = path
+        self.checksum = checksum
+
+    def statements(self):
+        with open(self.path, encoding='utf-8') as fh:
+            return split_statements(fh.read())
+
+
+def split_statements(sql):
+    """Split a migration file on ';' at end of line, dropping comment lines."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    statements, buffer = [], []
+    for line in lines:
+        buffer.append(line)
+        if line.rstrip().endswith(';'):
+            statement = '\n'.join(buffer).strip().rstrip(';').strip()
+            if statement:
+                statements.append(statement)
+            buffer = []
+    tail = '\n'.join(buffer).strip()
+    if tail:
+        statements.append(tail)
+    return statements
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """All migration files, ordered by version."""
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME_RE.match(filename)
+        if not match:
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, 'rb') as fh:
+            checksum = hashlib.sha1(fh.read()).hexdigest()
+        migrations.append(Migration(match.group(1), match.group(2), path, checksum))
+    return migrations
+
+
+def _ensure_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(10) PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            checksum CHAR(40) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def applied_versions(conn):
+    cur = conn.cursor()
+    try:
+        _ensure_table(cur)
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        return dict(cur.fetchall())
+    finally:
+        cur.close()
+
+
+def apply_migration(conn, migration, echo=print):
+    cur = conn.cursor()
+    try:
+        for statement in migration.statements():
+            try:
+                cur.execute(statement)
+            except Exception as exc:
+                code = exc.args[0] if exc.args else None
+                if code in _IGNORABLE_ERRORS:
+                    echo(f"    skipped (already applied): {exc.args[1] if len(exc.args) > 1 else exc}")
+                    continue
+                raise
+        cur.execute("""
+            INSERT INTO schema_migrations (version, name, checksum)
+            VALUES (%s, %s, %s)
+        """, (migration.version, migration.name, migration.checksum))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def upgrade(conn, target=None, echo=print):
+    """Apply every pending migration up to ``target`` (inclusive)."""
+    done = applied_versions(conn)
+    applied = []
+    for migration in discover():
+        if target and migration.version > target:
+            break
+        if migration.version in done:
+            continue
+        echo(f"Applying {migration.version}_{migration.name}")
+        apply_migration(conn, migration, echo)
+        applied.append(migration.version)
+    return applied
+
+
+# ==========================================
+# CLI: flask db ...
+# ==========================================
+db_cli = AppGroup('db', help='Schema migrations and query checks.')
+
+
+def _connection():
+    return current_app.extensions['mysql_pool'].connection
+
+
+@db_cli.command('upgrade')
+@click.option('--target', default=None, help='Stop after this version (e.g. 0002).')
+def upgrade_command(target):
+    """Apply pending migrations."""
+    applied = upgrade(_connection(), target, echo=click.echo)
+    click.echo(f"{len(applied)} migration(s) applied." if applied else "Database is up to date.")
+
+
+@db_cli.command('status')
+def status_command():
+    """List migrations and whether they have been applied."""
+    done = applied_versions(_connection())
+    for migration in discover():
+        if migration.version not in done:
+            state = 'pending'
+        elif done[migration.version] != migration.checksum:
+            state = 'applied (file changed since)'
+        else:
+            state = 'applied'
+        click.echo(f"{migration.version}_{migration.name:<40} {state}")
+
+
+@db_cli.command('check-queries')
+@click.option('--min-rows', default=1000, show_default=True,
+              help='Full scans estimated below this many rows are tolerated.')
+@click.option('--verbose', is_flag=True, help='Print the plan for every query.')
+def check_queries_command(min_rows, verbose):
+    """EXPLAIN every query the blueprints issue; fail on large full scans."""
+    from config.explain_check import collect_queries, explain_queries
+
+    queries = collect_queries()
+    failures = explain_queries(_connection(), queries, min_rows, echo=click.echo, verbose=verbose)
+    click.echo(f"Checked {len(queries)} queries, {len(failures)} full scan(s) over {min_rows} rows.")
+    if failures:
+        raise SystemExit(1)
@@ -0,0 +1,281 @@
+"""
+Per-request SQL profiler
+Wraps the cursors handed out by mysql.connection.cursor() so every request
+records statement count, total/slowest execution time, rows fetched and
+repeated statement shapes (N+1 candidates). Totals are sent back in a
+Server-Timing header and aggregated per endpoint for /admin/_perf.
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, request
+
+_WS_RE = re.compile(r'\s+')
+_COMMENT_RE = re.compile(r'#[^\n]*|--[^\n]*')
+_NUMBER_RE = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_IN_LIST_RE = re.compile(r'\(\s*(%s|\?)(\s*,\s*(%s|\?))+\s*\)')
+
+
+def statement_shape(sql):
+    """Normalise a statement so identical queries with different literals match."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    shape = _COMMENT_RE.sub(' ', sql)
+    shape = _STRING_RE.sub('?', shape)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _IN_LIST_RE.sub('(...)', shape)
+    return _WS_RE.sub(' ', shape).strip()
+
+
+class RequestProfile:
+    """SQL totals for a single request."""
+
+    __slots__ = ('queries', 'total_ms', 'slowest_ms', 'slowest_sql', 'rows', 'shapes')
+
+    def __init__(self):
+        self.queries = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        self.rows = 0
+        self.shapes = Counter()
+
+    def record(self, sql, elapsed_ms):
+        self.queries += 1
+        self.total_ms += elapsed_ms
+        shape = statement_shape(sql)
+        self.shapes[shape] += 1
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = shape
+
+    def repeated(self, threshold):
+        """Statement shapes executed at least ``threshold`` times."""
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+
+class ProfiledCursor:
+    """Cursor proxy that times execute() and counts fetched rows."""
+
+    def __init__(self, cursor, profiler, connection):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._connection = connection
+
+    def _timed(self, method, sql, args):
+        started = time.perf_counter()
+        try:
+            return method(sql, args)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._profiler.record(sql, elapsed_ms, self)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def _count(self, rows):
+        profile = self._profiler.current()
+        if profile is not None and rows:
+            profile.rows += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        profile = self._profiler.current()
+        if profile is not None and row is not None:
+            profile.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        return self._count(rows)
+
+    def fetchall(self):
+        return self._count(self._cursor.fetchall())
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ProfiledConnection:
+    """Connection proxy whose cursor() returns ProfiledCursor objects."""
+
+    def __init__(self, connection, profiler):
+        self._connection = connection
+        self._profiler = profiler
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._connection.cursor(*args, **kwargs)
+        return ProfiledCursor(cursor, self._profiler, self._connection)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class EndpointStats:
+    """Aggregated DB cost for one endpoint across requests."""
+
+    __slots__ = ('endpoint', 'requests', 'queries', 'db_ms', 'max_db_ms',
+                 'rows', 'n_plus_one', 'worst_shape')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.requests = 0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.max_db_ms = 0.0
+        self.rows = 0
+        self.n_plus_one = 0
+        self.worst_shape = None
+
+    def as_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'requests': self.requests,
+            'queries': self.queries,
+            'avg_queries': round(self.queries / self.requests, 1) if self.requests else 0,
+            'db_ms': round(self.db_ms, 2),
+            'avg_db_ms': round(self.db_ms / self.requests, 2) if self.requests else 0,
+            'max_db_ms': round(self.max_db_ms, 2),
+            'rows': self.rows,
+            'n_plus_one': self.n_plus_one,
+            'worst_shape': self.worst_shape,
+        }
+
+
+class SQLProfiler:
+    """
+    Flask extension. Config (all optional):
+
+    SQL_PROFILER_ENABLED         record per-request stats (default True)
+    SQL_PROFILER_REPEAT_LIMIT    shape repeats that count as N+1 (default 3)
+    SQL_PROFILER_EXPLAIN         EXPLAIN slow SELECTs and log full scans (default False)
+    SQL_PROFILER_EXPLAIN_MS      latency threshold for EXPLAIN (default 50)
+    """
+
+    def __init__(self, app=None, mysql=None):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        app.config.setdefault('SQL_PROFILER_ENABLED', True)
+        app.config.setdefault('SQL_PROFILER_REPEAT_LIMIT', 3)
+        app.config.setdefault('SQL_PROFILER_EXPLAIN', False)
+        app.config.setdefault('SQL_PROFILER_EXPLAIN_MS', 50)
+
+        if not app.config['SQL_PROFILER_ENABLED']:
+            return
+
+        mysql.connection_wrappers.append(lambda conn: ProfiledConnection(conn, self))
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.extensions['sql_profiler'] = self
+
+    # ── Recording ────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def current():
+        return g.get('_sql_profile')
+
+    def _start(self):
+        g._sql_profile = RequestProfile()
+
+    def record(self, sql, elapsed_ms, cursor):
+        profile = self.current()
+        if profile is None:
+            return
+        profile.record(sql, elapsed_ms)
+
+        config = current_app.config
+        if config['SQL_PROFILER_EXPLAIN'] and elapsed_ms >= config['SQL_PROFILER_EXPLAIN_MS']:
+            self._explain(sql, cursor)
+
+    def _explain(self, sql, cursor):
+        """Run EXPLAIN for a slow SELECT and log any full-table scans."""
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8', 'replace')
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return
+        # Unbuffered cursors still own the connection until fully read
+        if type(cursor._cursor).__name__.startswith('SS'):
+            return
+
+        executed = getattr(cursor._cursor, '_executed', None) or sql
+        if isinstance(executed, bytes):
+            executed = executed.decode('utf-8', 'replace')
+
+        explain_cur = cursor._connection.cursor()
+        try:
+            explain_cur.execute("EXPLAIN " + executed)
+            columns = [d[0] for d in explain_cur.description]
+            for row in explain_cur.fetchall():
+                plan = dict(zip(columns, row))
+                if plan.get('type') == 'ALL':
+                    current_app.logger.warning(
+                        "Full table scan on %s (~%s rows) in %s: %s",
+                        plan.get('table'), plan.get('rows'),
+                        request.endpoint, statement_shape(sql)[:300],
+                    )
+        except Exception as exc:
+            current_app.logger.debug("EXPLAIN failed: %s", exc)
+        finally:
+            explain_cur.close()
+
+    def _finish(self, response):
+        profile = g.pop('_sql_profile', None)
+        if profile is None or profile.queries == 0:
+            return response
+
+        limit = current_app.config['SQL_PROFILER_REPEAT_LIMIT']
+        repeated = profile.repeated(limit)
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={profile.total_ms:.2f};desc="{profile.queries} queries"',
+        )
+        response.headers.add('Server-Timing', f'db-slowest;dur={profile.slowest_ms:.2f}')
+
+        if repeated:
+            current_app.logger.warning(
+                "Possible N+1 in %s: %s", request.endpoint,
+                "; ".join(f"{n}x {shape[:120]}" for shape, n in repeated.items()),
+            )
+
+        endpoint = request.endpoint or request.path
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(endpoint)
+            stats.requests += 1
+            stats.queries += profile.queries
+            stats.db_ms += profile.total_ms
+            stats.rows += profile.rows
+            if repeated:
+                stats.n_plus_one += 1
+            if profile.total_ms >= stats.max_db_ms:
+                stats.max_db_ms = profile.total_ms
+                stats.worst_shape = profile.slowest_sql
+        return response
+
+    # ── Reporting ────────────────────────────────────────────────────────────
+
+    def ranked(self):
+        """Endpoint stats sorted by total DB time, slowest first."""
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._endpoints.values()]
+        return sorted(rows, key=lambda row: row['db_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
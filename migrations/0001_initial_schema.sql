@@ -0,0 +1,128 @@
+-- Golden Bee base schema
+-- Matches the tables/columns the admin and distributor blueprints use.
+-- CREATE TABLE IF NOT EXISTS so existing databases can adopt migrations.
+
+CREATE TABLE IF NOT EXISTS admin_user (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(100) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    UNIQUE KEY uq_admin_user_username (username)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS distributor (
+    distributor_id INT AUTO_INCREMENT PRIMARY KEY,
+    distributor_name VARCHAR(150) NOT NULL,
+    district VARCHAR(100),
+    province VARCHAR(100),
+    owner_name VARCHAR(150),
+    contact_no VARCHAR(30),
+    address VARCHAR(255),
+    email VARCHAR(150) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    distributor_image VARCHAR(255),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_distributor_email (email)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS category (
+    category_id INT AUTO_INCREMENT PRIMARY KEY,
+    category_name VARCHAR(150) NOT NULL,
+    description TEXT
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS products (
+    product_id INT AUTO_INCREMENT PRIMARY KEY,
+    product_name VARCHAR(150) NOT NULL,
+    category_id INT,
+    unit_price DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    variant_size VARCHAR(50),
+    shelf_life_days INT,
+    product_image VARCHAR(255),
+    description TEXT
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS stock (
+    stock_id INT AUTO_INCREMENT PRIMARY KEY,
+    product_id INT NOT NULL,
+    product_name VARCHAR(150),
+    category_id INT,
+    category_name VARCHAR(150),
+    unit_price DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    variant_size VARCHAR(50),
+    shelf_life_days INT,
+    quantity INT NOT NULL DEFAULT 0,
+    add_date DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id INT AUTO_INCREMENT PRIMARY KEY,
+    distributor_id INT NOT NULL,
+    order_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    updated_quantity INT,
+    updated_total_price DECIMAL(12, 2)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS order_items (
+    order_item_id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    product_id INT NOT NULL,
+    category_id INT,
+    product_name VARCHAR(150),
+    category_name VARCHAR(150),
+    unit_price DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    variant_size VARCHAR(50),
+    quantity INT NOT NULL DEFAULT 1,
+    subtotal DECIMAL(12, 2) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INT AUTO_INCREMENT PRIMARY KEY,
+    order_id INT NOT NULL,
+    distributor_id INT,
+    admin_id INT,
+    message TEXT NOT NULL,
+    message_type VARCHAR(20) NOT NULL DEFAULT 'general',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    is_read TINYINT(1) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS distributor_stock (
+    stock_id INT AUTO_INCREMENT PRIMARY KEY,
+    distributor_id INT NOT NULL,
+    product_id INT NOT NULL,
+    variant_size VARCHAR(50) NOT NULL DEFAULT '',
+    quantity INT NOT NULL DEFAULT 0,
+    unit_price DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS stock_returns (
+    return_id INT AUTO_INCREMENT PRIMARY KEY,
+    stock_id INT NOT NULL,
+    distributor_id INT NOT NULL,
+    product_id INT NOT NULL,
+    variant_size VARCHAR(50),
+    quantity_returned INT NOT NULL,
+    reason TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS sales (
+    sale_id INT AUTO_INCREMENT PRIMARY KEY,
+    distributor_id INT NOT NULL,
+    stock_id INT,
+    product_id INT,
+    product_name VARCHAR(150),
+    variant_size VARCHAR(50),
+    quantity_sold INT NOT NULL,
+    unit_price DECIMAL(10, 2) NOT NULL DEFAULT 0,
+    total_amount DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    customer_name VARCHAR(150),
+    customer_contact VARCHAR(50),
+    notes TEXT,
+    status VARCHAR(20) NOT NULL DEFAULT 'completed',
+    sale_date DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,25 @@
+-- Composite indexes for the joins and filters the blueprints run most
+
+-- admin order queue / order acceptance: stock ON product_id AND variant_size
+CREATE INDEX idx_stock_product_variant ON stock (product_id, variant_size);
+
+-- add_distributor_stock, api_stock_status, order acceptance upsert
+CREATE INDEX idx_dstock_dist_product_variant ON distributor_stock (distributor_id, product_id, variant_size);
+
+-- distributor manage_orders
+CREATE INDEX idx_orders_distributor_date ON orders (distributor_id, order_date);
+
+-- order_items -> orders join
+CREATE INDEX idx_order_items_order ON order_items (order_id);
+
+-- unread_count / get_messages / mark_messages_read
+CREATE INDEX idx_messages_order_read_admin ON messages (order_id, is_read, admin_id);
+
+-- manage_sales filters
+CREATE INDEX idx_sales_distributor_date_status ON sales (distributor_id, sale_date, status);
+
+-- return history
+CREATE INDEX idx_returns_distributor_created ON stock_returns (distributor_id, created_at);
+
+-- product dropdowns by category
+CREATE INDEX idx_products_category ON products (category_id, product_name);
@@ -0,0 +1,11 @@
+-- Lookups issued with ids / names resolved by the in-process search index
+
+-- admin global search: order lines for matching products
+CREATE INDEX idx_order_items_product ON order_items (product_id);
+
+-- manage_sales search: customer_name IN (...) within one distributor,
+-- and the DISTINCT customer_name scan that builds the index
+CREATE INDEX idx_sales_distributor_customer ON sales (distributor_id, customer_name);
+
+-- manage_sales search: product_id IN (...) within one distributor
+CREATE INDEX idx_sales_distributor_product ON sales (distributor_id, product_id);
@@ -0,0 +1,38 @@
+-- Per product/variant stock totals, maintained by the stock write paths
+-- (modules/common/stock_summary.py) instead of being re-aggregated on
+-- every /admin/stock_summary view. Only rows with quantity > 0 count.
+-- variant_size is '' for stock rows without a variant.
+
+CREATE TABLE IF NOT EXISTS stock_summary (
+    product_id INT NOT NULL,
+    variant_size VARCHAR(50) NOT NULL DEFAULT '',
+    product_name VARCHAR(150) NOT NULL,
+    category_id INT,
+    category_name VARCHAR(150) NOT NULL,
+    total_quantity INT NOT NULL DEFAULT 0,
+    total_value DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    stock_rows INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (product_id, variant_size),
+    KEY idx_stock_summary_value (total_value),
+    KEY idx_stock_summary_category (category_id, total_quantity, total_value)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO stock_summary (product_id, variant_size, product_name, category_id, category_name,
+                           total_quantity, total_value, stock_rows)
+SELECT s.product_id,
+       COALESCE(s.variant_size, ''),
+       COALESCE(MAX(s.product_name), MAX(p.product_name), 'Unknown Product'),
+       COALESCE(MAX(s.category_id), MAX(p.category_id)),
+       COALESCE(MAX(s.category_name), MAX(c.category_name), 'Uncategorized'),
+       SUM(s.quantity),
+       SUM(s.quantity * COALESCE(s.unit_price, p.unit_price, 0)),
+       COUNT(*)
+FROM stock s
+LEFT JOIN products p ON s.product_id = p.product_id
+LEFT JOIN category c ON p.category_id = c.category_id
+WHERE s.quantity > 0
+GROUP BY s.product_id, COALESCE(s.variant_size, '')
+ON DUPLICATE KEY UPDATE total_quantity = VALUES(total_quantity),
+                        total_value = VALUES(total_value),
+                        stock_rows = VALUES(stock_rows);
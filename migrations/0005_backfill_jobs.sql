@@ -0,0 +1,25 @@
+-- Resumable background data fixes (modules/common/backfill.py).
+-- One row per run; last_id is the highest primary key already processed,
+-- so a paused or interrupted job carries on from there.
+
+CREATE TABLE IF NOT EXISTS backfill_jobs (
+    job_id INT AUTO_INCREMENT PRIMARY KEY,
+    job_name VARCHAR(64) NOT NULL,
+    status ENUM('queued', 'running', 'paused', 'completed', 'failed') NOT NULL DEFAULT 'queued',
+    chunk_size INT NOT NULL DEFAULT 1000,
+    min_id BIGINT NOT NULL DEFAULT 0,
+    max_id BIGINT NOT NULL DEFAULT 0,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    chunks_done INT NOT NULL DEFAULT 0,
+    rows_scanned BIGINT NOT NULL DEFAULT 0,
+    rows_updated BIGINT NOT NULL DEFAULT 0,
+    results TEXT,
+    throttled_ms BIGINT NOT NULL DEFAULT 0,
+    error TEXT,
+    started_by INT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    heartbeat_at DATETIME,
+    finished_at DATETIME,
+    KEY idx_backfill_jobs_name_status (job_name, status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
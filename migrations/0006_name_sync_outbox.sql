@@ -0,0 +1,36 @@
+-- Product / category renames are written to name_sync_outbox in the same
+-- transaction as the rename; modules/common/name_sync.py then copies the
+-- current names onto the denormalized columns in small batches.
+
+CREATE TABLE IF NOT EXISTS name_sync_outbox (
+    event_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    entity ENUM('product', 'category') NOT NULL,
+    entity_id INT NOT NULL,
+    status ENUM('pending', 'done', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    processed_at DATETIME,
+    KEY idx_name_sync_status (status, event_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- distributor_stock carries its own names so my_stock no longer joins stock
+ALTER TABLE distributor_stock
+    ADD COLUMN product_name VARCHAR(150) AFTER product_id,
+    ADD COLUMN category_id INT AFTER product_name,
+    ADD COLUMN category_name VARCHAR(150) AFTER category_id;
+
+UPDATE distributor_stock ds
+JOIN products p ON ds.product_id = p.product_id
+LEFT JOIN category c ON p.category_id = c.category_id
+SET ds.product_name = p.product_name,
+    ds.category_id = p.category_id,
+    ds.category_name = c.category_name
+WHERE ds.product_name IS NULL;
+
+-- Lookups the rename propagation runs per product / category
+CREATE INDEX idx_stock_category ON stock (category_id);
+CREATE INDEX idx_order_items_category ON order_items (category_id);
+CREATE INDEX idx_dstock_product ON distributor_stock (product_id);
+CREATE INDEX idx_dstock_category ON distributor_stock (category_id);
+CREATE INDEX idx_sales_product ON sales (product_id);
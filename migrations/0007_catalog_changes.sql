@@ -0,0 +1,13 @@
+-- Product / category writes append a row here in the same transaction
+-- (modules/common/catalog_cache.py). change_id is the catalog version: each
+-- worker process polls for rows newer than the last one it saw and drops
+-- only the cache entries those changes touch.
+
+CREATE TABLE IF NOT EXISTS catalog_changes (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    entity ENUM('product', 'category') NOT NULL,
+    entity_id INT NOT NULL,
+    category_id INT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_catalog_changes_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,5 @@
+-- Admin order queue: per-status counts (GROUP BY o.status) and the
+-- status-filtered page ordered by order_date read this index instead of
+-- scanning every order. Availability now comes from stock_summary.
+
+CREATE INDEX idx_orders_status_date ON orders (status, order_date);
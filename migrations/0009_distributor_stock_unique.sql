@@ -0,0 +1,47 @@
+-- One distributor_stock row per (distributor, product, variant) so order
+-- acceptance can upsert with INSERT ... ON DUPLICATE KEY UPDATE instead of
+-- a read-modify-write. Existing duplicates are merged into the oldest row
+-- first; sales and returns pointing at a merged row are repointed.
+
+CREATE TEMPORARY TABLE dstock_merge AS
+SELECT ds.stock_id, keep.keep_id
+FROM distributor_stock ds
+JOIN (
+    SELECT distributor_id, product_id, variant_size, MIN(stock_id) AS keep_id
+    FROM distributor_stock
+    GROUP BY distributor_id, product_id, variant_size
+    HAVING COUNT(*) > 1
+) keep ON ds.distributor_id = keep.distributor_id
+      AND ds.product_id = keep.product_id
+      AND ds.variant_size = keep.variant_size
+WHERE ds.stock_id <> keep.keep_id;
+
+UPDATE distributor_stock ds
+JOIN (
+    SELECT m.keep_id, SUM(dup.quantity) AS extra
+    FROM dstock_merge m
+    JOIN distributor_stock dup ON dup.stock_id = m.stock_id
+    GROUP BY m.keep_id
+) merged ON ds.stock_id = merged.keep_id
+SET ds.quantity = ds.quantity + merged.extra;
+
+UPDATE sales s
+JOIN dstock_merge m ON s.stock_id = m.stock_id
+SET s.stock_id = m.keep_id;
+
+UPDATE stock_returns r
+JOIN dstock_merge m ON r.stock_id = m.stock_id
+SET r.stock_id = m.keep_id;
+
+DELETE ds FROM distributor_stock ds
+JOIN dstock_merge m ON ds.stock_id = m.stock_id;
+
+DROP TEMPORARY TABLE dstock_merge;
+
+-- Replaces the plain lookup index from 0002 (same columns). Two statements:
+-- the runner ignores 1091 when the old index is already gone, which in one
+-- ALTER would have skipped adding the unique key as well.
+ALTER TABLE distributor_stock
+    ADD UNIQUE KEY uq_dstock_dist_product_variant (distributor_id, product_id, variant_size);
+
+ALTER TABLE distributor_stock DROP INDEX idx_dstock_dist_product_variant;
@@ -0,0 +1,19 @@
+-- Distributor notifications are written to notification_outbox in the same
+-- transaction as the order change; modules/common/notifications.py then
+-- delivers them to messages (and any other channel) in batches.
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    notification_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    channel VARCHAR(20) NOT NULL DEFAULT 'messages',
+    order_id INT NOT NULL,
+    distributor_id INT,
+    admin_id INT,
+    message TEXT NOT NULL,
+    message_type VARCHAR(20) NOT NULL DEFAULT 'general',
+    status ENUM('pending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME,
+    KEY idx_notification_pending (channel, status, notification_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,26 @@
+-- Unread admin messages per distributor and order, kept by the message
+-- write paths (modules/common/message_counters.py) so unread badges are
+-- primary-key reads. order_id 0 holds the distributor's total.
+
+CREATE TABLE IF NOT EXISTS message_unread_counters (
+    distributor_id INT NOT NULL,
+    order_id INT NOT NULL,
+    unread INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (distributor_id, order_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO message_unread_counters (distributor_id, order_id, unread)
+SELECT o.distributor_id, m.order_id, COUNT(*)
+FROM messages m
+JOIN orders o ON m.order_id = o.order_id
+WHERE m.admin_id IS NOT NULL AND m.is_read = 0 AND o.distributor_id IS NOT NULL
+GROUP BY o.distributor_id, m.order_id
+ON DUPLICATE KEY UPDATE unread = VALUES(unread);
+
+INSERT INTO message_unread_counters (distributor_id, order_id, unread)
+SELECT o.distributor_id, 0, COUNT(*)
+FROM messages m
+JOIN orders o ON m.order_id = o.order_id
+WHERE m.admin_id IS NOT NULL AND m.is_read = 0 AND o.distributor_id IS NOT NULL
+GROUP BY o.distributor_id
+ON DUPLICATE KEY UPDATE unread = VALUES(unread);
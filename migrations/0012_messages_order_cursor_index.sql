@@ -0,0 +1,3 @@
+-- get_messages / sync_messages page through an order's conversation by
+-- message_id (since_message_id / before_message_id cursors).
+CREATE INDEX idx_messages_order_message ON messages (order_id, message_id);
@@ -0,0 +1,47 @@
+-- One row per order conversation, kept by the message write paths
+-- (modules/common/message_counters.py) so the admin inbox pages through
+-- threads instead of scanning messages. Dates are NOT NULL keyset sort keys;
+-- threads without a distributor question carry 1970-01-01.
+
+CREATE TABLE IF NOT EXISTS message_threads (
+    order_id INT NOT NULL PRIMARY KEY,
+    distributor_id INT,
+    message_count INT NOT NULL DEFAULT 0,
+    open_questions INT NOT NULL DEFAULT 0,
+    awaiting_reply TINYINT(1) NOT NULL DEFAULT 0,
+    last_question VARCHAR(255),
+    last_question_at DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00',
+    last_message_at DATETIME NOT NULL DEFAULT '1970-01-01 00:00:00',
+    KEY idx_threads_awaiting (awaiting_reply, last_question_at, order_id),
+    KEY idx_threads_distributor (distributor_id, awaiting_reply, last_question_at, order_id),
+    KEY idx_threads_activity (last_message_at, order_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO message_threads
+    (order_id, distributor_id, message_count, open_questions, awaiting_reply,
+     last_question_at, last_message_at)
+SELECT m.order_id, MAX(o.distributor_id), COUNT(*),
+       SUM(m.admin_id IS NULL AND m.message_id > COALESCE(a.last_reply_id, 0)),
+       SUM(m.admin_id IS NULL AND m.message_id > COALESCE(a.last_reply_id, 0)) > 0,
+       COALESCE(MAX(CASE WHEN m.admin_id IS NULL THEN m.created_at END), '1970-01-01 00:00:00'),
+       COALESCE(MAX(m.created_at), '1970-01-01 00:00:00')
+FROM messages m
+JOIN orders o ON m.order_id = o.order_id
+LEFT JOIN (
+    SELECT order_id, MAX(message_id) as last_reply_id
+    FROM messages
+    WHERE admin_id IS NOT NULL
+    GROUP BY order_id
+) a ON a.order_id = m.order_id
+GROUP BY m.order_id
+ON DUPLICATE KEY UPDATE message_count = VALUES(message_count);
+
+UPDATE message_threads t
+JOIN (
+    SELECT order_id, MAX(message_id) as message_id
+    FROM messages
+    WHERE admin_id IS NULL
+    GROUP BY order_id
+) q ON q.order_id = t.order_id
+JOIN messages m ON m.message_id = q.message_id
+SET t.last_question = LEFT(m.message, 255);
@@ -0,0 +1,14 @@
+-- Orders hold several lines (a cart), accepted or rejected one by one or
+-- per order. Each line carries its own status; orders.status is rolled up
+-- from its lines (pending while any line is pending, then accepted if any
+-- line was accepted, else rejected). Existing single-line orders take
+-- their order's status.
+ALTER TABLE order_items
+    ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'pending' AFTER subtotal;
+
+UPDATE order_items oi
+INNER JOIN orders o ON oi.order_id = o.order_id
+SET oi.status = o.status;
+
+-- Admin queue: per-status line counts and the status-filtered pages
+CREATE INDEX idx_order_items_status ON order_items (status, order_item_id);
@@ -0,0 +1,16 @@
+-- Writes to anything the search index covers append a row here in the same
+-- transaction (modules/common/search_index.py). Each worker process polls
+-- for rows newer than the last one it applied and re-reads just those
+-- rows, instead of rebuilding its whole index on a timer.
+--
+-- kind says which rows doc_id selects: stock, product, distributor, sale
+-- (its customer name), stock_product / stock_category (stock carrying a
+-- renamed product / category) and category (that category's products).
+
+CREATE TABLE IF NOT EXISTS search_changes (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    doc_id INT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    KEY idx_search_changes_created (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
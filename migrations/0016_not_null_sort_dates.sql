@@ -0,0 +1,12 @@
+-- Keyset pagination (modules/common/pagination.py) needs NOT NULL sort
+-- keys: a row with a NULL stock.add_date / orders.order_date never matches
+-- the "(date, id) < cursor" condition and drops out of every page after the
+-- first. Rows without a date take the oldest date already in their table.
+
+SET @first_stock_date = (SELECT COALESCE(MIN(add_date), NOW()) FROM stock);
+UPDATE stock SET add_date = @first_stock_date WHERE add_date IS NULL;
+ALTER TABLE stock MODIFY add_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+SET @first_order_date = (SELECT COALESCE(MIN(order_date), NOW()) FROM orders);
+UPDATE orders SET order_date = @first_order_date WHERE order_date IS NULL;
+ALTER TABLE orders MODIFY order_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP;
@@ -0,0 +1,9 @@
+-- Order acceptance (modules/common/order_acceptance.py) locks a product /
+-- variant's batches with "product_id = ? AND variant_size = ? FOR UPDATE".
+-- With a nullable variant_size it had to match COALESCE(variant_size, ''),
+-- which idx_stock_product_variant cannot serve, so every accept locked all
+-- of the product's variants. Stock without a variant is stored as '', as
+-- stock_summary and distributor_stock already do.
+
+UPDATE stock SET variant_size = '' WHERE variant_size IS NULL;
+ALTER TABLE stock MODIFY variant_size VARCHAR(50) NOT NULL DEFAULT '';
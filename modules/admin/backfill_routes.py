@@ -0,0 +1,101 @@
+"""
+Admin Backfill Routes
+Start, pause and resume chunked background data fixes and watch their progress
+"""
+import MySQLdb
+from flask import Blueprint, render_template, redirect, url_for, flash, session, jsonify, request
+
+from modules.common.backfill import JOBS
+
+# Injected from app.py
+mysql = None
+backfill = None
+
+backfill_mgmt_bp = Blueprint(
+    'backfill_mgmt',
+    __name__,
+    template_folder='templates',
+    static_folder='static',
+    static_url_path='/admin_static'
+)
+
+
+def check_admin_session():
+    """Check if admin is logged in"""
+    return 'user_id' in session
+
+
+@backfill_mgmt_bp.route('/backfill')
+def backfill_status():
+    """Recent backfill runs with progress (auto-refreshes while one is running)"""
+    if not check_admin_session():
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+
+    jobs = []
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        jobs = backfill.jobs(cur)
+    except Exception as e:
+        print(f"Error in backfill_status: {str(e)}")
+        flash(f"Error loading backfill jobs: {str(e)}", "error")
+    finally:
+        cur.close()
+
+    if request.args.get('format') == 'json':
+        return jsonify({'jobs': jobs})
+
+    return render_template('backfill_jobs.html',
+                           jobs=jobs,
+                           definitions=JOBS,
+                           active=any(job['status'] in ('queued', 'running') for job in jobs),
+                           username=session.get('username'))
+
+
+@backfill_mgmt_bp.route('/backfill/start', methods=['POST'])
+def backfill_start():
+    if not check_admin_session():
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+
+    job_name = request.form.get('job_name', '')
+    if job_name not in JOBS:
+        flash("Unknown backfill job.", "error")
+        return redirect(url_for('backfill_mgmt.backfill_status'))
+
+    try:
+        job_id, created = backfill.start(job_name, admin_id=session.get('user_id'))
+        if created:
+            flash(f"Backfill job #{job_id} started.", "success")
+        else:
+            flash(f"Backfill job #{job_id} is already queued, running or paused.", "warning")
+    except Exception as e:
+        print(f"Error in backfill_start: {str(e)}")
+        flash(f"Error starting backfill: {str(e)}", "error")
+    return redirect(url_for('backfill_mgmt.backfill_status'))
+
+
+@backfill_mgmt_bp.route('/backfill/<int:job_id>/pause', methods=['POST'])
+def backfill_pause(job_id):
+    if not check_admin_session():
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+
+    if backfill.pause(job_id):
+        flash(f"Backfill job #{job_id} will pause after its current chunk.", "success")
+    else:
+        flash(f"Backfill job #{job_id} is not running.", "warning")
+    return redirect(url_for('backfill_mgmt.backfill_status'))
+
+
+@backfill_mgmt_bp.route('/backfill/<int:job_id>/resume', methods=['POST'])
+def backfill_resume(job_id):
+    if not check_admin_session():
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+
+    if backfill.resume(job_id):
+        flash(f"Backfill job #{job_id} resumed.", "success")
+    else:
+        flash(f"Backfill job #{job_id} cannot be resumed.", "warning")
+    return redirect(url_for('backfill_mgmt.backfill_status'))
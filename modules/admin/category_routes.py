@@ -2,10 +2,16 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from werkzeug.utils import secure_filename
 import os
 from MySQLdb.cursors import DictCursor  # Make sure to import DictCursor
+from modules.common.pagination import SortOption, PageRequest, fetch_page, cached_row
+from modules.common.name_sync import record_name_change
+from modules.common.catalog_cache import record_catalog_change
+from modules.common.search_index import record_search_change
 
 # These will be injected from app.py
 mysql = None
 bcrypt = None
+name_sync = None
+catalog = None
 
 # Define the Blueprint for category management module
 category_mgmt_bp = Blueprint(
@@ -16,14 +22,22 @@ category_mgmt_bp = Blueprint(
     static_url_path="/category_static"  # URL path for static files
 )
 
-# Route to manage all categories
+CATEGORY_SORTS = {
+    'id': SortOption('category_id', 'category_id', 'Newest'),
+    'name': SortOption('category_name', 'category_name', 'Name'),
+}
+
+# Route to manage all categories (keyset paginated)
 @category_mgmt_bp.route("/manage_categories", methods=["GET"])
 def manage_categories():
+    page_request = PageRequest.from_args(request.args, CATEGORY_SORTS, 'id')
     cur = mysql.connection.cursor(DictCursor)  # Use DictCursor to fetch results as dictionaries
-    cur.execute("SELECT * FROM category ORDER BY category_id DESC")
-    categories = cur.fetchall()  # Get all categories as dictionaries
+    total = cached_row(cur, 'category', "SELECT COUNT(*) AS total FROM category")['total']
+    page = fetch_page(cur, "SELECT * FROM category", page_request,
+                      id_column='category_id', id_key='category_id', total=total)
     cur.close()
-    return render_template("manage_categories.html", categories=categories)
+    return render_template("manage_categories.html", categories=page.items, page=page,
+                           sorts=CATEGORY_SORTS)
 
 # Route to add a new category
 @category_mgmt_bp.route("/add_category", methods=["GET", "POST"])
@@ -44,7 +58,10 @@ def add_category():
                 """INSERT INTO category (category_name, description) VALUES (%s, %s)""",
                 (category_name, description)
             )
+            new_category_id = cur.lastrowid
+            record_catalog_change(cur, 'category', new_category_id)
             mysql.connection.commit()
+            catalog.invalidate_category(new_category_id)
             flash("Category added successfully", "success")
             return redirect(url_for("category_mgmt.manage_categories"))
         except Exception as e:
@@ -83,7 +100,17 @@ def update_category(category_id):
                 """UPDATE category SET category_name = %s, description = %s WHERE category_id = %s""",
                 (category_name, description, category_id)
             )
+            renamed = category_name != category['category_name']
+            if renamed:
+                # Copies on stock / orders are updated in the background
+                record_name_change(cur, 'category', category_id)
+            record_catalog_change(cur, 'category', category_id)
+            record_search_change(cur, 'category', category_id)
             mysql.connection.commit()
+            if renamed:
+                name_sync.kick()
+            # Products are reindexed under the new name from search_changes
+            catalog.invalidate_category(category_id)
             flash("Category updated successfully", "success")
             return redirect(url_for("category_mgmt.manage_categories"))
         except Exception as e:
@@ -100,7 +127,11 @@ def delete_category(category_id):
     cur = mysql.connection.cursor()
     try:
         cur.execute("DELETE FROM category WHERE category_id = %s", (category_id,))
+        record_catalog_change(cur, 'category', category_id)
+        # Its products drop the deleted name from the search index
+        record_search_change(cur, 'category', category_id)
         mysql.connection.commit()
+        catalog.invalidate_category(category_id)
         flash("Category deleted successfully", "success")
     except Exception as e:
         mysql.connection.rollback()
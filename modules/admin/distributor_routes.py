@@ -1,10 +1,13 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from werkzeug.utils import secure_filename
 import os
+from modules.common.pagination import SortOption, PageRequest, fetch_page, cached_row
+from modules.common.search_index import record_search_change
 
 # These will be injected from app.py
 mysql = None
 bcrypt = None
+search_index = None
 
 # Define the Blueprint for distributor management module
 distributor_mgmt_bp = Blueprint(
@@ -15,14 +18,25 @@ distributor_mgmt_bp = Blueprint(
     static_url_path="/distributor_static"  # URL path for static files
 )
 
-# Distributor management route (view all distributors)
+# Rows are tuples here (template indexes distributor[0..]), so keys are column positions
+DISTRIBUTOR_SORTS = {
+    'id': SortOption('distributor_id', 0, 'Newest'),
+    'name': SortOption('distributor_name', 1, 'Name'),
+}
+
+# Distributor management route (view all distributors, keyset paginated)
 @distributor_mgmt_bp.route("/manage_distributors", methods=["GET"])
 def manage_distributors():
+    page_request = PageRequest.from_args(request.args, DISTRIBUTOR_SORTS, 'id')
     cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM distributor ORDER BY distributor_id DESC")
-    distributors = cur.fetchall()
+    total, districts = cached_row(cur, 'distributor', """
+        SELECT COUNT(*), COUNT(DISTINCT district) FROM distributor
+    """)
+    page = fetch_page(cur, "SELECT * FROM distributor", page_request,
+                      id_column='distributor_id', id_key=0, total=total)
     cur.close()
-    return render_template("manage_distributors.html", distributors=distributors)
+    return render_template("manage_distributors.html", distributors=page.items, page=page,
+                           sorts=DISTRIBUTOR_SORTS, stats={'districts': districts})
 
 # View single distributor details
 @distributor_mgmt_bp.route("/view_distributor/<int:distributor_id>", methods=["GET"])
@@ -81,7 +95,10 @@ def add_distributor():
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
                 (distributor_name, district, province, owner_name, contact_no, address, email, hashed_password, image_filename)
             )
+            new_distributor_id = cur.lastrowid
+            record_search_change(cur, 'distributor', new_distributor_id)
             mysql.connection.commit()
+            search_index.refresh('distributor', new_distributor_id)
             flash("Distributor added successfully", "success")
             return redirect(url_for("distributor_mgmt.manage_distributors"))
         except Exception as e:
@@ -145,7 +162,9 @@ def update_distributor(distributor_id):
                 (distributor_name, district, province, owner_name, contact_no, 
                  address, email, hashed_password, image_filename, distributor_id)
             )
+            record_search_change(cur, 'distributor', distributor_id)
             mysql.connection.commit()
+            search_index.refresh('distributor', distributor_id)
             flash("Distributor updated successfully", "success")
             return redirect(url_for("distributor_mgmt.manage_distributors"))
         except Exception as e:
@@ -162,7 +181,9 @@ def delete_distributor(distributor_id):
     cur = mysql.connection.cursor()
     try:
         cur.execute("DELETE FROM distributor WHERE distributor_id = %s", (distributor_id,))
+        record_search_change(cur, 'distributor', distributor_id)
         mysql.connection.commit()
+        search_index.remove('distributor', distributor_id)
         flash("Distributor deleted successfully", "success")
     except Exception as e:
         mysql.connection.rollback()
@@ -0,0 +1,218 @@
+"""
+Admin Message Routes
+Inbox of order conversations across all distributors, read from the
+message_threads summary (one row per order) with keyset pagination, and a
+thread view to read and answer a distributor's questions. A side panel
+shows each distributor's open questions and their unread admin replies
+(message_unread_counters).
+"""
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+import MySQLdb
+from modules.common.pagination import SortOption, PageRequest, fetch_page
+from modules.common.notifications import record_notification
+
+# Injected from app.py
+mysql = None
+notifications = None
+
+message_mgmt_bp = Blueprint(
+    'message_mgmt',
+    __name__,
+    template_folder='templates',
+    static_folder='static',
+    static_url_path='/admin_static'
+)
+
+# Most recent messages shown on a thread page
+THREAD_MESSAGES = 200
+
+THREAD_SELECT = """
+    SELECT
+        t.order_id,
+        t.distributor_id,
+        COALESCE(d.distributor_name, 'Unknown Distributor') as distributor_name,
+        t.message_count,
+        t.open_questions,
+        t.awaiting_reply,
+        t.last_question,
+        t.last_question_at,
+        t.last_message_at,
+        o.status
+    FROM message_threads t
+    LEFT JOIN distributor d ON t.distributor_id = d.distributor_id
+    LEFT JOIN orders o ON t.order_id = o.order_id
+"""
+
+# dir=asc on the awaiting box lists the longest-waiting questions first
+THREAD_SORTS = {
+    'question': SortOption('t.last_question_at', 'last_question_at', 'Last Question'),
+    'activity': SortOption('t.last_message_at', 'last_message_at', 'Last Activity'),
+}
+
+
+def check_admin_session():
+    """Check if admin is logged in"""
+    return 'user_id' in session
+
+
+def _distributor_filter(args):
+    try:
+        distributor_id = int(args.get('distributor_id') or 0)
+    except (TypeError, ValueError):
+        return None
+    return distributor_id or None
+
+
+@message_mgmt_bp.route('/messages')
+def inbox():
+    """Order threads, those awaiting a reply first (?box=all for every thread)"""
+    if not check_admin_session():
+        flash("Please log in as admin first", "error")
+        return redirect('/admin/login')
+
+    box = 'all' if request.args.get('box') == 'all' else 'awaiting'
+    distributor_id = _distributor_filter(request.args)
+    page_request = PageRequest.from_args(request.args, THREAD_SORTS,
+                                         'question' if box == 'awaiting' else 'activity')
+
+    where, params = [], []
+    if box == 'awaiting':
+        where.append("t.awaiting_reply = 1")
+    if distributor_id:
+        where.append("t.distributor_id = %s")
+        params.append(distributor_id)
+    extra_args = {'box': box}
+    if distributor_id:
+        extra_args['distributor_id'] = distributor_id
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        page = fetch_page(cur, THREAD_SELECT, page_request,
+                          id_column='t.order_id', id_key='order_id',
+                          where=where, params=params, extra_args=extra_args)
+
+        # Open questions per distributor: only threads awaiting a reply are read
+        cur.execute("""
+            SELECT t.distributor_id,
+                   COALESCE(MAX(d.distributor_name), 'Unknown Distributor') as distributor_name,
+                   COUNT(*) as threads,
+                   SUM(t.open_questions) as open_questions
+            FROM message_threads t
+            LEFT JOIN distributor d ON t.distributor_id = d.distributor_id
+            WHERE t.awaiting_reply = 1
+            GROUP BY t.distributor_id
+            ORDER BY open_questions DESC, t.distributor_id
+        """)
+        distributors = cur.fetchall()
+
+        # Admin replies each distributor has not read yet: the per-distributor
+        # total rows (order_id 0) of the unread counters
+        cur.execute("""
+            SELECT c.distributor_id,
+                   COALESCE(d.distributor_name, 'Unknown Distributor') as distributor_name,
+                   c.unread
+            FROM message_unread_counters c
+            LEFT JOIN distributor d ON c.distributor_id = d.distributor_id
+            WHERE c.order_id = 0 AND c.unread > 0
+            ORDER BY c.unread DESC, c.distributor_id
+        """)
+        unread = cur.fetchall()
+    except Exception as e:
+        print(f"Error in message inbox: {str(e)}")
+        flash("Error loading messages", "error")
+        page, distributors, unread = None, [], []
+    finally:
+        cur.close()
+
+    return render_template('admin_messages.html',
+                           page=page,
+                           threads=page.items if page else [],
+                           sorts=THREAD_SORTS,
+                           distributors=distributors,
+                           unread=unread,
+                           box=box,
+                           distributor_id=distributor_id,
+                           open_total=sum(row['open_questions'] or 0 for row in distributors))
+
+
+@message_mgmt_bp.route('/messages/<int:order_id>')
+def view_thread(order_id):
+    """One order's conversation; the distributor's questions are marked read"""
+    if not check_admin_session():
+        flash("Please log in as admin first", "error")
+        return redirect('/admin/login')
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        cur.execute(THREAD_SELECT + " WHERE t.order_id = %s", (order_id,))
+        thread = cur.fetchone()
+        if not thread:
+            flash("No messages for this order", "error")
+            return redirect(url_for('message_mgmt.inbox'))
+
+        cur.execute("""
+            SELECT message_id, admin_id, message, message_type, created_at, is_read
+            FROM messages
+            WHERE order_id = %s
+            ORDER BY message_id DESC
+            LIMIT %s
+        """, (order_id, THREAD_MESSAGES))
+        messages = list(cur.fetchall())
+        messages.reverse()
+
+        cur.execute("""
+            UPDATE messages
+            SET is_read = 1
+            WHERE order_id = %s AND admin_id IS NULL AND is_read = 0
+        """, (order_id,))
+        mysql.connection.commit()
+    except Exception as e:
+        mysql.connection.rollback()
+        print(f"Error in view_thread: {str(e)}")
+        flash("Error loading messages", "error")
+        return redirect(url_for('message_mgmt.inbox'))
+    finally:
+        cur.close()
+
+    return render_template('view_message.html',
+                           thread=thread,
+                           messages=messages,
+                           truncated=thread['message_count'] > len(messages))
+
+
+@message_mgmt_bp.route('/messages/<int:order_id>/reply', methods=['POST'])
+def reply(order_id):
+    """Answer a thread; the reply reaches the distributor through the notification outbox"""
+    if not check_admin_session():
+        flash("Please log in as admin first", "error")
+        return redirect('/admin/login')
+
+    message = request.form.get('message', '').strip()
+    if not message:
+        flash("Message cannot be empty", "error")
+        return redirect(url_for('message_mgmt.view_thread', order_id=order_id))
+    if not notifications.ready():
+        flash("⚠️ Message could not be sent. Notification tables may not exist.", "error")
+        return redirect(url_for('message_mgmt.view_thread', order_id=order_id))
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        cur.execute("SELECT distributor_id FROM orders WHERE order_id = %s", (order_id,))
+        order = cur.fetchone()
+        if not order:
+            flash("Order not found", "error")
+            return redirect(url_for('message_mgmt.inbox'))
+
+        record_notification(cur, order_id, order['distributor_id'], session.get('admin_id', 1),
+                            message, 'general')
+        mysql.connection.commit()
+        notifications.kick()
+        flash("📧 Reply sent to distributor!", "success")
+    except Exception as e:
+        mysql.connection.rollback()
+        print(f"Error in message reply: {str(e)}")
+        flash(f"Error sending message: {str(e)}", "error")
+    finally:
+        cur.close()
+
+    return redirect(url_for('message_mgmt.view_thread', order_id=order_id))
@@ -1,9 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, render_template, stream_template, request, redirect, url_for, flash, session, jsonify, get_flashed_messages, current_app
 import MySQLdb
 from datetime import datetime
+from modules.common.pagination import SortOption, PageRequest, fetch_page, stream_rows, cached_rows
+from modules.common.order_acceptance import (accept_order_line, accept_order_lines, reject_order_lines,
+                                             pending_lines, roll_up_orders, AcceptError)
+from modules.common.notifications import record_notification
+from modules.common.exports import export_response
 
 # Injected from app.py
 mysql = None
+notifications = None
 
 # Create Blueprint for order management
 orderad_mgmt_bp = Blueprint(
@@ -48,101 +54,275 @@ def format_date_for_display(date_value):
 # ==========================================
 # HELPER FUNCTION TO GET ORDERS DATA
 # ==========================================
-def get_orders_with_details(filter_status=None):
-    """Fetch orders with real distributor and product details"""
+ORDER_SORTS = {
+    'date': SortOption('o.order_date', 'order_date', 'Order Date'),
+    'id': SortOption('oi.order_item_id', 'order_item_id', 'Order ID'),
+}
+
+# Status-filtered views filter on order_items, so they also sort there:
+# lines are inserted with their order, so the line id follows order_date
+# (lines added by a later edit sort as of the edit) and
+# idx_order_items_status (status, order_item_id) serves the page directly.
+FILTERED_ORDER_SORTS = {
+    'date': SortOption('oi.order_item_id', 'order_item_id', 'Order Date'),
+    'id': ORDER_SORTS['id'],
+}
+
+def order_sorts(filter_status):
+    """Sort options for the all / one-status views"""
+    return FILTERED_ORDER_SORTS if filter_status and filter_status != 'all' else ORDER_SORTS
+
+def get_order_stats():
+    """Order line counts per status for the stat cards, one grouped query (cached briefly)"""
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    stats = {'total': 0, 'pending': 0, 'accepted': 0, 'rejected': 0}
+    try:
+        rows = cached_rows(cur, 'orders', """
+            SELECT status, COUNT(*) as line_count
+            FROM order_items
+            GROUP BY status
+        """)
+        for row in rows:
+            stats[row['status']] = int(row['line_count'])
+            stats['total'] += int(row['line_count'])
+    except Exception as e:
+        print(f"Error fetching order stats: {str(e)}")
+    finally:
+        cur.close()
+    return stats
+
+# {order_lines} / {line_counts}: how each row learns its order's line count
+_ORDER_SELECT = """
+    SELECT 
+        oi.order_item_id as order_id,
+        oi.order_item_id,
+        oi.order_id as original_order_id,
+        oi.product_id,
+        oi.product_name,
+        oi.category_name,
+        oi.unit_price,
+        oi.variant_size,
+        oi.quantity as requested_quantity,
+        oi.subtotal as total_price,
+        o.order_date,
+        o.distributor_id,
+        oi.status,
+        o.status as order_status,
+        {order_lines} as order_lines,
+        o.total_amount,
+        o.updated_quantity,
+        o.updated_total_price,
+        COALESCE(d.distributor_name, 'Unknown Distributor') as distributor_name,
+        COALESCE(d.email, '') as distributor_email,
+        COALESCE(d.contact_no, '') as distributor_phone,
+        COALESCE(d.district, '') as district,
+        COALESCE(d.province, '') as province,
+        COALESCE(ss.total_quantity, 0) as admin_stock
+    FROM order_items oi
+    INNER JOIN orders o ON oi.order_id = o.order_id
+    LEFT JOIN distributor d ON o.distributor_id = d.distributor_id
+    LEFT JOIN stock_summary ss ON ss.product_id = oi.product_id
+        AND ss.variant_size = COALESCE(oi.variant_size, '')
+    {line_counts}
+"""
+
+# Pages fill order_lines with one grouped query over their own orders
+ORDER_SELECT = _ORDER_SELECT.format(order_lines='NULL', line_counts='')
+
+# Streaming reads every line anyway: one grouped join over all orders
+ORDER_STREAM_SELECT = _ORDER_SELECT.format(
+    order_lines='COALESCE(siblings.line_count, 1)',
+    line_counts="""LEFT JOIN (SELECT order_id, COUNT(*) as line_count
+               FROM order_items
+               GROUP BY order_id) siblings ON siblings.order_id = oi.order_id""")
+
+def _status_filter(filter_status):
+    if filter_status and filter_status != 'all':
+        return ["oi.status = %s"], [filter_status]
+    return [], []
+
+def fill_order_lines(cur, orders):
+    """Set order_lines on a page of rows with one grouped query"""
+    order_ids = list({order['original_order_id'] for order in orders})
+    if not order_ids:
+        return
+    cur.execute(f"""
+        SELECT order_id, COUNT(*) as line_count
+        FROM order_items
+        WHERE order_id IN ({', '.join(['%s'] * len(order_ids))})
+        GROUP BY order_id
+    """, order_ids)
+    counts = {row['order_id']: row['line_count'] for row in cur.fetchall()}
+    for order in orders:
+        order['order_lines'] = counts.get(order['original_order_id'], 1)
+
+def format_order_row(order):
+    """Format date and ensure variant_size is not None"""
+    order['formatted_date'] = format_date_for_display(order.get('order_date'))
+    if not order.get('variant_size'):
+        order['variant_size'] = ''
+    return order
+
+def get_orders_with_details(filter_status=None, page_request=None, extra_args=None, total=None):
+    """
+    Fetch one keyset page of order lines with distributor and product details.
+    Returns a Page (iterates like the old list), or None on error.
+    """
+    if page_request is None:
+        page_request = PageRequest.from_args({}, order_sorts(filter_status), 'date')
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    orders = []
+    page = None
     
     try:
-        base_query = """
-            SELECT 
-                oi.order_item_id as order_id,
-                oi.order_item_id,
-                oi.order_id as original_order_id,
-                oi.product_id,
-                oi.product_name,
-                oi.category_name,
-                oi.unit_price,
-                oi.variant_size,
-                oi.quantity as requested_quantity,
-                oi.subtotal as total_price,
-                o.order_date,
-                o.distributor_id,
-                o.status,
-                o.total_amount,
-                o.updated_quantity,
-                o.updated_total_price,
-                COALESCE(d.distributor_name, 'Unknown Distributor') as distributor_name,
-                COALESCE(d.email, '') as distributor_email,
-                COALESCE(d.contact_no, '') as distributor_phone,
-                COALESCE(d.district, '') as district,
-                COALESCE(d.province, '') as province,
-                COALESCE(s.quantity, 0) as admin_stock,
-                s.stock_id
-            FROM order_items oi
-            INNER JOIN orders o ON oi.order_id = o.order_id
-            LEFT JOIN distributor d ON o.distributor_id = d.distributor_id
-            LEFT JOIN stock s ON oi.product_id = s.product_id 
-                AND oi.variant_size = s.variant_size
-        """
-        
-        # Filter by status
-        if filter_status and filter_status != 'all':
-            base_query += " WHERE o.status = %s"
-        
-        base_query += " ORDER BY o.order_date DESC, oi.order_item_id DESC"
+        where, params = _status_filter(filter_status)
+        page = fetch_page(cur, ORDER_SELECT, page_request,
+                          id_column='oi.order_item_id', id_key='order_item_id',
+                          where=where, params=params, total=total, extra_args=extra_args)
         
-        if filter_status and filter_status != 'all':
-            cur.execute(base_query, (filter_status,))
-        else:
-            cur.execute(base_query)
-            
-        orders = cur.fetchall()
+        fill_order_lines(cur, page.items)
         
-        # Format dates and ensure variant_size is not None
-        for order in orders:
-            order['formatted_date'] = format_date_for_display(order.get('order_date'))
-            if not order.get('variant_size'):
-                order['variant_size'] = ''
+        # Format only this page's rows
+        for order in page.items:
+            format_order_row(order)
             
     except Exception as e:
         print(f"Error fetching orders: {str(e)}")
     finally:
         cur.close()
     
-    return orders
+    return page
+
+def iter_all_orders(filter_status, page_request):
+    """
+    Every matching order line, formatted, off an unbuffered cursor. Runs
+    while the response streams, on a connection checked out from the
+    context stream_template re-pushes.
+    """
+    where, params = _status_filter(filter_status)
+    cur = mysql.connection.cursor(MySQLdb.cursors.SSDictCursor)
+    for order in stream_rows(cur, ORDER_STREAM_SELECT, page_request, id_column='oi.order_item_id',
+                             where=where, params=params):
+        yield format_order_row(order)
+
+def stream_orders_page(filter_status, page_request, stats):
+    """Render every matching order line on one page (?all=1)"""
+    # Pop flashes now: the session cookie can't change once headers are sent
+    get_flashed_messages(with_categories=True)
+    return stream_template('manage_adorders.html',
+                           orders=iter_all_orders(filter_status, page_request),
+                           streaming=True,
+                           stats=stats,
+                           filtered_status=filter_status)
+
+# Exports skip the availability join: one row per order line, nothing to render
+ORDER_EXPORT_SELECT = """
+    SELECT 
+        oi.order_item_id,
+        oi.order_id,
+        o.order_date,
+        oi.status,
+        o.distributor_id,
+        COALESCE(d.distributor_name, 'Unknown Distributor') as distributor_name,
+        COALESCE(d.district, '') as district,
+        oi.product_id,
+        oi.product_name,
+        oi.category_name,
+        oi.variant_size,
+        oi.quantity,
+        oi.unit_price,
+        oi.subtotal,
+        o.updated_quantity,
+        o.updated_total_price
+    FROM order_items oi
+    INNER JOIN orders o ON oi.order_id = o.order_id
+    LEFT JOIN distributor d ON o.distributor_id = d.distributor_id
+"""
+
+ORDER_EXPORT_COLUMNS = [
+    ('Order Line', 'order_item_id'),
+    ('Order', 'order_id'),
+    ('Order Date', 'order_date'),
+    ('Status', 'status'),
+    ('Distributor ID', 'distributor_id'),
+    ('Distributor', 'distributor_name'),
+    ('District', 'district'),
+    ('Product ID', 'product_id'),
+    ('Product', 'product_name'),
+    ('Category', 'category_name'),
+    ('Variant', 'variant_size'),
+    ('Quantity', 'quantity'),
+    ('Unit Price', 'unit_price'),
+    ('Subtotal', 'subtotal'),
+    ('Approved Quantity', 'updated_quantity'),
+    ('Approved Total', 'updated_total_price'),
+]
+
+def iter_export_orders(filter_status, page_request):
+    """Order lines for export, straight off an unbuffered cursor"""
+    where, params = _status_filter(filter_status)
+    cur = mysql.connection.cursor(MySQLdb.cursors.SSDictCursor)
+    yield from stream_rows(cur, ORDER_EXPORT_SELECT, page_request, id_column='oi.order_item_id',
+                           where=where, params=params)
 
 # ==========================================
 # SEND MESSAGE TO DISTRIBUTOR
 # ==========================================
 def send_message_to_distributor(order_id, distributor_id, message_text, message_type='general'):
-    """Send a message to distributor"""
+    """Queue a message to the distributor and commit it"""
+    if not notifications.ready():
+        return False
     admin_id = session.get('admin_id', 1)
     cur = mysql.connection.cursor()
     
     try:
-        # Check if messages table exists
-        cur.execute("SHOW TABLES LIKE 'messages'")
-        table_exists = cur.fetchone()
-        
-        if table_exists:
-            cur.execute("""
-                INSERT INTO messages (order_id, distributor_id, admin_id, message, message_type, created_at, is_read)
-                VALUES (%s, %s, %s, %s, %s, NOW(), 0)
-            """, (order_id, distributor_id, admin_id, message_text, message_type))
-            mysql.connection.commit()
-            return True
-        else:
-            print("Messages table does not exist")
-            return False
+        record_notification(cur, order_id, distributor_id, admin_id, message_text, message_type)
+        mysql.connection.commit()
+        notifications.kick()
+        return True
     except Exception as e:
         print(f"Error sending message: {str(e)}")
         mysql.connection.rollback()
         return False
     finally:
         cur.close()
-    
-    return False
+
+# Set once the missing-notifications warning has been logged
+_warned_no_notifications = False
+
+def _notify(build):
+    """message_for callback for order acceptance, or None while notifications are unavailable"""
+    global _warned_no_notifications
+    if notifications.ready():
+        return build
+    if not _warned_no_notifications:
+        _warned_no_notifications = True
+        current_app.logger.warning("Notification tables unavailable; order accept/reject will proceed "
+                                   "without notifying the distributor")
+    return None
+
+def _product_display(line):
+    product_display = f"{line['product_name']}"
+    if line.get('variant_size'):
+        product_display += f" ({line['variant_size']})"
+    return product_display
+
+def accept_message(line, note=''):
+    """Distributor message for an accepted line (accept_order_line result)"""
+    quantity = line['quantity']
+    text = f"✅ ORDER ACCEPTED\n\nYour order has been approved!\n\nProduct: {_product_display(line)}\nApproved Quantity: {quantity} units\nTotal Amount: Rs. {line['total']:.2f}\n\n{quantity} units have been added to your inventory.\n\nYour order will be processed and shipped soon."
+    if note:
+        text += f"\n\nAdmin Note: {note}"
+    return text
+
+def reject_message(line, note=''):
+    """Distributor message for a rejected line"""
+    text = f"❌ ORDER REJECTED\n\nWe regret to inform you that your order has been rejected.\n\nProduct: {_product_display(line)}\nRequested Quantity: {line['quantity']} units"
+    if note:
+        text += f"\n\nReason: {note}"
+    else:
+        text += f"\n\nReason: Unable to fulfill at this time."
+    text += "\n\nPlease contact us if you have any questions."
+    return text
 
 # ==========================================
 # ADMIN ORDER MANAGEMENT ROUTES
@@ -156,9 +336,16 @@ def manage_adorders():
         return redirect('/admin/login')
     
     try:
-        orders = get_orders_with_details()
+        stats = get_order_stats()
+        page_request = PageRequest.from_args(request.args, ORDER_SORTS, 'date')
+        if request.args.get('all') == '1' and stats['total']:
+            return stream_orders_page(None, page_request, stats)
+        page = get_orders_with_details(page_request=page_request, total=stats['total'])
         return render_template('manage_adorders.html', 
-                              orders=orders,
+                              orders=page.items if page else [],
+                              page=page,
+                              sorts=ORDER_SORTS,
+                              stats=stats,
                               filtered_status=None)
     except Exception as e:
         print(f"Error in manage_adorders: {str(e)}")
@@ -179,15 +366,43 @@ def filter_orders(status):
         return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
     
     try:
-        orders = get_orders_with_details(status if status != 'all' else None)
+        stats = get_order_stats()
+        sorts = order_sorts(status)
+        page_request = PageRequest.from_args(request.args, sorts, 'date')
+        if request.args.get('all') == '1' and stats['total']:
+            return stream_orders_page(status if status != 'all' else None, page_request, stats)
+        page = get_orders_with_details(status if status != 'all' else None,
+                                       page_request=page_request,
+                                       extra_args={'status': status},
+                                       total=stats['total'] if status == 'all' else stats.get(status))
         return render_template('manage_adorders.html', 
-                              orders=orders,
+                              orders=page.items if page else [],
+                              page=page,
+                              sorts=sorts,
+                              stats=stats,
                               filtered_status=status if status != 'all' else None)
     except Exception as e:
         print(f"Error in filter_orders: {str(e)}")
         flash("Error filtering orders", "error")
         return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
 
+@orderad_mgmt_bp.route('/export_orders')
+def export_orders():
+    """Download the order list (optionally one status) as CSV / XLSX"""
+    if not check_admin_session():
+        flash("Please log in as admin first", "error")
+        return redirect('/admin/login')
+    
+    status = request.args.get('status', 'all')
+    if status not in ['pending', 'accepted', 'rejected', 'all']:
+        flash("Invalid status filter", "error")
+        return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
+    
+    page_request = PageRequest.from_args(request.args, order_sorts(status), 'date')
+    filename = 'orders' if status == 'all' else f"orders_{status}"
+    return export_response(request.args.get('format', 'csv'), filename, ORDER_EXPORT_COLUMNS,
+                           iter_export_orders(status, page_request))
+
 @orderad_mgmt_bp.route('/update_order/<int:order_id>', methods=["POST"])
 def update_order(order_id):
     """Update order status (accept, reject, pending) - WITH DISTRIBUTOR STOCK UPDATE"""
@@ -211,15 +426,10 @@ def update_order(order_id):
             SELECT 
                 oi.*,
                 o.distributor_id,
-                o.status as current_status,
-                o.order_id as original_order_id,
-                s.quantity as current_stock,
-                s.unit_price as stock_price,
-                s.stock_id
+                oi.status as current_status,
+                o.order_id as original_order_id
             FROM order_items oi
             INNER JOIN orders o ON oi.order_id = o.order_id
-            LEFT JOIN stock s ON oi.product_id = s.product_id 
-                AND oi.variant_size = s.variant_size
             WHERE oi.order_item_id = %s
         """, (order_id,))
         
@@ -229,141 +439,44 @@ def update_order(order_id):
             flash("Order not found", "error")
             return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
         
-        distributor_id = order.get('distributor_id')
         original_order_id = order.get('original_order_id')
-        current_stock = order.get('current_stock', 0)
-        stock_id = order.get('stock_id')
-        product_id = order.get('product_id')
-        product_name = order.get('product_name', 'Product')
-        variant_size = order.get('variant_size') or ''
         
         # Handle different actions
         if action == 'pending':
-            # Set order back to pending
+            # Set the line back to pending; its order follows
             cur.execute("""
-                UPDATE orders 
+                UPDATE order_items 
                 SET status = 'pending'
-                WHERE order_id = %s
-            """, (original_order_id,))
+                WHERE order_item_id = %s
+            """, (order_id,))
+            roll_up_orders(cur, [original_order_id])
             mysql.connection.commit()
             flash("✏️ Order status updated to Pending", "success")
             
         elif action == 'accept':
-            # Get and validate quantity
-            if not quantity or int(quantity) <= 0:
-                accept_quantity = order.get('quantity', 1)
-            else:
-                accept_quantity = int(quantity)
-            
-            # Check stock availability
-            if not stock_id:
-                flash("❌ Stock not found for this product!", "error")
+            # Stock check, decrement, distributor stock upsert and the
+            # distributor's notification in one locked transaction (retried
+            # on deadlock); nothing to oversell
+            try:
+                accepted = accept_order_line(mysql.connection, order_id, quantity,
+                                             session.get('admin_id', 1),
+                                             _notify(lambda line: accept_message(line, message)))
+            except AcceptError as e:
+                flash(f"❌ {e}", "error")
                 return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
-                
-            if current_stock < accept_quantity:
-                flash(f"❌ Insufficient stock! Available: {current_stock}, Requested: {accept_quantity}", "error")
-                return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
-            
-            # Calculate total price
-            unit_price = order.get('stock_price') or order.get('unit_price', 0)
-            new_total = float(unit_price) * accept_quantity
-            
-            # Update order_items
-            cur.execute("""
-                UPDATE order_items 
-                SET quantity = %s, 
-                    subtotal = %s
-                WHERE order_item_id = %s
-            """, (accept_quantity, new_total, order_id))
-            
-            # Update orders table
-            cur.execute("""
-                UPDATE orders 
-                SET status = 'accepted',
-                    updated_quantity = %s,
-                    updated_total_price = %s,
-                    total_amount = %s
-                WHERE order_id = %s
-            """, (accept_quantity, new_total, new_total, original_order_id))
-            
-            # Update admin stock - REDUCE quantity
-            cur.execute("""
-                UPDATE stock 
-                SET quantity = quantity - %s
-                WHERE stock_id = %s
-            """, (accept_quantity, stock_id))
-            
-            # *** ADD TO DISTRIBUTOR'S STOCK ***
-            # Check if distributor already has this product
-            cur.execute("""
-                SELECT stock_id, quantity 
-                FROM distributor_stock 
-                WHERE distributor_id = %s 
-                  AND product_id = %s 
-                  AND variant_size = %s
-            """, (distributor_id, product_id, variant_size))
-            
-            dist_stock = cur.fetchone()
-            
-            if dist_stock:
-                # Update existing distributor stock - ADD quantity
-                new_dist_qty = dist_stock['quantity'] + accept_quantity
-                cur.execute("""
-                    UPDATE distributor_stock 
-                    SET quantity = %s,
-                        unit_price = %s,
-                        last_updated = NOW()
-                    WHERE stock_id = %s
-                """, (new_dist_qty, unit_price, dist_stock['stock_id']))
-            else:
-                # Create new distributor stock entry
-                cur.execute("""
-                    INSERT INTO distributor_stock 
-                    (distributor_id, product_id, variant_size, quantity, unit_price)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (distributor_id, product_id, variant_size, accept_quantity, unit_price))
-            
-            mysql.connection.commit()
-            
-            # Send message to distributor
-            product_display = f"{product_name}"
-            if variant_size:
-                product_display += f" ({variant_size})"
-                
-            default_message = f"✅ ORDER ACCEPTED\n\nYour order has been approved!\n\nProduct: {product_display}\nApproved Quantity: {accept_quantity} units\nTotal Amount: Rs. {new_total:.2f}\n\n{accept_quantity} units have been added to your inventory.\n\nYour order will be processed and shipped soon."
-            
-            if message:
-                default_message += f"\n\nAdmin Note: {message}"
-            
-            send_message_to_distributor(original_order_id, distributor_id, default_message, 'accept')
+            notifications.kick()
+            accept_quantity = accepted['quantity']
             
             flash(f"✅ Order accepted! {accept_quantity} units added to distributor's stock. Admin stock reduced by {accept_quantity} units.", "success")
             
         elif action == 'reject':
-            # Reject order
-            cur.execute("""
-                UPDATE orders 
-                SET status = 'rejected'
-                WHERE order_id = %s
-            """, (original_order_id,))
-            
-            mysql.connection.commit()
-            
-            # Send rejection message
-            product_display = f"{product_name}"
-            if variant_size:
-                product_display += f" ({variant_size})"
-                
-            default_message = f"❌ ORDER REJECTED\n\nWe regret to inform you that your order has been rejected.\n\nProduct: {product_display}\nRequested Quantity: {order.get('quantity')} units"
-            
-            if message:
-                default_message += f"\n\nReason: {message}"
-            else:
-                default_message += f"\n\nReason: Unable to fulfill at this time."
-            
-            default_message += "\n\nPlease contact us if you have any questions."
-            
-            send_message_to_distributor(original_order_id, distributor_id, default_message, 'reject')
+            # Line status, order roll-up and the rejection message in one transaction
+            rejected = reject_order_lines(mysql.connection, [order_id], session.get('admin_id', 1),
+                                          _notify(lambda line: reject_message(line, message)))[0]
+            if not rejected['ok']:
+                flash(f"❌ {rejected['error']}", "error")
+                return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
+            notifications.kick()
             
             flash("❌ Order rejected. Message sent to distributor.", "success")
         
@@ -379,6 +492,70 @@ def update_order(order_id):
     
     return redirect(url_for('orderad_mgmt_bp.manage_adorders'))
 
+@orderad_mgmt_bp.route('/bulk_update_orders', methods=["POST"])
+def bulk_update_orders():
+    """
+    Accept or reject the selected order lines in one transaction. Whole
+    orders can be selected too (original_order_ids): all their pending lines.
+    """
+    if not check_admin_session():
+        flash("Please log in as admin first", "error")
+        return redirect('/admin/login')
+    
+    action = request.form.get('action')
+    message = request.form.get('message', '').strip()
+    wants_json = request.args.get('format') == 'json'
+    back = request.form.get('next') or url_for('orderad_mgmt_bp.manage_adorders')
+    if not back.startswith('/') or back.startswith('//'):
+        back = url_for('orderad_mgmt_bp.manage_adorders')
+    
+    try:
+        order_ids = {int(value) for value in request.form.getlist('order_ids')}
+        whole_orders = {int(value) for value in request.form.getlist('original_order_ids')}
+    except ValueError:
+        order_ids, whole_orders = set(), set()
+    if whole_orders:
+        order_ids.update(pending_lines(mysql.connection, whole_orders))
+    order_ids = sorted(order_ids)
+    if action not in ('accept', 'reject') or not order_ids:
+        if wants_json:
+            return jsonify({'error': 'Select order lines and accept or reject'}), 400
+        flash("Select at least one order line, then Accept or Reject", "error")
+        return redirect(back)
+    
+    admin_id = session.get('admin_id', 1)
+    try:
+        if action == 'accept':
+            # Optional per-line quantity_<order_item_id>; blank = as ordered
+            quantities = {order_id: request.form.get(f"quantity_{order_id}", '').strip()
+                          for order_id in order_ids}
+            results = accept_order_lines(mysql.connection, quantities, admin_id,
+                                         _notify(lambda line: accept_message(line, message)))
+        else:
+            results = reject_order_lines(mysql.connection, order_ids, admin_id,
+                                         _notify(lambda line: reject_message(line, message)))
+        notifications.kick()
+    except Exception as e:
+        print(f"Error in bulk_update_orders: {str(e)}")
+        if wants_json:
+            return jsonify({'error': str(e)}), 400 if isinstance(e, AcceptError) else 500
+        flash(f"Error updating orders: {str(e)}", "error")
+        return redirect(back)
+    
+    done = [result for result in results if result['ok']]
+    failed = [result for result in results if not result['ok']]
+    if wants_json:
+        return jsonify({'action': action, 'processed': len(done), 'failed': len(failed), 'results': results})
+    
+    verb = 'accepted' if action == 'accept' else 'rejected'
+    if done:
+        flash(f"✅ {len(done)} order line{'s' if len(done) != 1 else ''} {verb}.", "success")
+    for result in failed[:10]:
+        flash(f"❌ #{result['order_item_id']}: {result['error']}", "error")
+    if len(failed) > 10:
+        flash(f"❌ {len(failed) - 10} more order lines could not be {verb}.", "error")
+    return redirect(back)
+
 @orderad_mgmt_bp.route('/send_message/<int:order_id>', methods=["POST"])
 def send_custom_message(order_id):
     """Send a custom message to distributor"""
@@ -412,7 +589,7 @@ def send_custom_message(order_id):
             if success:
                 flash("📧 Message sent successfully to distributor!", "success")
             else:
-                flash("⚠️ Message could not be sent. Messages table may not exist.", "error")
+                flash("⚠️ Message could not be sent. Notification tables may not exist.", "error")
         else:
             flash("Order not found", "error")
             
@@ -0,0 +1,58 @@
+"""
+Admin Performance Routes
+Shows per-endpoint database cost collected by the SQL profiler
+"""
+from flask import Blueprint, render_template, redirect, url_for, flash, session, jsonify, request
+
+# Injected from app.py
+mysql = None
+profiler = None
+catalog = None
+
+perf_mgmt_bp = Blueprint(
+    'perf_mgmt',
+    __name__,
+    template_folder='templates',
+    static_folder='static',
+    static_url_path='/admin_static'
+)
+
+
+def check_admin_session():
+    """Check if admin is logged in"""
+    return 'user_id' in session
+
+
+@perf_mgmt_bp.route('/_perf')
+def perf_dashboard():
+    """Endpoints ranked by total DB time since startup (or last reset)"""
+    if not check_admin_session():
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+
+    endpoints = profiler.ranked() if profiler else []
+    pool_stats = mysql.stats() if mysql else {}
+    catalog_stats = catalog.stats() if catalog else {}
+
+    if request.args.get('format') == 'json':
+        return jsonify({'endpoints': endpoints, 'pool': pool_stats, 'catalog_cache': catalog_stats})
+
+    return render_template('perf.html',
+                           endpoints=endpoints,
+                           pool_stats=pool_stats,
+                           catalog_stats=catalog_stats,
+                           username=session.get('username'))
+
+
+@perf_mgmt_bp.route('/_perf/reset', methods=['POST'])
+def perf_reset():
+    if not check_admin_session():
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+
+    if profiler:
+        profiler.reset()
+    if catalog:
+        catalog.reset_stats()
+    flash("Performance counters reset.", "success")
+    return redirect(url_for('perf_mgmt.perf_dashboard'))
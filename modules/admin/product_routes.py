@@ -2,28 +2,42 @@ import MySQLdb
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from werkzeug.utils import secure_filename
 import os
+from modules.common.pagination import SortOption, PageRequest, fetch_page, cached_row
+from modules.common.name_sync import record_name_change
+from modules.common.catalog_cache import record_catalog_change
+from modules.common.search_index import record_search_change
 
 # These will be injected from app.py
 mysql = None
 bcrypt = None
+search_index = None
+name_sync = None
+catalog = None
 
 # Initialize the blueprint for product management
 product_mgmt_bp = Blueprint('product_mgmt', __name__, template_folder='templates', static_folder='static')
 
-# Routes for managing products
+PRODUCT_SORTS = {
+    'id': SortOption('p.product_id', 'product_id', 'Newest'),
+    'name': SortOption('p.product_name', 'product_name', 'Name'),
+    'price': SortOption('p.unit_price', 'unit_price', 'Price'),
+}
+
+# Routes for managing products (keyset paginated)
 @product_mgmt_bp.route('/manage_products')
 def manage_products():
+    page_request = PageRequest.from_args(request.args, PRODUCT_SORTS, 'id')
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)  # Using DictCursor
-    cur.execute("""
+    total = cached_row(cur, 'products', "SELECT COUNT(*) AS total FROM products")['total']
+    page = fetch_page(cur, """
         SELECT p.product_id, p.product_name, c.category_name, p.unit_price, 
                p.variant_size, p.shelf_life_days, p.product_image
         FROM products p
         JOIN category c ON p.category_id = c.category_id
-        ORDER BY p.product_id DESC
-    """)
-    products = cur.fetchall()
+    """, page_request, id_column='p.product_id', id_key='product_id', total=total)
     cur.close()
-    return render_template('manage_products.html', products=products)
+    return render_template('manage_products.html', products=page.items, page=page,
+                           sorts=PRODUCT_SORTS)
 
 # View single product details
 @product_mgmt_bp.route('/view_product/<int:product_id>', methods=['GET'])
@@ -47,10 +61,9 @@ def view_product(product_id):
 
 @product_mgmt_bp.route('/add_product', methods=['GET', 'POST'])
 def add_product():
-    # Fetch categories from the database to populate the dropdown
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT category_id, category_name FROM category")
-    categories = cur.fetchall()
+    # Categories for the dropdown (cached)
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    categories = catalog.categories(cur)
     cur.close()
 
     if request.method == 'POST':
@@ -81,7 +94,12 @@ def add_product():
                 (product_name, category_id, unit_price, variant_size, shelf_life_days, product_image)
                 VALUES (%s, %s, %s, %s, %s, %s)""",
                 (product_name, category_id, unit_price, variant_size, shelf_life_days, image_filename))
+            new_product_id = cur.lastrowid
+            record_catalog_change(cur, 'product', new_product_id, category_id)
+            record_search_change(cur, 'product', new_product_id)
             mysql.connection.commit()
+            catalog.invalidate_product(new_product_id, category_id)
+            search_index.refresh('product', new_product_id)
             flash("Product added successfully!", "success")
             return redirect(url_for('product_mgmt.manage_products'))
         except Exception as e:
@@ -106,10 +124,9 @@ def update_product(product_id):
         flash("Product not found", "error")
         return redirect(url_for('product_mgmt.manage_products'))
 
-    # Fetch categories to populate the category dropdown
+    # Categories for the dropdown (cached)
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT category_id, category_name FROM category")
-    categories = cur.fetchall()
+    categories = catalog.categories(cur)
     cur.close()
 
     if request.method == 'POST':
@@ -138,7 +155,18 @@ def update_product(product_id):
                 variant_size = %s, shelf_life_days = %s, product_image = %s
                 WHERE product_id = %s""",
                 (product_name, category_id, unit_price, variant_size, shelf_life_days, image_filename, product_id))
+            renamed = (product_name != product['product_name']
+                       or str(category_id) != str(product['category_id']))
+            if renamed:
+                # Copies on stock / orders / sales are updated in the background
+                record_name_change(cur, 'product', product_id)
+            record_catalog_change(cur, 'product', product_id, category_id)
+            record_search_change(cur, 'product', product_id)
             mysql.connection.commit()
+            if renamed:
+                name_sync.kick()
+            catalog.invalidate_product(product_id, category_id)
+            search_index.refresh('product', product_id)
             flash("Product updated successfully!", "success")
             return redirect(url_for('product_mgmt.manage_products'))
         except Exception as e:
@@ -155,7 +183,11 @@ def delete_product(product_id):
     cur = mysql.connection.cursor()
     try:
         cur.execute("DELETE FROM products WHERE product_id = %s", (product_id,))
+        record_catalog_change(cur, 'product', product_id)
+        record_search_change(cur, 'product', product_id)
         mysql.connection.commit()
+        catalog.invalidate_product(product_id)
+        search_index.remove('product', product_id)
         flash("Product deleted successfully", "success")
     except Exception as e:
         mysql.connection.rollback()
@@ -0,0 +1,125 @@
+"""
+Admin Global Search
+One search box across stock, products, distributors and orders, answered
+from the in-process search index and fetched by primary key
+"""
+import re
+
+import MySQLdb
+from flask import Blueprint, render_template, redirect, url_for, flash, session, request, jsonify
+
+# Injected from app.py
+mysql = None
+search_index = None
+
+search_mgmt_bp = Blueprint(
+    'search_mgmt',
+    __name__,
+    template_folder='templates',
+    static_folder='static',
+    static_url_path='/admin_static'
+)
+
+# Results shown per section
+SECTION_LIMIT = 10
+ORDER_LIMIT = 20
+
+# Products / distributors an order search expands into
+ORDER_MATCH_LIMIT = 200
+
+_ORDER_ID_RE = re.compile(r'^#?(\d+)$')
+
+
+def check_admin_session():
+    """Check if admin is logged in"""
+    return 'user_id' in session
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def _fetch_by_ids(cur, sql, id_key, ids):
+    """Run ``sql`` (with an IN ({ids}) slot) and return rows in ``ids`` order"""
+    if not ids:
+        return []
+    cur.execute(sql.format(ids=_placeholders(ids)), ids)
+    rows = {row[id_key]: row for row in cur.fetchall()}
+    return [rows[i] for i in ids if i in rows]
+
+
+def search_orders(cur, query, product_ids, distributor_ids):
+    """Newest order lines for an order number or the matched products / distributors"""
+    conditions, params = [], []
+    match = _ORDER_ID_RE.match(query)
+    if match:
+        conditions.append("oi.order_item_id = %s OR oi.order_id = %s")
+        params += [match.group(1), match.group(1)]
+    if product_ids:
+        conditions.append(f"oi.product_id IN ({_placeholders(product_ids)})")
+        params += product_ids
+    if distributor_ids:
+        conditions.append(f"o.distributor_id IN ({_placeholders(distributor_ids)})")
+        params += distributor_ids
+    if not conditions:
+        return []
+
+    cur.execute(f"""
+        SELECT oi.order_item_id, oi.order_id, oi.product_name, oi.variant_size,
+               oi.quantity, oi.subtotal, oi.status, o.order_date,
+               COALESCE(d.distributor_name, 'Unknown Distributor') as distributor_name
+        FROM order_items oi
+        INNER JOIN orders o ON oi.order_id = o.order_id
+        LEFT JOIN distributor d ON o.distributor_id = d.distributor_id
+        WHERE {' OR '.join(f'({c})' for c in conditions)}
+        ORDER BY oi.order_item_id DESC
+        LIMIT %s
+    """, params + [ORDER_LIMIT])
+    return cur.fetchall()
+
+
+@search_mgmt_bp.route('/search')
+def global_search():
+    """Search box in the admin top bar"""
+    if not check_admin_session():
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+
+    query = request.args.get('q', '').strip()
+    results = {'stock': [], 'products': [], 'distributors': [], 'orders': []}
+
+    if query:
+        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            stock_ids = search_index.search('stock', query, SECTION_LIMIT)
+            product_ids = search_index.search('product', query, ORDER_MATCH_LIMIT)
+            distributor_ids = search_index.search('distributor', query, ORDER_MATCH_LIMIT)
+
+            results['stock'] = _fetch_by_ids(cur, """
+                SELECT stock_id, product_name, category_name, variant_size, quantity, unit_price
+                FROM stock WHERE stock_id IN ({ids})
+            """, 'stock_id', stock_ids)
+            results['products'] = _fetch_by_ids(cur, """
+                SELECT p.product_id, p.product_name, c.category_name, p.variant_size, p.unit_price
+                FROM products p
+                LEFT JOIN category c ON p.category_id = c.category_id
+                WHERE p.product_id IN ({ids})
+            """, 'product_id', product_ids[:SECTION_LIMIT])
+            results['distributors'] = _fetch_by_ids(cur, """
+                SELECT distributor_id, distributor_name, district, province, contact_no
+                FROM distributor WHERE distributor_id IN ({ids})
+            """, 'distributor_id', distributor_ids[:SECTION_LIMIT])
+            results['orders'] = search_orders(cur, query, product_ids, distributor_ids)
+        except Exception as e:
+            print(f"Error in global_search: {str(e)}")
+            flash("Search is unavailable right now.", "error")
+        finally:
+            cur.close()
+
+    if request.args.get('format') == 'json':
+        return jsonify({'query': query, 'results': results})
+
+    return render_template('search_results.html',
+                           query=query,
+                           results=results,
+                           username=session.get('username'))
@@ -1,9 +1,22 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, stream_template, request, redirect, url_for, flash, jsonify, get_flashed_messages, session
 import MySQLdb
 from datetime import datetime
+from modules.common.pagination import SortOption, PageRequest, fetch_page, stream_rows, cached_row
+from modules.common.stock_summary import refresh_stock_summary, stock_key
+from modules.common.stock_import import import_stock_file, ImportFileError, openpyxl, MAX_ROWS
+from modules.common.exports import export_response
+from modules.common.catalog_cache import document_response
+from modules.common.http_cache import conditional
+from modules.common.search_index import record_search_change
 
 # Injected from app.py
 mysql = None
+search_index = None
+backfill = None
+catalog = None
+
+# Most ranked matches search_stock shows
+SEARCH_RESULTS_LIMIT = 200
 
 # Create Blueprint for stock management
 stock_mgmt_bp = Blueprint(
@@ -17,115 +30,145 @@ stock_mgmt_bp = Blueprint(
 # Route to fix stock data (new route)
 @stock_mgmt_bp.route('/fix_stock_data')
 def fix_stock_data():
+    # Runs as a chunked background job instead of two whole-table UPDATEs
+    # holding locks on every stock row for the length of this request
     try:
-        cur = mysql.connection.cursor()
-        
-        # Fix missing product names
-        cur.execute("""
-            UPDATE stock s
-            JOIN products p ON s.product_id = p.product_id
-            SET s.product_name = p.product_name
-            WHERE s.product_name IS NULL OR s.product_name = '' OR s.product_name = 'N/A'
-        """)
-        
-        # Fix missing category names
-        cur.execute("""
-            UPDATE stock s
-            JOIN products p ON s.product_id = p.product_id
-            JOIN category c ON p.category_id = c.category_id
-            SET 
-                s.category_name = c.category_name,
-                s.category_id = c.category_id
-            WHERE s.category_name IS NULL OR s.category_name = '' OR s.category_name = 'N/A'
-        """)
-        
-        mysql.connection.commit()
-        
-        fixed_count = cur.rowcount
-        flash(f"Fixed {fixed_count} stock records!", "success")
-        
+        job_id, created = backfill.start('stock_names', admin_id=session.get('user_id'))
+        if created:
+            flash(f"Stock data fix started as backfill job #{job_id}.", "success")
+        else:
+            flash(f"Stock data fix is already in progress (job #{job_id}).", "warning")
     except Exception as e:
-        mysql.connection.rollback()
-        flash(f"Error fixing data: {str(e)}", "error")
-    finally:
-        cur.close()
+        print(f"Error in fix_stock_data: {str(e)}")
+        flash(f"Error starting stock data fix: {str(e)}", "error")
     
-    return redirect(url_for('stock_mgmt.manage_stock'))
+    return redirect(url_for('backfill_mgmt.backfill_status'))
+
+STOCK_SORTS = {
+    'id': SortOption('s.stock_id', 'stock_id', 'Newest'),
+    'quantity': SortOption('s.quantity', 'quantity', 'Quantity'),
+    'price': SortOption('s.unit_price', 'unit_price', 'Unit Price'),
+    'date': SortOption('s.add_date', 'add_date', 'Date Added'),
+}
 
-# Route to manage stock (View all stock)
+STOCK_SELECT = """
+    SELECT 
+        s.stock_id,
+        s.product_id,
+        s.product_name,
+        s.category_name,
+        s.unit_price,
+        s.variant_size,
+        s.shelf_life_days,
+        s.quantity,
+        s.add_date,  # Get raw datetime
+        s.category_id
+    FROM stock s
+"""
+
+def get_stock_stats(cur):
+    """Stat card totals, cached briefly instead of scanning stock per request"""
+    row = cached_row(cur, 'stock', """
+        SELECT 
+            COUNT(*) as total_items,
+            COALESCE(SUM(quantity), 0) as total_quantity,
+            COALESCE(SUM(quantity < 10), 0) as low_stock,
+            COALESCE(SUM(quantity = 0), 0) as out_of_stock
+        FROM stock
+    """)
+    return row or {'total_items': 0, 'total_quantity': 0, 'low_stock': 0, 'out_of_stock': 0}
+
+def format_stock_item(item):
+    """Normalise price and add formatted_date for one stock row"""
+    # Format unit price
+    if item['unit_price']:
+        try:
+            item['unit_price'] = float(item['unit_price'])
+        except:
+            item['unit_price'] = 0.0
+    
+    # Format add_date
+    if item['add_date']:
+        try:
+            # If it's already a datetime object
+            if isinstance(item['add_date'], datetime):
+                item['formatted_date'] = item['add_date'].strftime('%Y-%m-%d %H:%M:%S')
+            # If it's a string
+            elif isinstance(item['add_date'], str):
+                # Try to parse it
+                try:
+                    dt = datetime.strptime(item['add_date'], '%Y-%m-%d %H:%M:%S')
+                    item['formatted_date'] = dt.strftime('%Y-%m-%d %H:%M:%S')
+                except:
+                    # If it's already in the right format
+                    if '202' in item['add_date']:  # Check if it contains year
+                        item['formatted_date'] = item['add_date']
+                    else:
+                        item['formatted_date'] = 'Invalid Date'
+            else:
+                item['formatted_date'] = str(item['add_date'])
+        except Exception as e:
+            print(f"Error formatting date: {e}")
+            item['formatted_date'] = str(item['add_date'])
+    else:
+        item['formatted_date'] = 'N/A'
+    return item
+
+def iter_all_stock(page_request):
+    """
+    Every stock row, formatted, straight off an unbuffered cursor.
+    Runs while the response streams: the connection is checked out from the
+    context stream_template re-pushes, not the view's (already torn down).
+    """
+    cur = mysql.connection.cursor(MySQLdb.cursors.SSDictCursor)
+    for item in stream_rows(cur, STOCK_SELECT, page_request, id_column='s.stock_id'):
+        yield format_stock_item(item)
+
+def stream_all_stock(page_request, stats):
+    """Render every stock row on one page (?all=1, for printing / Ctrl-F)"""
+    # Pop flashes now: the session cookie can't change once headers are sent
+    get_flashed_messages(with_categories=True)
+    return stream_template('manage_stock.html', stock_items=iter_all_stock(page_request),
+                           streaming=True, stats=stats)
+
+# Route to manage stock (keyset paginated, or streamed with ?all=1)
 @stock_mgmt_bp.route('/manage_stock')
 def manage_stock():
+    page_request = PageRequest.from_args(request.args, STOCK_SORTS, 'id')
+    
+    if request.args.get('all') == '1':
+        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            stats = get_stock_stats(cur)
+        finally:
+            cur.close()
+        if stats['total_items']:
+            return stream_all_stock(page_request, stats)
+    
+    page = None
+    stats = {'total_items': 0, 'total_quantity': 0, 'low_stock': 0, 'out_of_stock': 0}
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
         
-        # SIMPLE QUERY - Get all stock items
-        cur.execute("""
-            SELECT 
-                s.stock_id,
-                s.product_id,
-                s.product_name,
-                s.category_name,
-                s.unit_price,
-                s.variant_size,
-                s.shelf_life_days,
-                s.quantity,
-                s.add_date,  # Get raw datetime
-                s.category_id
-            FROM stock s
-            ORDER BY s.stock_id DESC
-        """)
-        
-        stock_items = cur.fetchall()
+        stats = get_stock_stats(cur)
+        page = fetch_page(cur, STOCK_SELECT, page_request,
+                          id_column='s.stock_id', id_key='stock_id',
+                          total=stats['total_items'])
         
-        # Format dates in Python
-        for item in stock_items:
-            # Format unit price
-            if item['unit_price']:
-                try:
-                    item['unit_price'] = float(item['unit_price'])
-                except:
-                    item['unit_price'] = 0.0
-            
-            # Format add_date
-            if item['add_date']:
-                try:
-                    # If it's already a datetime object
-                    if isinstance(item['add_date'], datetime):
-                        item['formatted_date'] = item['add_date'].strftime('%Y-%m-%d %H:%M:%S')
-                    # If it's a string
-                    elif isinstance(item['add_date'], str):
-                        # Try to parse it
-                        try:
-                            dt = datetime.strptime(item['add_date'], '%Y-%m-%d %H:%M:%S')
-                            item['formatted_date'] = dt.strftime('%Y-%m-%d %H:%M:%S')
-                        except:
-                            # If it's already in the right format
-                            if '202' in item['add_date']:  # Check if it contains year
-                                item['formatted_date'] = item['add_date']
-                            else:
-                                item['formatted_date'] = 'Invalid Date'
-                    else:
-                        item['formatted_date'] = str(item['add_date'])
-                except Exception as e:
-                    print(f"Error formatting date: {e}")
-                    item['formatted_date'] = str(item['add_date'])
-            else:
-                item['formatted_date'] = 'N/A'
-        
-        # Debug: Check what data we have
-        print(f"Total stock items: {len(stock_items)}")
-        if stock_items:
-            print("First item add_date:", stock_items[0].get('add_date'))
-            print("First item formatted_date:", stock_items[0].get('formatted_date'))
+        # Format only the rows on this page
+        for item in page.items:
+            format_stock_item(item)
         
     except Exception as e:
         print(f"Error in manage_stock: {str(e)}")
-        stock_items = []
         flash(f"Error loading stock: {str(e)}", "error")
     finally:
         cur.close()
     
-    return render_template('manage_stock.html', stock_items=stock_items)
+    if page is None:
+        return render_template('manage_stock.html', stock_items=[], stats=stats)
+    return render_template('manage_stock.html', stock_items=page.items, page=page,
+                           sorts=STOCK_SORTS, stats=stats)
 
 # Route to add a new stock item
 @stock_mgmt_bp.route('/add_stock', methods=["GET", "POST"])
@@ -146,21 +189,8 @@ def add_stock():
                 flash("Please fill in all required fields", "error")
                 return redirect(url_for('stock_mgmt.add_stock'))
             
-            # Get product and ALL related details
-            cur.execute("""
-                SELECT 
-                    p.product_name,
-                    p.unit_price as default_price,
-                    p.variant_size as default_variant,
-                    p.shelf_life_days as default_shelf_life,
-                    c.category_id,
-                    c.category_name
-                FROM products p
-                JOIN category c ON p.category_id = c.category_id
-                WHERE p.product_id = %s
-            """, (product_id,))
-            
-            result = cur.fetchone()
+            # Product defaults and category (cached)
+            result = catalog.product(cur, product_id)
             
             if not result:
                 flash("Product not found!", "error")
@@ -170,9 +200,9 @@ def add_stock():
             product_name = result['product_name']
             final_category_id = result['category_id']
             final_category_name = result['category_name']
-            final_unit_price = unit_price or result['default_price'] or 0
-            final_variant_size = variant_size or result['default_variant'] or 'Standard'
-            final_shelf_life = shelf_life_days or result['default_shelf_life'] or 0
+            final_unit_price = unit_price or result['unit_price'] or 0
+            final_variant_size = variant_size or result['variant_size'] or 'Standard'
+            final_shelf_life = shelf_life_days or result['shelf_life_days'] or 0
             
             # Insert COMPLETE data into stock
             cur.execute("""
@@ -196,8 +226,12 @@ def add_stock():
                 final_shelf_life, 
                 quantity
             ))
+            new_stock_id = cur.lastrowid
+            refresh_stock_summary(cur, product_id, final_variant_size)
+            record_search_change(cur, 'stock', new_stock_id)
             
             mysql.connection.commit()
+            search_index.refresh('stock', new_stock_id)
             flash("Stock added successfully!", "success")
             return redirect(url_for('stock_mgmt.manage_stock'))
             
@@ -212,8 +246,8 @@ def add_stock():
     # GET request - fetch categories
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cur.execute("SELECT category_id, category_name FROM category ORDER BY category_name")
-        categories = cur.fetchall()
+        categories = catalog.categories(cur)
+        catalog_url = url_for('stock_mgmt.catalog_json', v=catalog.document_etag(cur))
         
         if not categories:
             flash("No categories found. Please add categories first.", "warning")
@@ -221,11 +255,53 @@ def add_stock():
     except Exception as e:
         print(f"Error loading categories: {str(e)}")
         categories = []
+        catalog_url = url_for('stock_mgmt.catalog_json')
         flash(f"Error loading categories: {str(e)}", "error")
     finally:
         cur.close()
 
-    return render_template('add_stock.html', categories=categories)
+    return render_template('add_stock.html', categories=categories, catalog_url=catalog_url)
+
+# Route to bulk import a delivery (CSV / XLSX) into stock
+@stock_mgmt_bp.route('/import_stock', methods=["GET", "POST"])
+def import_stock():
+    report = None
+    if request.method == "POST":
+        upload = request.files.get('stock_file')
+        if not upload or not upload.filename:
+            flash("Choose a CSV or XLSX file to import.", "error")
+            return redirect(url_for('stock_mgmt.import_stock'))
+        
+        dry_run = bool(request.form.get('dry_run'))
+        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            report = import_stock_file(mysql.connection, cur, upload.filename, upload.stream, dry_run)
+            report['filename'] = upload.filename
+            
+            if dry_run:
+                flash(f"Checked {report['total']} lines: {report['valid']} ready to import, "
+                      f"{len(report['errors'])} with errors.", "success" if not report['errors'] else "warning")
+            elif report['errors']:
+                flash(f"Imported {report['inserted']} of {report['total']} lines; "
+                      f"{len(report['errors'])} lines were skipped (see below).", "warning")
+            else:
+                flash(f"Imported {report['inserted']} stock lines.", "success")
+        except ImportFileError as e:
+            flash(str(e), "error")
+        except Exception as e:
+            mysql.connection.rollback()
+            print(f"Error in import_stock: {str(e)}")
+            flash(f"Error importing stock: {str(e)}", "error")
+        finally:
+            cur.close()
+        
+        if request.args.get('format') == 'json':
+            return jsonify(report or {'error': 'Import failed'}), 200 if report else 400
+
+    return render_template('import_stock.html',
+                           report=report,
+                           xlsx_supported=openpyxl is not None,
+                           max_rows=MAX_ROWS)
 
 # Route to update stock item - FIXED VERSION
 @stock_mgmt_bp.route('/update_stock/<int:stock_id>', methods=["GET", "POST"])
@@ -237,19 +313,12 @@ def update_stock(stock_id):
             # Get form data
             product_id = request.form.get("product_id")
             unit_price = request.form.get("unit_price")
-            variant_size = request.form.get("variant_size")
+            variant_size = request.form.get("variant_size", "")
             shelf_life_days = request.form.get("shelf_life_days")
             quantity = request.form.get("quantity")
             
-            # Get product and category details for the selected product
-            cur.execute("""
-                SELECT p.product_name, c.category_id, c.category_name
-                FROM products p
-                JOIN category c ON p.category_id = c.category_id
-                WHERE p.product_id = %s
-            """, (product_id,))
-            
-            product_info = cur.fetchone()
+            # Product and category details for the selected product (cached)
+            product_info = catalog.product(cur, product_id)
             
             if not product_info:
                 flash("Product not found!", "error")
@@ -259,6 +328,8 @@ def update_stock(stock_id):
             category_id = product_info['category_id']
             category_name = product_info['category_name']
             
+            old_key = stock_key(cur, stock_id)
+            
             # Update the stock item with ALL fields
             cur.execute("""
                 UPDATE stock SET 
@@ -283,7 +354,15 @@ def update_stock(stock_id):
                 stock_id
             ))
             
+            # Keep stock_summary in step (old and new product/variant)
+            if old_key:
+                refresh_stock_summary(cur, *old_key)
+            if old_key != (int(product_id), variant_size):
+                refresh_stock_summary(cur, product_id, variant_size)
+            record_search_change(cur, 'stock', stock_id)
+            
             mysql.connection.commit()
+            search_index.refresh('stock', stock_id)
             flash("Stock updated successfully!", "success")
             return redirect(url_for('stock_mgmt.manage_stock'))
         
@@ -295,18 +374,16 @@ def update_stock(stock_id):
             flash("Stock item not found.", "error")
             return redirect(url_for('stock_mgmt.manage_stock'))
         
-        # Fetch categories for dropdown
-        cur.execute("SELECT category_id, category_name FROM category ORDER BY category_name")
-        categories = cur.fetchall()
-        
-        # Fetch products for dropdown (all products initially)
-        cur.execute("SELECT product_id, product_name FROM products ORDER BY product_name")
-        products = cur.fetchall()
+        # Dropdown data (cached): categories and all products initially
+        categories = catalog.categories(cur)
+        products = catalog.products(cur)
+        catalog_url = url_for('stock_mgmt.catalog_json', v=catalog.document_etag(cur))
         
         return render_template('update_stock.html', 
                              stock_item=stock_item, 
                              categories=categories, 
-                             products=products)
+                             products=products,
+                             catalog_url=catalog_url)
         
     except Exception as e:
         mysql.connection.rollback() if request.method == "POST" else None
@@ -321,8 +398,13 @@ def update_stock(stock_id):
 def delete_stock(stock_id):
     try:
         cur = mysql.connection.cursor()
+        old_key = stock_key(cur, stock_id)
         cur.execute("DELETE FROM stock WHERE stock_id = %s", (stock_id,))
+        if old_key:
+            refresh_stock_summary(cur, *old_key)
+        record_search_change(cur, 'stock', stock_id)
         mysql.connection.commit()
+        search_index.remove('stock', stock_id)
         flash("Stock deleted successfully", "success")
     except Exception as e:
         mysql.connection.rollback()
@@ -332,8 +414,27 @@ def delete_stock(stock_id):
 
     return redirect(url_for('stock_mgmt.manage_stock'))
 
+# Whole catalog (categories -> products -> defaults) for the stock forms'
+# dropdowns, fetched once per catalog version instead of per selection
+@stock_mgmt_bp.route('/catalog.json', methods=['GET'])
+def catalog_json():
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        return document_response(catalog, cur)
+    finally:
+        cur.close()
+
+def _catalog_version(*_args, **_kwargs):
+    """ETag validator for the catalog lookups below"""
+    cur = mysql.connection.cursor()
+    try:
+        return catalog.version(cur)
+    finally:
+        cur.close()
+
 # Route to get products based on the selected category (AJAX endpoint)
 @stock_mgmt_bp.route('/get_products/<category_id>', methods=['GET'])
+@conditional(_catalog_version)
 def get_products(category_id):
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
@@ -342,15 +443,8 @@ def get_products(category_id):
         if not category_id or category_id == 'undefined' or category_id == 'null':
             return jsonify({'products': []})
         
-        # Get products for the category
-        cur.execute("""
-            SELECT product_id, product_name 
-            FROM products 
-            WHERE category_id = %s
-            ORDER BY product_name
-        """, (category_id,))
-        
-        products = cur.fetchall()
+        # Products for the category (cached)
+        products = catalog.products_by_category(cur, category_id)
         
         # Format the response
         product_list = []
@@ -370,24 +464,12 @@ def get_products(category_id):
 
 # Route to get product details (AJAX endpoint) - FIXED VERSION
 @stock_mgmt_bp.route('/get_product_details/<product_id>', methods=['GET'])
+@conditional(_catalog_version)
 def get_product_details(product_id):
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
         
-        cur.execute("""
-            SELECT 
-                p.product_name,
-                p.unit_price,
-                p.variant_size,
-                p.shelf_life_days,
-                c.category_id,
-                c.category_name
-            FROM products p
-            LEFT JOIN category c ON p.category_id = c.category_id
-            WHERE p.product_id = %s
-        """, (product_id,))
-        
-        product = cur.fetchone()
+        product = catalog.product(cur, product_id)
         
         if product:
             return jsonify({
@@ -408,77 +490,102 @@ def get_product_details(product_id):
     finally:
         cur.close()
 
+STOCK_EXPORT_COLUMNS = [
+    ('Stock ID', 'stock_id'),
+    ('Product ID', 'product_id'),
+    ('Product', 'product_name'),
+    ('Category', 'category_name'),
+    ('Variant', 'variant_size'),
+    ('Quantity', 'quantity'),
+    ('Unit Price', 'unit_price'),
+    ('Shelf Life (days)', 'shelf_life_days'),
+    ('Date Added', 'add_date'),
+]
+
+def iter_stock_matches(search_query, batch=1000):
+    """Stock rows matching a search, in rank order, fetched by primary key in batches"""
+    stock_ids = search_index.search('stock', search_query)
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        for i in range(0, len(stock_ids), batch):
+            ids = stock_ids[i:i + batch]
+            cur.execute(STOCK_SELECT + f" WHERE s.stock_id IN ({', '.join(['%s'] * len(ids))})", ids)
+            rows = {row['stock_id']: row for row in cur.fetchall()}
+            for stock_id in ids:
+                if stock_id in rows:
+                    yield rows[stock_id]
+    finally:
+        cur.close()
+
+# Route to export stock (current sort, or the current search) as CSV / XLSX
+@stock_mgmt_bp.route('/export_stock', methods=['GET'])
+def export_stock():
+    if 'user_id' not in session:
+        flash("Please login first.", "error")
+        return redirect(url_for('admin.admin_login'))
+    
+    search_query = request.args.get('q', '').strip()
+    if search_query:
+        rows = iter_stock_matches(search_query)
+    else:
+        page_request = PageRequest.from_args(request.args, STOCK_SORTS, 'id')
+        rows = iter_all_stock(page_request)
+    return export_response(request.args.get('format', 'csv'), 'stock', STOCK_EXPORT_COLUMNS, rows)
+
 # Route to search stock items
 @stock_mgmt_bp.route('/search_stock', methods=['GET'])
 def search_stock():
-    search_query = request.args.get('q', '')
+    search_query = request.args.get('q', '').strip()
+    if not search_query:
+        return redirect(url_for('stock_mgmt.manage_stock'))
     
+    cur = None
     try:
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        # Ranked stock ids from the search index, then a primary key fetch
+        stock_ids = search_index.search('stock', search_query, SEARCH_RESULTS_LIMIT)
         
-        if search_query:
-            cur.execute("""
-                SELECT 
-                    s.*,
-                    COALESCE(s.product_name, p.product_name, 'N/A') as display_product_name,
-                    COALESCE(s.category_name, c.category_name, 'N/A') as display_category_name
-                FROM stock s
-                LEFT JOIN products p ON s.product_id = p.product_id
-                LEFT JOIN category c ON s.category_id = c.category_id OR p.category_id = c.category_id
-                WHERE s.product_name LIKE %s 
-                   OR s.category_name LIKE %s
-                   OR p.product_name LIKE %s
-                   OR c.category_name LIKE %s
-                   OR s.variant_size LIKE %s
-                ORDER BY s.stock_id DESC
-            """, (f'%{search_query}%', f'%{search_query}%', f'%{search_query}%', 
-                  f'%{search_query}%', f'%{search_query}%'))
-        else:
-            cur.execute("""
+        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        stock_items = []
+        if stock_ids:
+            cur.execute(f"""
                 SELECT 
                     s.*,
-                    COALESCE(s.product_name, p.product_name, 'N/A') as display_product_name,
-                    COALESCE(s.category_name, c.category_name, 'N/A') as display_category_name
+                    COALESCE(s.product_name, 'N/A') as display_product_name,
+                    COALESCE(s.category_name, 'N/A') as display_category_name
                 FROM stock s
-                LEFT JOIN products p ON s.product_id = p.product_id
-                LEFT JOIN category c ON s.category_id = c.category_id OR p.category_id = c.category_id
-                ORDER BY s.stock_id DESC
-            """)
+                WHERE s.stock_id IN ({', '.join(['%s'] * len(stock_ids))})
+            """, stock_ids)
+            rows = {row['stock_id']: row for row in cur.fetchall()}
+            stock_items = [format_stock_item(rows[i]) for i in stock_ids if i in rows]
         
-        stock_items = cur.fetchall()
+        stats = get_stock_stats(cur)
         
         return render_template('manage_stock.html', 
                              stock_items=stock_items, 
+                             stats=stats,
                              search_query=search_query)
         
     except Exception as e:
         flash(f"Error searching stock: {str(e)}", "error")
         return redirect(url_for('stock_mgmt.manage_stock'))
     finally:
-        cur.close()
+        if cur:
+            cur.close()
 
 # Route to get products by category name (for update form)
 @stock_mgmt_bp.route('/get_products_by_category/<category_name>', methods=['GET'])
+@conditional(_catalog_version)
 def get_products_by_category(category_name):
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
         
-        # First get category_id from category_name
-        cur.execute("SELECT category_id FROM category WHERE category_name = %s", (category_name,))
-        category = cur.fetchone()
+        # Resolve the category name, then its products (both cached)
+        category = next((c for c in catalog.categories(cur) if c['category_name'].lower() == category_name.lower()), None)
         
         if not category:
             return jsonify({'products': []})
         
-        # Get products for this category
-        cur.execute("""
-            SELECT product_id, product_name 
-            FROM products 
-            WHERE category_id = %s
-            ORDER BY product_name
-        """, (category['category_id'],))
-        
-        products = cur.fetchall()
+        products = catalog.products_by_category(cur, category['category_id'])
         return jsonify({'products': products})
         
     except Exception as e:
@@ -491,47 +598,48 @@ def get_products_by_category(category_name):
 # Add this route to your stock_mgmt_bp blueprint
 @stock_mgmt_bp.route('/stock_summary')
 def stock_summary():
+    category_rollup = []
     try:
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
         
-        # Query to get total quantity and total price per product
+        # Maintained by the stock write paths (see modules/common/stock_summary.py)
         cur.execute("""
             SELECT 
-                s.product_id,
-                COALESCE(s.product_name, p.product_name, 'Unknown Product') as product_name,
-                COALESCE(s.category_name, c.category_name, 'Uncategorized') as category_name,
-                COALESCE(s.unit_price, p.unit_price, 0) as unit_price,
-                COALESCE(s.variant_size, p.variant_size, 'Standard') as variant_size,
-                SUM(s.quantity) as total_quantity,
-                SUM(s.quantity * COALESCE(s.unit_price, p.unit_price, 0)) as total_price
-            FROM stock s
-            LEFT JOIN products p ON s.product_id = p.product_id
-            LEFT JOIN category c ON s.category_id = c.category_id OR p.category_id = c.category_id
-            WHERE s.quantity > 0
-            GROUP BY 
-                s.product_id, 
-                s.product_name, 
-                s.category_name,
-                s.unit_price,
-                s.variant_size,
-                p.product_name,
-                p.unit_price,
-                p.variant_size,
-                c.category_name
-            ORDER BY total_price DESC, product_name
+                product_id,
+                product_name,
+                category_name,
+                NULLIF(variant_size, '') as variant_size,
+                total_quantity,
+                total_value as total_price
+            FROM stock_summary
+            ORDER BY total_value DESC, product_name
         """)
         
         stock_summary = cur.fetchall()
         
-        # Calculate grand totals
+        # Per-category rollup (also gives the grand totals)
+        cur.execute("""
+            SELECT 
+                category_id,
+                MAX(category_name) as category_name,
+                COUNT(*) as items,
+                SUM(total_quantity) as total_quantity,
+                SUM(total_value) as total_value
+            FROM stock_summary
+            GROUP BY category_id
+            ORDER BY total_value DESC
+        """)
+        category_rollup = cur.fetchall()
+        
         total_items = len(stock_summary)
-        total_quantity_all = sum(item['total_quantity'] or 0 for item in stock_summary)
-        total_value_all = sum(item['total_price'] or 0 for item in stock_summary)
+        total_quantity_all = sum(int(row['total_quantity'] or 0) for row in category_rollup)
+        total_value_all = sum(float(row['total_value'] or 0) for row in category_rollup)
         
-        # Format currency values
+        # Unit price shown is the quantity-weighted average for the variant
         for item in stock_summary:
-            item['unit_price'] = float(item['unit_price'] or 0)
             item['total_price'] = float(item['total_price'] or 0)
+            item['unit_price'] = item['total_price'] / item['total_quantity'] if item['total_quantity'] else 0.0
+            item['variant_size'] = item['variant_size'] or 'Standard'
         
     except Exception as e:
         print(f"Error in stock_summary: {str(e)}")
@@ -545,6 +653,7 @@ def stock_summary():
     
     return render_template('stock_summary.html', 
                          stock_summary=stock_summary,
+                         category_rollup=category_rollup,
                          total_items=total_items,
                          total_quantity_all=total_quantity_all,
                          total_value_all=total_value_all)        
\ No newline at end of file
@@ -0,0 +1,367 @@
+"""
+Chunked background backfills
+Data fixes that used to be one whole-table UPDATE inside a web request
+(fix_stock_data) run here instead: a background thread walks the primary
+key range in fixed-size chunks, each chunk in its own short transaction
+that also records the job's progress in backfill_jobs. A paused, failed or
+interrupted job therefore resumes from the last committed chunk.
+
+Between chunks the runner sleeps briefly and backs off while other
+transactions are waiting on row locks (or, on a replica-aware setup, while
+SHOW SLAVE STATUS reports lag), so order acceptance is never stuck behind it.
+"""
+import json
+import threading
+import time
+
+import click
+import MySQLdb
+from flask import current_app
+from flask.cli import AppGroup
+
+from modules.common.search_index import record_search_changes
+from modules.common.stock_summary import refresh_stock_summary
+
+# A 'running' job whose heartbeat is older than this has lost its worker
+STALE_AFTER_SECONDS = 120
+
+
+# ==========================================
+# JOB DEFINITIONS
+# ==========================================
+class StockNamesBackfill:
+    """Copy missing product / category names onto stock rows (was fix_stock_data)."""
+
+    name = 'stock_names'
+    label = 'Fix stock product / category names'
+    table = 'stock'
+    id_column = 'stock_id'
+
+    _MISSING = """(
+        s.product_name IS NULL OR s.product_name IN ('', 'N/A')
+        OR s.category_name IS NULL OR s.category_name IN ('', 'N/A')
+    )"""
+
+    def run_chunk(self, cur, lo, hi):
+        """Fix stock_id lo..hi on a DictCursor; returns counters for this chunk."""
+        # Lock just the broken rows of this range and remember their summary keys
+        cur.execute(f"""
+            SELECT s.stock_id, s.product_id, s.variant_size
+            FROM stock s
+            WHERE s.stock_id BETWEEN %s AND %s AND {self._MISSING}
+            FOR UPDATE
+        """, (lo, hi))
+        rows = cur.fetchall()
+        counts = {'rows_scanned': len(rows), 'product_names': 0, 'category_names': 0}
+        if not rows:
+            return counts
+
+        cur.execute("""
+            UPDATE stock s
+            JOIN products p ON s.product_id = p.product_id
+            SET s.product_name = p.product_name
+            WHERE s.stock_id BETWEEN %s AND %s
+              AND (s.product_name IS NULL OR s.product_name = '' OR s.product_name = 'N/A')
+        """, (lo, hi))
+        counts['product_names'] = cur.rowcount
+
+        cur.execute("""
+            UPDATE stock s
+            JOIN products p ON s.product_id = p.product_id
+            JOIN category c ON p.category_id = c.category_id
+            SET
+                s.category_name = c.category_name,
+                s.category_id = c.category_id
+            WHERE s.stock_id BETWEEN %s AND %s
+              AND (s.category_name IS NULL OR s.category_name = '' OR s.category_name = 'N/A')
+        """, (lo, hi))
+        counts['category_names'] = cur.rowcount
+
+        if counts['product_names'] or counts['category_names']:
+            keys = {(row['product_id'], row['variant_size']) for row in rows}
+            for product_id, variant_size in keys:
+                refresh_stock_summary(cur, product_id, variant_size)
+            # The search index reads stock names too
+            record_search_changes(cur, 'stock', [row['stock_id'] for row in rows])
+        return counts
+
+
+JOBS = {job.name: job for job in (StockNamesBackfill(),)}
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+class BackfillRunner:
+    """Starts, pauses and resumes backfill jobs; one worker thread per running job."""
+
+    def __init__(self, app=None, mysql=None):
+        self.mysql = mysql
+        self.chunk_size = 1000
+        self.pause_seconds = 0.05
+        self.max_lock_waits = 0
+        self.max_replica_lag = 5
+        self.max_backoff_seconds = 30
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._probes_disabled = set()
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.mysql = mysql
+        self.chunk_size = int(app.config.get('BACKFILL_CHUNK_SIZE', 1000))
+        self.pause_seconds = float(app.config.get('BACKFILL_PAUSE_MS', 50)) / 1000
+        self.max_lock_waits = int(app.config.get('BACKFILL_MAX_LOCK_WAITS', 0))
+        self.max_replica_lag = float(app.config.get('BACKFILL_MAX_REPLICA_LAG', 5))
+        self.max_backoff_seconds = float(app.config.get('BACKFILL_MAX_BACKOFF', 30))
+        app.extensions['backfill'] = self
+
+    # ── Job control ─────────────────────────────────────────────────────────
+    def start(self, job_name, admin_id=None, background=True):
+        """
+        Queue a new run of ``job_name`` (or return the one already active).
+        Returns (job_id, created).
+        """
+        job = JOBS[job_name]
+        with self.mysql.pool.connection() as conn:
+            cur = conn.cursor(MySQLdb.cursors.DictCursor)
+            try:
+                cur.execute("""
+                    SELECT job_id FROM backfill_jobs
+                    WHERE job_name = %s AND status IN ('queued', 'running', 'paused')
+                    ORDER BY job_id DESC LIMIT 1
+                """, (job_name,))
+                active = cur.fetchone()
+                if active:
+                    return active['job_id'], False
+
+                cur.execute(f"SELECT COALESCE(MIN({job.id_column}), 0) as lo, "
+                            f"COALESCE(MAX({job.id_column}), 0) as hi FROM {job.table}")
+                bounds = cur.fetchone()
+                cur.execute("""
+                    INSERT INTO backfill_jobs (job_name, chunk_size, min_id, max_id, last_id, started_by)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (job_name, self.chunk_size, bounds['lo'], bounds['hi'],
+                      max(bounds['lo'] - 1, 0), admin_id))
+                job_id = cur.lastrowid
+                conn.commit()
+            finally:
+                cur.close()
+
+        if background:
+            self._spawn(job_id)
+        else:
+            self.run(job_id)
+        return job_id, True
+
+    def resume(self, job_id, background=True):
+        """Requeue a paused, failed or stalled job from its last committed chunk."""
+        with self.mysql.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("""
+                    UPDATE backfill_jobs SET status = 'queued', error = NULL
+                    WHERE job_id = %s
+                      AND (status IN ('paused', 'failed')
+                           OR (status = 'running' AND heartbeat_at < NOW() - INTERVAL %s SECOND))
+                """, (job_id, STALE_AFTER_SECONDS))
+                resumed = cur.rowcount == 1
+                conn.commit()
+            finally:
+                cur.close()
+        if resumed:
+            if background:
+                self._spawn(job_id)
+            else:
+                self.run(job_id)
+        return resumed
+
+    def pause(self, job_id):
+        """Ask the worker to stop after its current chunk."""
+        with self.mysql.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute("""
+                    UPDATE backfill_jobs SET status = 'paused'
+                    WHERE job_id = %s AND status IN ('queued', 'running')
+                """, (job_id,))
+                paused = cur.rowcount == 1
+                conn.commit()
+            finally:
+                cur.close()
+        return paused
+
+    def _spawn(self, job_id):
+        with self._lock:
+            thread = self._threads.get(job_id)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=self.run, args=(job_id,),
+                                      name=f'backfill-{job_id}', daemon=True)
+            self._threads[job_id] = thread
+        thread.start()
+
+    # ── Worker ──────────────────────────────────────────────────────────────
+    def run(self, job_id):
+        """Process chunks until the job completes, is paused or fails."""
+        with self.mysql.pool.connection() as conn:
+            cur = conn.cursor(MySQLdb.cursors.DictCursor)
+            try:
+                # Claim it: only one worker (in any process) moves a job forward
+                cur.execute("""
+                    UPDATE backfill_jobs
+                    SET status = 'running', started_at = COALESCE(started_at, NOW()),
+                        heartbeat_at = NOW()
+                    WHERE job_id = %s AND status = 'queued'
+                """, (job_id,))
+                conn.commit()
+                if cur.rowcount != 1:
+                    return
+                print(f"Backfill job {job_id} started")
+                self._run_chunks(conn, cur, job_id)
+            except Exception as e:
+                conn.rollback()
+                print(f"Backfill job {job_id} failed: {e}")
+                cur.execute("""
+                    UPDATE backfill_jobs SET status = 'failed', error = %s, heartbeat_at = NOW()
+                    WHERE job_id = %s
+                """, (str(e)[:2000], job_id))
+                conn.commit()
+            finally:
+                cur.close()
+
+    def _run_chunks(self, conn, cur, job_id):
+        throttled = 0.0
+        while True:
+            cur.execute("SELECT * FROM backfill_jobs WHERE job_id = %s", (job_id,))
+            state = cur.fetchone()
+            if state is None or state['status'] != 'running':
+                print(f"Backfill job {job_id} stopped ({state['status'] if state else 'deleted'})")
+                return
+
+            if state['last_id'] >= state['max_id']:
+                cur.execute("""
+                    UPDATE backfill_jobs SET status = 'completed', finished_at = NOW(), heartbeat_at = NOW()
+                    WHERE job_id = %s
+                """, (job_id,))
+                conn.commit()
+                print(f"Backfill job {job_id} completed: {state['rows_updated']} rows updated")
+                return
+
+            job = JOBS[state['job_name']]
+            lo = state['last_id'] + 1
+            hi = min(state['last_id'] + state['chunk_size'], state['max_id'])
+
+            counts = job.run_chunk(cur, lo, hi)
+            scanned = counts.pop('rows_scanned', 0)
+            results = json.loads(state['results'] or '{}')
+            for key, value in counts.items():
+                results[key] = results.get(key, 0) + value
+
+            # Progress is committed with the chunk, so a restart never
+            # repeats or skips a range.
+            cur.execute("""
+                UPDATE backfill_jobs
+                SET last_id = %s, chunks_done = chunks_done + 1,
+                    rows_scanned = rows_scanned + %s, rows_updated = rows_updated + %s,
+                    results = %s, throttled_ms = throttled_ms + %s, heartbeat_at = NOW()
+                WHERE job_id = %s
+            """, (hi, scanned, sum(counts.values()), json.dumps(results),
+                  int(throttled * 1000), job_id))
+            conn.commit()
+
+            throttled = self._throttle(conn)
+
+    # ── Throttling ──────────────────────────────────────────────────────────
+    def _throttle(self, conn):
+        """Sleep between chunks; back off while the server is under pressure."""
+        waited = self.pause_seconds
+        time.sleep(self.pause_seconds)
+        backoff = max(self.pause_seconds, 0.1)
+        while waited < self.max_backoff_seconds and self._under_pressure(conn):
+            time.sleep(backoff)
+            waited += backoff
+            backoff = min(backoff * 2, 5.0)
+        return waited
+
+    def _under_pressure(self, conn):
+        lock_waits = self._probe(conn, 'lock_waits', """
+            SELECT COUNT(*) FROM information_schema.INNODB_TRX
+            WHERE trx_state = 'LOCK WAIT'
+        """)
+        if lock_waits is not None and lock_waits > self.max_lock_waits:
+            return True
+        lag = self._probe(conn, 'replica_lag', "SHOW SLAVE STATUS")
+        return lag is not None and lag > self.max_replica_lag
+
+    def _probe(self, conn, name, sql):
+        """One load metric, or None (probes lacking privileges are switched off)."""
+        if name in self._probes_disabled:
+            return None
+        cur = conn.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            cur.execute(sql)
+            row = cur.fetchone()
+            if not row:
+                return None
+            if name == 'replica_lag':
+                return row.get('Seconds_Behind_Master')
+            return list(row.values())[0]
+        except MySQLdb.Error as e:
+            print(f"Backfill throttle probe '{name}' disabled: {e}")
+            self._probes_disabled.add(name)
+            return None
+        finally:
+            cur.close()
+            conn.commit()
+
+    # ── Status ──────────────────────────────────────────────────────────────
+    def jobs(self, cur, limit=20):
+        """Most recent runs, newest first, with progress and results decoded."""
+        cur.execute("""
+            SELECT *, heartbeat_at < NOW() - INTERVAL %s SECOND as stale
+            FROM backfill_jobs
+            ORDER BY job_id DESC
+            LIMIT %s
+        """, (STALE_AFTER_SECONDS, limit))
+        rows = cur.fetchall()
+        for row in rows:
+            span = row['max_id'] - row['min_id'] + 1
+            done = row['last_id'] - row['min_id'] + 1
+            if row['status'] == 'completed' or span <= 0:
+                row['progress'] = 100.0
+            else:
+                row['progress'] = round(max(0, min(done, span)) * 100.0 / span, 1)
+            row['results'] = json.loads(row['results'] or '{}')
+            row['label'] = JOBS[row['job_name']].label if row['job_name'] in JOBS else row['job_name']
+            row['stale'] = bool(row['stale']) and row['status'] == 'running'
+        return rows
+
+
+# ==========================================
+# CLI
+# ==========================================
+backfill_cli = AppGroup('backfill', help='Run chunked data backfills.')
+
+
+@backfill_cli.command('run')
+@click.argument('job_name', type=click.Choice(sorted(JOBS)))
+def run_command(job_name):
+    """Run (or continue) JOB_NAME in the foreground."""
+    runner = current_app.extensions['backfill']
+    job_id, created = runner.start(job_name, background=False)
+    if not created and not runner.resume(job_id, background=False):
+        # Queued but never picked up
+        runner.run(job_id)
+    click.echo(f"Backfill job {job_id} finished")
+
+
+@backfill_cli.command('resume')
+@click.argument('job_id', type=int)
+def resume_command(job_id):
+    """Resume a paused, failed or stalled job in the foreground."""
+    runner = current_app.extensions['backfill']
+    if not runner.resume(job_id, background=False):
+        raise click.ClickException(f"Job {job_id} is not paused, failed or stalled")
+    click.echo(f"Backfill job {job_id} finished")
@@ -0,0 +1,382 @@
+"""
+Catalog cache
+Categories, product lists and per-product defaults (price, variant, shelf
+life, category) are read by nearly every admin / distributor form and
+change rarely, so they are kept in a small in-process LRU cache with a TTL.
+
+Product and category writes call record_catalog_change() in the same
+transaction. That appends to catalog_changes, whose change_id serves as the
+catalog version: before serving from the cache (at most once every
+CATALOG_CACHE_CHECK_SECONDS) each worker process reads the changes newer
+than the last version it saw and drops just the entries they touch. The
+writing process also invalidates its own entries right after commit.
+
+The whole catalog is also served as one compact JSON document (see
+document_response) so cascading dropdowns resolve selections in the
+browser instead of calling an AJAX endpoint per change.
+
+Cached rows are shared between requests; treat them as read-only.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import MySQLdb
+from flask import Response, request
+
+# Keep this many changes; older ones are deleted by the writers
+CHANGE_LOG_KEEP = 10000
+
+# More new changes than this in one check clears the whole cache
+MAX_CHANGES_PER_CHECK = 1000
+
+# MySQL error for a missing table (catalog_changes not migrated yet)
+ER_NO_SUCH_TABLE = 1146
+
+# Versioned catalog URLs (?v=<etag>) never change content
+DOCUMENT_MAX_AGE = 365 * 24 * 3600
+
+
+def record_catalog_change(cur, entity, entity_id, category_id=None):
+    """
+    Bump the catalog version for one product / category; call before
+    commit. Pass a product's (new) category_id so that category's product
+    list is dropped too; lists already holding the product are found by id.
+    """
+    cur.execute("""
+        INSERT INTO catalog_changes (entity, entity_id, category_id)
+        VALUES (%s, %s, %s)
+    """, (entity, entity_id, category_id))
+    cur.execute("DELETE FROM catalog_changes WHERE change_id <= LAST_INSERT_ID() - %s",
+                (CHANGE_LOG_KEEP,))
+
+
+# One product with its defaults and category; callers append the WHERE clause
+_PRODUCT_SELECT = """
+    SELECT p.product_id, p.product_name, p.unit_price, p.variant_size,
+           p.shelf_life_days, c.category_id, c.category_name
+    FROM products p
+    LEFT JOIN category c ON p.category_id = c.category_id
+"""
+
+
+def _dict_rows(cur, rows):
+    # Plain cursors return tuples; the cache always holds dicts
+    if rows and not isinstance(rows[0], dict):
+        columns = [column[0] for column in cur.description]
+        return [dict(zip(columns, row)) for row in rows]
+    return rows
+
+
+def document_response(catalog, cur):
+    """
+    The catalog document with a strong ETag. Pages link to it as
+    ?v=<etag>, which is cached for a year; other URLs revalidate.
+    """
+    body, etag = catalog.document(cur)
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    if request.args.get('v') == etag:
+        response.cache_control.max_age = DOCUMENT_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+class CatalogCache:
+    """LRU / TTL cache of catalog lookups, kept consistent via catalog_changes."""
+
+    def __init__(self, app=None, mysql=None):
+        self.mysql = mysql
+        self.max_entries = 2000
+        self.ttl = 300.0
+        self.check_interval = 2.0
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._version_checks = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.mysql = mysql
+        self.max_entries = int(app.config.get('CATALOG_CACHE_MAX_ENTRIES', 2000))
+        self.ttl = float(app.config.get('CATALOG_CACHE_TTL', 300))
+        self.check_interval = float(app.config.get('CATALOG_CACHE_CHECK_SECONDS', 2))
+        app.extensions['catalog_cache'] = self
+
+    # ── Lookups ─────────────────────────────────────────────────────────────
+    def categories(self, cur):
+        """[{category_id, category_name}] ordered by name."""
+        return self._get(cur, ('categories',), """
+            SELECT category_id, category_name
+            FROM category
+            ORDER BY category_name
+        """)
+
+    def category_name(self, cur, category_id):
+        for category in self.categories(cur):
+            if str(category['category_id']) == str(category_id):
+                return category['category_name']
+        return None
+
+    def products(self, cur):
+        """[{product_id, product_name}] ordered by name."""
+        return self._get(cur, ('products',), """
+            SELECT product_id, product_name
+            FROM products
+            ORDER BY product_name
+        """)
+
+    def products_by_category(self, cur, category_id):
+        """[{product_id, product_name, unit_price}] of one category, ordered by name."""
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return []
+        return self._get(cur, ('category_products', category_id), """
+            SELECT product_id, product_name, unit_price
+            FROM products
+            WHERE category_id = %s
+            ORDER BY product_name
+        """, (category_id,))
+
+    def product(self, cur, product_id):
+        """One product with its defaults and category, or None."""
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return None
+        rows = self._get(cur, ('product', product_id),
+                         _PRODUCT_SELECT + " WHERE p.product_id = %s", (product_id,))
+        return rows[0] if rows else None
+
+    def products_by_id(self, cur, product_ids):
+        """
+        {product_id: product} for many products (same rows as product());
+        unknown ids are left out. Cache misses are read in one query.
+        """
+        wanted = set()
+        for product_id in product_ids:
+            try:
+                wanted.add(int(product_id))
+            except (TypeError, ValueError):
+                pass
+        self._sync(cur)
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for product_id in sorted(wanted):
+                entry = self._entries.get(('product', product_id))
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(('product', product_id))
+                    self.hits += 1
+                    if entry[1]:
+                        found[product_id] = entry[1][0]
+                else:
+                    self.misses += 1
+                    missing.append(product_id)
+        if not missing:
+            return found
+
+        placeholders = ', '.join(['%s'] * len(missing))
+        cur.execute(_PRODUCT_SELECT + f" WHERE p.product_id IN ({placeholders})", missing)
+        loaded = {row['product_id']: row for row in _dict_rows(cur, cur.fetchall())}
+        with self._lock:
+            for product_id in missing:
+                row = loaded.get(product_id)
+                self._store(('product', product_id), [row] if row else [], now)
+                if row:
+                    found[product_id] = row
+        return found
+
+    def version(self, cur):
+        """Current catalog version (latest change_id), or None without version checks."""
+        self._sync(cur)
+        return self._version if self._version_checks else None
+
+    def document(self, cur):
+        """
+        (body, etag) of the whole catalog as compact JSON:
+        {"categories": [{"id", "name", "products": [product ids]}],
+         "products": {id: {"name", "price", "variant", "shelf_life", "category_id"}}}
+        """
+        return self._get_value(cur, ('document',), self._build_document)
+
+    def document_etag(self, cur):
+        return self.document(cur)[1]
+
+    def _build_document(self, cur):
+        categories = self.categories(cur)
+        cur.execute("""
+            SELECT product_id, product_name, unit_price, variant_size,
+                   shelf_life_days, category_id
+            FROM products
+            ORDER BY product_name
+        """)
+        by_category = {}
+        products = {}
+        for row in _dict_rows(cur, cur.fetchall()):
+            by_category.setdefault(row['category_id'], []).append(row['product_id'])
+            products[row['product_id']] = {
+                'name': row['product_name'],
+                'price': str(row['unit_price']) if row['unit_price'] is not None else '',
+                'variant': row['variant_size'] or '',
+                'shelf_life': row['shelf_life_days'] or 0,
+                'category_id': row['category_id'],
+            }
+        body = json.dumps({
+            'categories': [{'id': c['category_id'], 'name': c['category_name'],
+                            'products': by_category.get(c['category_id'], [])}
+                           for c in categories],
+            'products': products,
+        }, separators=(',', ':')).encode('utf-8')
+        # Content hash: every process builds the same tag for the same catalog
+        return body, hashlib.sha256(body).hexdigest()[:32]
+
+    def _get(self, cur, key, sql, params=()):
+        def load(cur):
+            cur.execute(sql, params)
+            return list(_dict_rows(cur, cur.fetchall()))
+        return self._get_value(cur, key, load)
+
+    def _get_value(self, cur, key, load):
+        self._sync(cur)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = load(cur)
+
+        with self._lock:
+            self._store(key, value, now)
+        return value
+
+    def _store(self, key, value, now):
+        # Caller holds self._lock
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # ── Invalidation ────────────────────────────────────────────────────────
+    def invalidate_product(self, product_id, *category_ids):
+        """Drop a product, the full product list and every list it appears in."""
+        product_id = int(product_id)
+        category_ids = {int(c) for c in category_ids if c not in (None, '')}
+        with self._lock:
+            self._drop(key for key, (_expires, value) in self._entries.items()
+                       if key in (('product', product_id), ('products',), ('document',))
+                       or (key[0] == 'category_products'
+                           and (key[1] in category_ids
+                                or any(row['product_id'] == product_id for row in value))))
+
+    def invalidate_category(self, category_id):
+        """Drop the category list, its products and products carrying its name."""
+        category_id = int(category_id)
+        with self._lock:
+            self._drop(key for key, (_expires, value) in self._entries.items()
+                       if key in (('categories',), ('document',))
+                       or key == ('category_products', category_id)
+                       or (key[0] == 'product' and value and value[0]['category_id'] == category_id))
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def _drop(self, keys):
+        for key in list(keys):
+            del self._entries[key]
+            self.invalidations += 1
+
+    # ── Cross-process version check ─────────────────────────────────────────
+    def _sync(self, cur):
+        """Apply catalog changes committed by any process since the last check."""
+        if not self._version_checks:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        last_checked = self._checked_at
+        stale = now - last_checked > self.ttl
+        self._checked_at = now
+
+        try:
+            if self._version is None or stale:
+                # First check, or idle past the TTL: every entry is suspect
+                cur.execute("SELECT COALESCE(MAX(change_id), 0) AS version FROM catalog_changes")
+                row = cur.fetchone()
+                self._version = row['version'] if isinstance(row, dict) else row[0]
+                self.clear()
+                return
+
+            cur.execute("""
+                SELECT change_id, entity, entity_id, category_id
+                FROM catalog_changes
+                WHERE change_id > %s
+                ORDER BY change_id
+                LIMIT %s
+            """, (self._version, MAX_CHANGES_PER_CHECK))
+            changes = cur.fetchall()
+        except MySQLdb.Error as e:
+            if e.args and e.args[0] == ER_NO_SUCH_TABLE:
+                # Table not migrated yet: fall back to TTL expiry only
+                print(f"Catalog cache version check disabled: {e}")
+                self._version_checks = False
+            else:
+                # Transient (lost connection, lock wait...): retry next request
+                print(f"Catalog cache version check failed: {e}")
+                self._checked_at = last_checked
+            return
+
+        if not changes:
+            return
+        if not isinstance(changes[0], dict):
+            changes = [dict(zip(('change_id', 'entity', 'entity_id', 'category_id'), row))
+                       for row in changes]
+        if len(changes) >= MAX_CHANGES_PER_CHECK:
+            self.clear()
+        else:
+            for change in changes:
+                if change['entity'] == 'product':
+                    self.invalidate_product(change['entity_id'], change['category_id'])
+                else:
+                    self.invalidate_category(change['entity_id'])
+        # Changes committed out of id order within one interval can be
+        # skipped here; the TTL bounds how long those stay stale.
+        self._version = changes[-1]['change_id']
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'version': self._version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(100.0 * self.hits / lookups, 1) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,132 @@
+"""
+Streaming CSV / XLSX exports
+Rows come from a generator (normally reading an unbuffered SSCursor), so an
+export of millions of rows holds one batch in memory at a time.
+
+CSV is written as the rows arrive: the download starts with the first
+batch. XLSX is a zip archive and can only be sent once complete, so it is
+built with openpyxl's write-only workbook (rows are flushed to a temporary
+file as they are added) and then streamed from that file. openpyxl is
+optional; without it only CSV is offered.
+"""
+import csv
+import io
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+
+import MySQLdb
+from flask import Response, stream_with_context
+
+try:
+    import openpyxl
+except ImportError:  # XLSX export is optional
+    openpyxl = None
+
+EXPORT_FORMATS = ('csv', 'xlsx') if openpyxl is not None else ('csv',)
+FETCH_BATCH = 1000
+CSV_FLUSH_ROWS = 500
+FILE_CHUNK = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def iter_query(mysql, sql, params=(), batch=FETCH_BATCH):
+    """
+    Yield dict rows of ``sql`` from an unbuffered cursor. Call from inside
+    the response generator so the cursor lives on the streaming context's
+    connection, not the view's (which is returned at teardown).
+    """
+    cur = mysql.connection.cursor(MySQLdb.cursors.SSDictCursor)
+    try:
+        cur.execute(sql, list(params))
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        # Drains anything unread so the pooled connection is reusable
+        cur.close()
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _xlsx_cell(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _disposition(filename):
+    return f'attachment; filename="{filename}"'
+
+
+def csv_response(filename, columns, rows):
+    """
+    ``columns`` is a list of (header, key) pairs; ``rows`` any iterable of
+    dicts (usually a generator over iter_query).
+    """
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([header for header, _key in columns])
+        pending = 0
+        for row in rows:
+            writer.writerow([_cell(row.get(key)) for _header, key in columns])
+            pending += 1
+            if pending >= CSV_FLUSH_ROWS:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        yield buffer.getvalue().encode('utf-8')
+
+    response = Response(stream_with_context(generate()), mimetype='text/csv')
+    response.headers['Content-Disposition'] = _disposition(f"{filename}.csv")
+    return response
+
+
+def xlsx_response(filename, columns, rows):
+    """Same arguments as csv_response; the sheet is built write-only, then streamed."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=filename[:31])
+    sheet.append([header for header, _key in columns])
+    for row in rows:
+        sheet.append([_xlsx_cell(row.get(key)) for _header, key in columns])
+
+    spool = tempfile.TemporaryFile()
+    workbook.save(spool)
+    size = spool.tell()
+    spool.seek(0)
+
+    def generate():
+        try:
+            while True:
+                chunk = spool.read(FILE_CHUNK)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            spool.close()
+
+    response = Response(generate(), mimetype=XLSX_MIMETYPE)
+    response.headers['Content-Disposition'] = _disposition(f"{filename}.xlsx")
+    response.headers['Content-Length'] = str(size)
+    return response
+
+
+def export_response(fmt, filename, columns, rows):
+    """csv_response or xlsx_response for ``fmt`` (anything unknown gets CSV)."""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M')
+    if fmt == 'xlsx' and openpyxl is not None:
+        return xlsx_response(f"{filename}_{stamp}", columns, rows)
+    return csv_response(f"{filename}_{stamp}", columns, rows)
@@ -0,0 +1,67 @@
+"""
+Conditional GET for JSON endpoints
+@conditional(validator) gives a view a strong ETag and answers
+If-None-Match with 304 Not Modified.
+
+The validator receives the view's arguments and returns a cheap
+fingerprint of what the view would return (a catalog version, row
+timestamps, a MAX(id) / COUNT(*)), or None to skip caching for this request
+(not logged in, row not found: the view then answers as usual). When the
+fingerprint matches the client's ETag the view is not run at all, so its
+query, row materialization and JSON serialization are skipped.
+
+Without a validator the view always runs and the ETag is a hash of the body,
+which still saves the transfer for small single-row responses.
+"""
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+
+
+def _apply_headers(response, max_age, vary):
+    response.cache_control.private = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        # Cache, but revalidate every time
+        response.cache_control.no_cache = True
+    for header in vary:
+        response.vary.add(header)
+    return response
+
+
+def conditional(validator=None, max_age=0, vary=('Cookie',)):
+    """
+    Decorator for GET views returning JSON. Responses are per-session, so
+    they are marked private and Vary: Cookie by default.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            etag = None
+            if validator is not None:
+                fingerprint = validator(*args, **kwargs)
+                if fingerprint is None:
+                    return view(*args, **kwargs)
+                # Path and query string (e.g. ?variant_size=) pick the body too
+                etag = hashlib.sha256(f"{request.full_path}|{fingerprint}".encode('utf-8')).hexdigest()[:32]
+                if request.if_none_match.contains(etag):
+                    not_modified = make_response('', 304)
+                    not_modified.set_etag(etag)
+                    return _apply_headers(not_modified, max_age, vary)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            if etag is None:
+                response.add_etag()
+            else:
+                response.set_etag(etag)
+            _apply_headers(response, max_age, vary)
+            return response.make_conditional(request)
+        return wrapped
+    return decorator
@@ -0,0 +1,263 @@
+"""
+Unread message counters and thread summaries
+message_unread_counters holds, per distributor, the number of unread admin
+messages for each order (order_id = the order) and in total (order_id = 0),
+so the unread badges are primary-key reads instead of a COUNT(*) over
+messages JOIN orders.
+
+Writers keep it exact in the same transaction as the messages change:
+delivering admin messages calls add_unread(), marking an order's messages
+read calls mark_read() with the number of rows the UPDATE flipped. Both
+touch a distributor's rows in key order (total row first), so they queue
+behind each other instead of deadlocking. ``flask messages
+reconcile-unread`` recomputes the table if it ever drifts (e.g. after
+manual SQL against messages).
+
+message_threads holds one row per order with messages: how many there
+are, how many distributor questions still wait for an admin reply, and the
+latest question, so the admin inbox pages through it instead of scanning
+messages. A distributor question calls record_question(); delivered admin
+messages call record_replies(), which answers every open question of their
+orders. ``flask messages rebuild-threads`` recomputes it.
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+# Unread admin messages per (distributor, order) plus a per-distributor total (order_id 0)
+_AGGREGATE = """
+    SELECT o.distributor_id, m.order_id, COUNT(*) as unread
+    FROM messages m
+    JOIN orders o ON m.order_id = o.order_id
+    WHERE m.admin_id IS NOT NULL AND m.is_read = 0 AND o.distributor_id IS NOT NULL
+    GROUP BY o.distributor_id, m.order_id
+    UNION ALL
+    SELECT o.distributor_id, 0, COUNT(*)
+    FROM messages m
+    JOIN orders o ON m.order_id = o.order_id
+    WHERE m.admin_id IS NOT NULL AND m.is_read = 0 AND o.distributor_id IS NOT NULL
+    GROUP BY o.distributor_id
+"""
+
+
+def add_unread(cur, messages):
+    """
+    Count newly inserted admin messages, given as (distributor_id, order_id)
+    pairs (one per message). Call before commit.
+    """
+    deltas = {}
+    for distributor_id, order_id in messages:
+        if distributor_id is None:
+            continue
+        for key in ((distributor_id, 0), (distributor_id, order_id)):
+            deltas[key] = deltas.get(key, 0) + 1
+    if deltas:
+        cur.executemany("""
+            INSERT INTO message_unread_counters (distributor_id, order_id, unread)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE unread = unread + VALUES(unread)
+        """, [(distributor_id, order_id, delta)
+              for (distributor_id, order_id), delta in sorted(deltas.items())])
+
+
+def mark_read(cur, distributor_id, order_id, count):
+    """Subtract ``count`` messages just marked read on one order. Call before commit."""
+    if count > 0:
+        cur.execute("""
+            UPDATE message_unread_counters
+            SET unread = GREATEST(unread - %s, 0)
+            WHERE distributor_id = %s AND order_id IN (0, %s)
+        """, (count, distributor_id, order_id))
+
+
+def unread_counts(cur, distributor_ids):
+    """{distributor_id: unread admin messages} for each id (0 when none)."""
+    distributor_ids = sorted({int(d) for d in distributor_ids if d is not None})
+    counts = dict.fromkeys(distributor_ids, 0)
+    if not distributor_ids:
+        return counts
+    placeholders = ', '.join(['%s'] * len(distributor_ids))
+    cur.execute(f"""
+        SELECT distributor_id, unread
+        FROM message_unread_counters
+        WHERE order_id = 0 AND distributor_id IN ({placeholders})
+    """, distributor_ids)
+    for row in cur.fetchall():
+        if isinstance(row, dict):
+            counts[row['distributor_id']] = row['unread']
+        else:
+            counts[row[0]] = row[1]
+    return counts
+
+
+# Keyset sort columns must be NOT NULL: threads without questions use this
+NO_QUESTION_AT = '1970-01-01 00:00:00'
+
+# Longest question excerpt kept on the thread row
+QUESTION_EXCERPT = 255
+
+
+def record_question(cur, order_id, distributor_id, message):
+    """Count a distributor question on its order's thread; call before commit."""
+    cur.execute("""
+        INSERT INTO message_threads
+            (order_id, distributor_id, message_count, open_questions, awaiting_reply,
+             last_question, last_question_at, last_message_at)
+        VALUES (%s, %s, 1, 1, 1, %s, NOW(), NOW())
+        ON DUPLICATE KEY UPDATE
+            message_count = message_count + 1,
+            open_questions = open_questions + 1,
+            awaiting_reply = 1,
+            last_question = VALUES(last_question),
+            last_question_at = VALUES(last_question_at),
+            last_message_at = VALUES(last_message_at)
+    """, (order_id, distributor_id, (message or '')[:QUESTION_EXCERPT]))
+
+
+def record_replies(cur, messages):
+    """
+    Count admin messages, given as (order_id, distributor_id, created_at)
+    per message, on their threads; each answers the order's open
+    questions. Call before commit.
+    """
+    threads = {}
+    for order_id, distributor_id, created_at in messages:
+        count, _distributor_id, latest = threads.get(order_id, (0, distributor_id, None))
+        if latest is None or (created_at is not None and created_at > latest):
+            latest = created_at
+        threads[order_id] = (count + 1, distributor_id, latest)
+    if threads:
+        cur.executemany("""
+            INSERT INTO message_threads
+                (order_id, distributor_id, message_count, open_questions, awaiting_reply,
+                 last_question_at, last_message_at)
+            VALUES (%s, %s, %s, 0, 0, %s, COALESCE(%s, NOW()))
+            ON DUPLICATE KEY UPDATE
+                message_count = message_count + VALUES(message_count),
+                open_questions = 0,
+                awaiting_reply = 0,
+                last_message_at = GREATEST(last_message_at, VALUES(last_message_at))
+        """, [(order_id, distributor_id, count, NO_QUESTION_AT, latest)
+              for order_id, (count, distributor_id, latest) in sorted(threads.items())])
+
+
+def rebuild_threads(conn):
+    """Recompute message_threads from messages in one transaction; returns the thread count."""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM message_threads")
+        cur.execute("""
+            INSERT INTO message_threads
+                (order_id, distributor_id, message_count, open_questions, awaiting_reply,
+                 last_question_at, last_message_at)
+            SELECT m.order_id, MAX(o.distributor_id), COUNT(*),
+                   SUM(m.admin_id IS NULL AND m.message_id > COALESCE(a.last_reply_id, 0)),
+                   SUM(m.admin_id IS NULL AND m.message_id > COALESCE(a.last_reply_id, 0)) > 0,
+                   COALESCE(MAX(CASE WHEN m.admin_id IS NULL THEN m.created_at END), %s),
+                   COALESCE(MAX(m.created_at), %s)
+            FROM messages m
+            JOIN orders o ON m.order_id = o.order_id
+            LEFT JOIN (
+                SELECT order_id, MAX(message_id) as last_reply_id
+                FROM messages
+                WHERE admin_id IS NOT NULL
+                GROUP BY order_id
+            ) a ON a.order_id = m.order_id
+            GROUP BY m.order_id
+        """, (NO_QUESTION_AT, NO_QUESTION_AT))
+        count = cur.rowcount
+        cur.execute(f"""
+            UPDATE message_threads t
+            JOIN (
+                SELECT order_id, MAX(message_id) as message_id
+                FROM messages
+                WHERE admin_id IS NULL
+                GROUP BY order_id
+            ) q ON q.order_id = t.order_id
+            JOIN messages m ON m.message_id = q.message_id
+            SET t.last_question = LEFT(m.message, {QUESTION_EXCERPT})
+        """)
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def reconcile_unread(conn):
+    """Replace every counter with a fresh count in one transaction; returns the row count."""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM message_unread_counters")
+        cur.execute(f"""
+            INSERT INTO message_unread_counters (distributor_id, order_id, unread)
+            {_AGGREGATE}
+        """)
+        count = cur.rowcount
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def unread_drift(conn):
+    """(distributor_id, order_id, stored, actual) for every counter that is off."""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT fresh.distributor_id, fresh.order_id, COALESCE(c.unread, 0), fresh.unread
+            FROM ({_AGGREGATE}) fresh
+            LEFT JOIN message_unread_counters c
+                ON c.distributor_id = fresh.distributor_id AND c.order_id = fresh.order_id
+            WHERE COALESCE(c.unread, 0) <> fresh.unread
+            UNION ALL
+            SELECT c.distributor_id, c.order_id, c.unread, 0
+            FROM message_unread_counters c
+            LEFT JOIN ({_AGGREGATE}) fresh
+                ON fresh.distributor_id = c.distributor_id AND fresh.order_id = c.order_id
+            WHERE fresh.distributor_id IS NULL AND c.unread <> 0
+        """)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+# ==========================================
+# CLI: flask messages ...
+# ==========================================
+messages_cli = AppGroup('messages', help='Maintain message bookkeeping tables.')
+
+
+def _connection():
+    return current_app.extensions['mysql_pool'].connection
+
+
+@messages_cli.command('reconcile-unread')
+def reconcile_unread_command():
+    """Recompute message_unread_counters from the messages table."""
+    count = reconcile_unread(_connection())
+    click.echo(f"message_unread_counters rebuilt: {count} counter rows.")
+
+
+@messages_cli.command('rebuild-threads')
+def rebuild_threads_command():
+    """Recompute message_threads (the admin inbox) from the messages table."""
+    count = rebuild_threads(_connection())
+    click.echo(f"message_threads rebuilt: {count} threads.")
+
+
+@messages_cli.command('check-unread')
+def check_unread_command():
+    """Report counters that have drifted from the messages table."""
+    drift = unread_drift(_connection())
+    for distributor_id, order_id, stored, actual in drift:
+        scope = f"order {order_id}" if order_id else "total"
+        click.echo(f"  distributor {distributor_id} {scope}: {stored} vs {actual}")
+    click.echo(f"{len(drift)} drifted counter(s)." if drift else "message_unread_counters matches messages.")
+    if drift:
+        raise SystemExit(1)
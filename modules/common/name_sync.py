@@ -0,0 +1,208 @@
+"""
+Product / category name propagation
+stock, order_items, distributor_stock, sales and stock_summary keep copies
+of product_name / category_name so their read paths need no joins. A
+rename records an event with record_name_change() in the same transaction
+as the UPDATE (a transactional outbox); the NameSync worker thread then
+copies the *current* names from products / category onto every copy in
+batches of NAME_SYNC_BATCH rows, one short transaction per batch.
+
+Events only carry the entity id, so replaying one, or applying two renames
+of the same product out of order, always converges on the latest name.
+Finished events record a search change so every process reindexes the
+stock rows carrying the new names.
+"""
+import threading
+
+import MySQLdb
+
+from modules.common.search_index import record_search_change
+
+# table -> columns refreshed when a product changes (matched on product_id)
+PRODUCT_COPIES = {
+    'stock': ('product_name', 'category_id', 'category_name'),
+    'order_items': ('product_name', 'category_id', 'category_name'),
+    'distributor_stock': ('product_name', 'category_id', 'category_name'),
+    'sales': ('product_name',),
+    'stock_summary': ('product_name', 'category_id', 'category_name'),
+}
+
+# table -> columns refreshed when a category changes (matched on category_id)
+CATEGORY_COPIES = {
+    'stock': ('category_name',),
+    'order_items': ('category_name',),
+    'distributor_stock': ('category_name',),
+    'stock_summary': ('category_name',),
+}
+
+# Fallbacks for NOT NULL copy columns, as in the 0004 stock_summary backfill
+# (a product's category may be gone, leaving the joined name NULL)
+NOT_NULL_DEFAULTS = {
+    'stock_summary': {'product_name': 'Unknown Product', 'category_name': 'Uncategorized'},
+}
+
+# Events retried this many times before being marked failed
+MAX_ATTEMPTS = 5
+
+# Named lock (GET_LOCK) so only one process drains the outbox at a time
+_LOCK_NAME = 'golden_bee_name_sync'
+
+
+def record_name_change(cur, entity, entity_id):
+    """Queue propagation of a product / category rename; call before commit."""
+    cur.execute("""
+        INSERT INTO name_sync_outbox (entity, entity_id)
+        VALUES (%s, %s)
+    """, (entity, entity_id))
+
+
+class NameSync:
+    """Background worker that drains name_sync_outbox."""
+
+    def __init__(self, app=None, mysql=None):
+        self.mysql = mysql
+        self.batch_size = 500
+        self.interval = 60
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.mysql = mysql
+        self.batch_size = int(app.config.get('NAME_SYNC_BATCH', 500))
+        self.interval = float(app.config.get('NAME_SYNC_INTERVAL', 60))
+        app.extensions['name_sync'] = self
+        if app.config.get('NAME_SYNC_WORKER', True):
+            # Also picks up events left over from a previous run
+            self.kick()
+
+    # ── Worker thread ───────────────────────────────────────────────────────
+    def kick(self):
+        """Wake the worker (starting it if needed); call after committing a rename."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='name-sync', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"Name sync failed: {e}")
+
+    # ── Draining ────────────────────────────────────────────────────────────
+    def drain(self):
+        """Apply every pending event; returns how many were processed."""
+        processed = 0
+        with self.mysql.pool.connection() as conn:
+            cur = conn.cursor(MySQLdb.cursors.DictCursor)
+            try:
+                cur.execute("SELECT GET_LOCK(%s, 0) as acquired", (_LOCK_NAME,))
+                if not cur.fetchone()['acquired']:
+                    return 0
+                try:
+                    # Walk forward by event_id so a failing event waits for
+                    # the next wake-up instead of being retried in a loop
+                    last_id = 0
+                    while True:
+                        cur.execute("""
+                            SELECT event_id, entity, entity_id
+                            FROM name_sync_outbox
+                            WHERE status = 'pending' AND event_id > %s
+                            ORDER BY event_id
+                            LIMIT 100
+                        """, (last_id,))
+                        events = cur.fetchall()
+                        conn.commit()
+                        if not events:
+                            break
+                        last_id = events[-1]['event_id']
+                        processed += self._apply_events(conn, cur, events)
+                finally:
+                    cur.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+            finally:
+                cur.close()
+        return processed
+
+    def _apply_events(self, conn, cur, events):
+        # Several renames of one entity collapse into a single pass
+        grouped = {}
+        for event in events:
+            grouped.setdefault((event['entity'], event['entity_id']), []).append(event)
+
+        for (entity, entity_id), group in grouped.items():
+            event_ids = [event['event_id'] for event in group]
+            placeholders = ', '.join(['%s'] * len(event_ids))
+            try:
+                rows = self.propagate(conn, cur, entity, entity_id)
+                cur.execute(f"""
+                    UPDATE name_sync_outbox
+                    SET status = 'done', processed_at = NOW(), error = NULL
+                    WHERE event_id IN ({placeholders})
+                """, event_ids)
+                # Stock is indexed under its own name copies
+                record_search_change(cur, f"stock_{entity}", entity_id)
+                conn.commit()
+                print(f"Name sync: {entity} {entity_id} -> {rows} rows")
+            except Exception as e:
+                conn.rollback()
+                print(f"Name sync failed for {entity} {entity_id}: {e}")
+                cur.execute(f"""
+                    UPDATE name_sync_outbox
+                    SET attempts = attempts + 1, error = %s,
+                        status = IF(attempts >= %s, 'failed', 'pending')
+                    WHERE event_id IN ({placeholders})
+                """, [str(e)[:2000], MAX_ATTEMPTS] + event_ids)
+                conn.commit()
+        return len(events)
+
+    def propagate(self, conn, cur, entity, entity_id):
+        """Copy the current names of one product / category everywhere; returns rows changed."""
+        if entity == 'product':
+            cur.execute("""
+                SELECT p.product_name, p.category_id, c.category_name
+                FROM products p
+                LEFT JOIN category c ON p.category_id = c.category_id
+                WHERE p.product_id = %s
+            """, (entity_id,))
+            copies, key = PRODUCT_COPIES, 'product_id'
+        else:
+            cur.execute("SELECT category_name FROM category WHERE category_id = %s", (entity_id,))
+            copies, key = CATEGORY_COPIES, 'category_id'
+        current = cur.fetchone()
+        conn.commit()
+        if current is None:
+            # Deleted since: nothing left to copy
+            return 0
+
+        changed = 0
+        for table, columns in copies.items():
+            defaults = NOT_NULL_DEFAULTS.get(table, {})
+            values = {column: current[column] if current[column] is not None else defaults.get(column)
+                      for column in columns}
+            changed += self._update_in_batches(conn, cur, table, key, entity_id, values)
+        return changed
+
+    def _update_in_batches(self, conn, cur, table, key, key_value, values):
+        assignments = ', '.join(f"{column} = %s" for column in values)
+        # <=> is NULL-safe, so rows already carrying the names are skipped
+        unchanged = ' AND '.join(f"{column} <=> %s" for column in values)
+        sql = f"""
+            UPDATE {table} SET {assignments}
+            WHERE {key} = %s AND NOT ({unchanged})
+            LIMIT %s
+        """
+        params = list(values.values()) + [key_value] + list(values.values()) + [self.batch_size]
+        changed = 0
+        while True:
+            cur.execute(sql, params)
+            conn.commit()
+            changed += cur.rowcount
+            if cur.rowcount < self.batch_size:
+                return changed
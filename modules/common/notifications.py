@@ -0,0 +1,247 @@
+"""
+Distributor notifications (transactional outbox)
+Order accept / reject / admin messages call record_notifications() with the
+same cursor as the order change, so the notification commits (or rolls
+back) with it: no second transaction per action and nothing lost when the
+request fails after the order commit.
+
+The NotificationDispatcher worker thread drains notification_outbox in
+batches of NOTIFY_BATCH rows per channel. NOTIFY_WORKER=0 keeps the thread
+out of a process (kick() does nothing there) and leaves the outbox to the
+processes that run it. Every outbox row is addressed to one channel:
+
+    messages   rows are copied into the messages table with executemany in
+               the transaction that marks them delivered (exactly once),
+               updating message_unread_counters / message_threads alongside
+    others     registered with register_channel(name, send); send() gets a
+               batch of rows and the rows are marked delivered once it
+               returns (at least once, so senders should be idempotent)
+
+Whether the tables exist is checked by ready(): once they are found the
+answer is kept for the life of the process; a missing table is asked about
+again after READY_RECHECK_SECONDS, so running the migration takes effect
+without a restart.
+
+After a batch lands in messages the dispatcher publishes the affected
+distributors' new unread counts on the in-process PubSub (topic
+unread_topic(distributor_id)), which the distributor's open pages receive
+as Server-Sent Events.
+"""
+import threading
+import time
+
+import MySQLdb
+
+from modules.common.message_counters import add_unread, record_replies, unread_counts
+
+# Batches retried this many times before their rows are marked failed
+MAX_ATTEMPTS = 5
+
+# A failed table check is repeated after this long
+READY_RECHECK_SECONDS = 60
+
+# Named lock (GET_LOCK) so only one process drains the outbox at a time
+_LOCK_NAME = 'golden_bee_notifications'
+
+_OUTBOX_COLUMNS = 'notification_id, channel, order_id, distributor_id, admin_id, message, message_type, created_at'
+
+
+def _deliver_messages(cur, notifications):
+    cur.executemany("""
+        INSERT INTO messages (order_id, distributor_id, admin_id, message, message_type, created_at, is_read)
+        VALUES (%s, %s, %s, %s, %s, %s, 0)
+    """, [(n['order_id'], n['distributor_id'], n['admin_id'], n['message'], n['message_type'],
+           n['created_at']) for n in notifications])
+    replies = [n for n in notifications if n['admin_id'] is not None]
+    add_unread(cur, [(n['distributor_id'], n['order_id']) for n in replies])
+    record_replies(cur, [(n['order_id'], n['distributor_id'], n['created_at']) for n in replies])
+
+
+def unread_topic(distributor_id):
+    return ('unread', int(distributor_id))
+
+
+def publish_unread(cur, pubsub, distributor_ids):
+    """Push current unread counts to subscribed distributors; call after commit."""
+    if pubsub is None:
+        return
+    watched = [d for d in distributor_ids if d is not None and pubsub.has_subscribers(unread_topic(d))]
+    if watched:
+        for distributor_id, count in unread_counts(cur, watched).items():
+            pubsub.publish(unread_topic(distributor_id), count)
+
+
+# channel -> send(cur, notifications); new notifications go to every channel
+_channels = {'messages': _deliver_messages}
+
+
+def register_channel(name, send):
+    """Deliver future notifications to ``send(cur, rows)`` as well (e.g. SMS, e-mail)."""
+    _channels[name] = send
+
+
+def record_notifications(cur, notifications):
+    """
+    Queue (order_id, distributor_id, admin_id, message, message_type) tuples
+    for every channel; call before commit.
+    """
+    rows = [(channel,) + tuple(notification)
+            for notification in notifications for channel in _channels]
+    if rows:
+        cur.executemany("""
+            INSERT INTO notification_outbox
+                (channel, order_id, distributor_id, admin_id, message, message_type)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, rows)
+
+
+def record_notification(cur, order_id, distributor_id, admin_id, message, message_type='general'):
+    """Queue one notification; call before commit."""
+    record_notifications(cur, [(order_id, distributor_id, admin_id, message, message_type)])
+
+
+class NotificationDispatcher:
+    """Background worker that drains notification_outbox."""
+
+    def __init__(self, app=None, mysql=None, pubsub=None):
+        self.mysql = mysql
+        self.pubsub = pubsub
+        self.batch_size = 200
+        self.interval = 30
+        self.worker = True
+        self._ready = False
+        self._ready_checked_at = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, mysql, pubsub)
+
+    def init_app(self, app, mysql, pubsub=None):
+        self.mysql = mysql
+        self.pubsub = pubsub
+        self.batch_size = int(app.config.get('NOTIFY_BATCH', 200))
+        self.interval = float(app.config.get('NOTIFY_INTERVAL', 30))
+        app.extensions['notifications'] = self
+        self.worker = bool(app.config.get('NOTIFY_WORKER', True))
+        if self.worker:
+            # Also delivers anything queued before the last shutdown
+            self.kick()
+
+    # ── Table check ─────────────────────────────────────────────────────────
+    def _ready_due(self):
+        return (self._ready_checked_at is None
+                or time.monotonic() - self._ready_checked_at >= READY_RECHECK_SECONDS)
+
+    def ready(self):
+        """True once notification_outbox and messages are known to exist."""
+        if not self._ready and self._ready_due():
+            with self._lock:
+                if not self._ready and self._ready_due():
+                    self._ready_checked_at = time.monotonic()
+                    try:
+                        with self.mysql.pool.connection() as conn:
+                            cur = conn.cursor()
+                            cur.execute("""
+                                SELECT COUNT(*) FROM information_schema.tables
+                                WHERE table_schema = DATABASE()
+                                  AND table_name IN ('notification_outbox', 'messages')
+                            """)
+                            self._ready = cur.fetchone()[0] == 2
+                            cur.close()
+                            conn.commit()
+                        if not self._ready:
+                            print("Notifications disabled: run flask db upgrade to create notification_outbox "
+                                  f"(checking again in {READY_RECHECK_SECONDS}s)")
+                    except MySQLdb.Error as e:
+                        # Database unreachable: ask again next time
+                        print(f"Notification table check failed: {e}")
+                        self._ready_checked_at = None
+                        return False
+        return self._ready
+
+    # ── Worker thread ───────────────────────────────────────────────────────
+    def kick(self):
+        """Wake the worker (starting it if needed); call after committing notifications."""
+        if not self.worker:
+            # NOTIFY_WORKER=0: another process drains the outbox
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='notifications', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                if self.ready():
+                    self.drain()
+            except Exception as e:
+                print(f"Notification dispatch failed: {e}")
+
+    # ── Draining ────────────────────────────────────────────────────────────
+    def drain(self):
+        """Deliver every pending notification; returns how many were delivered."""
+        delivered = 0
+        with self.mysql.pool.connection() as conn:
+            cur = conn.cursor(MySQLdb.cursors.DictCursor)
+            try:
+                cur.execute("SELECT GET_LOCK(%s, 0) as acquired", (_LOCK_NAME,))
+                if not cur.fetchone()['acquired']:
+                    return 0
+                try:
+                    for channel, send in list(_channels.items()):
+                        delivered += self._drain_channel(conn, cur, channel, send)
+                finally:
+                    cur.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+            finally:
+                cur.close()
+        return delivered
+
+    def _drain_channel(self, conn, cur, channel, send):
+        # Walk forward by id so a failing batch waits for the next wake-up
+        delivered = 0
+        last_id = 0
+        while True:
+            cur.execute(f"""
+                SELECT {_OUTBOX_COLUMNS}
+                FROM notification_outbox
+                WHERE channel = %s AND status = 'pending' AND notification_id > %s
+                ORDER BY notification_id
+                LIMIT %s
+            """, (channel, last_id, self.batch_size))
+            batch = cur.fetchall()
+            conn.commit()
+            if not batch:
+                return delivered
+            last_id = batch[-1]['notification_id']
+            ids = [row['notification_id'] for row in batch]
+            placeholders = ', '.join(['%s'] * len(ids))
+            try:
+                send(cur, batch)
+                cur.execute(f"""
+                    UPDATE notification_outbox
+                    SET status = 'sent', sent_at = NOW(), error = NULL
+                    WHERE notification_id IN ({placeholders})
+                """, ids)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"Notification delivery via {channel} failed: {e}")
+                cur.execute(f"""
+                    UPDATE notification_outbox
+                    SET attempts = attempts + 1, error = %s,
+                        status = IF(attempts >= %s, 'failed', 'pending')
+                    WHERE notification_id IN ({placeholders})
+                """, [str(e)[:2000], MAX_ATTEMPTS] + ids)
+                conn.commit()
+                continue
+
+            delivered += len(batch)
+            if channel == 'messages':
+                publish_unread(cur, self.pubsub, {row['distributor_id'] for row in batch})
+                conn.commit()
+
@@ -0,0 +1,408 @@
+"""
+Order acceptance
+Accepting an order line moves stock from the admin's batches into the
+distributor's inventory. It runs as one short transaction that can never
+oversell:
+
+    1. lock the order (SELECT ... FOR UPDATE) and refuse it if already accepted
+    2. lock the product / variant's batches (SELECT ... FOR UPDATE, stock_id
+       order) and take FIFO across them; stock.variant_size is NOT NULL
+       (migration 0017), so the lock is an index range on
+       idx_stock_product_variant that leaves the product's other variants free
+    3. refresh stock_summary for the product / variant; its aggregate reads
+       only batches this transaction already holds
+    4. INSERT ... ON DUPLICATE KEY UPDATE into distributor_stock
+    5. mark the line accepted and roll its order's status up from its lines
+    6. queue the distributor's notification (notification_outbox)
+
+Every acceptance locks rows in that same order (order, stock batches by
+stock_id, summary, distributor stock), so two admins accepting at once
+queue behind each other instead of deadlocking. Lock waits / deadlocks that
+do happen (against other writers) are retried.
+
+accept_order_lines / reject_order_lines do the same for a selection of
+lines set-based: one locking read per table, executemany for the writes,
+distributor notifications queued in the same transaction, one commit. Lines
+that cannot be processed are reported without holding up the others.
+
+An accepted line is priced at the unit_price of the oldest batch it takes
+stock from (the order line's own unit_price if that batch has none), for
+both its accepted total and the distributor's stock row.
+
+An order can hold many lines, each with its own status. The order's status
+follows them: pending while any line is, then accepted if any line was
+accepted, else rejected; updated_quantity / updated_total_price add up its
+accepted lines. pending_lines() lists an order's open lines so a whole
+order can be accepted or rejected at once.
+"""
+import random
+import time
+
+import MySQLdb
+
+from modules.common.notifications import record_notification, record_notifications
+from modules.common.stock_summary import refresh_stock_summary
+
+# ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT: the transaction was rolled back
+RETRYABLE_ERRORS = (1213, 1205)
+MAX_ATTEMPTS = 4
+RETRY_BASE_SECONDS = 0.05
+
+# Most order lines one bulk action may touch
+MAX_BULK_LINES = 500
+
+_UPSERT_DISTRIBUTOR_STOCK = """
+    INSERT INTO distributor_stock
+        (distributor_id, product_id, product_name, category_id, category_name,
+         variant_size, quantity, unit_price)
+    SELECT %s, p.product_id, p.product_name, p.category_id, c.category_name, %s, %s, %s
+    FROM products p
+    LEFT JOIN category c ON p.category_id = c.category_id
+    WHERE p.product_id = %s
+    ON DUPLICATE KEY UPDATE
+        quantity = quantity + VALUES(quantity),
+        unit_price = VALUES(unit_price),
+        last_updated = NOW()
+"""
+
+_MARK_ACCEPTED = """
+    UPDATE order_items
+    SET quantity = %s,
+        subtotal = %s,
+        status = 'accepted'
+    WHERE order_item_id = %s
+"""
+
+# Order status and accepted totals from its lines; rejected lines drop out of total_amount
+_ROLL_UP_ORDERS = """
+    UPDATE orders o
+    INNER JOIN (
+        SELECT order_id,
+               SUM(status = 'pending') as pending,
+               SUM(status = 'accepted') as accepted,
+               SUM(CASE WHEN status = 'accepted' THEN quantity ELSE 0 END) as accepted_quantity,
+               SUM(CASE WHEN status = 'accepted' THEN subtotal ELSE 0 END) as accepted_total,
+               SUM(CASE WHEN status <> 'rejected' THEN subtotal ELSE 0 END) as open_total
+        FROM order_items
+        WHERE order_id IN ({placeholders})
+        GROUP BY order_id
+    ) l ON l.order_id = o.order_id
+    SET o.status = CASE WHEN l.pending > 0 THEN 'pending'
+                        WHEN l.accepted > 0 THEN 'accepted'
+                        ELSE 'rejected' END,
+        o.updated_quantity = IF(l.accepted > 0, l.accepted_quantity, o.updated_quantity),
+        o.updated_total_price = IF(l.accepted > 0, l.accepted_total, o.updated_total_price),
+        o.total_amount = IF(l.pending + l.accepted > 0, l.open_total, o.total_amount)
+"""
+
+_LINE_COLUMNS = """
+    oi.order_item_id, oi.order_id, oi.product_id, oi.product_name,
+    oi.variant_size, oi.quantity, oi.unit_price, oi.status,
+    o.distributor_id, o.status as order_status
+"""
+
+
+class AcceptError(ValueError):
+    """The order line cannot be accepted (message is shown to the admin)."""
+
+
+def is_retryable(error):
+    return isinstance(error, MySQLdb.OperationalError) and error.args and error.args[0] in RETRYABLE_ERRORS
+
+
+def upsert_distributor_stock(cur, distributor_id, product_id, variant_size, quantity, unit_price):
+    """Add ``quantity`` to the distributor's row for product + variant, creating it if needed."""
+    cur.execute(_UPSERT_DISTRIBUTOR_STOCK,
+                (distributor_id, variant_size or '', quantity, unit_price, product_id))
+    if cur.rowcount == 0:
+        raise AcceptError("Product no longer exists")
+
+
+def _take_stock(cur, product_id, variant_size, quantity):
+    """
+    Remove ``quantity`` from the product / variant's batches or raise
+    AcceptError. Returns the unit_price of the first batch taken from.
+    """
+    # Lock every batch up front (stock_id order), not just the one decremented:
+    # refresh_stock_summary then reads them all, and a concurrent accept
+    # holding another batch would deadlock against that read.
+    cur.execute("""
+        SELECT stock_id, quantity, unit_price
+        FROM stock
+        WHERE product_id = %s AND variant_size = %s AND quantity > 0
+        ORDER BY stock_id
+        FOR UPDATE
+    """, (product_id, variant_size or ''))
+    batches = cur.fetchall()
+    available = sum(batch['quantity'] for batch in batches)
+    if available < quantity:
+        raise AcceptError(f"Insufficient stock! Available: {available}, Requested: {quantity}")
+
+    remaining = quantity
+    for batch in batches:
+        take = min(batch['quantity'], remaining)
+        cur.execute("UPDATE stock SET quantity = quantity - %s WHERE stock_id = %s",
+                    (take, batch['stock_id']))
+        remaining -= take
+        if not remaining:
+            break
+    return batches[0]['unit_price'] if batches else None
+
+
+def roll_up_orders(cur, order_ids):
+    """Recompute the status / accepted totals of orders whose lines just changed."""
+    order_ids = sorted(set(order_ids))
+    if order_ids:
+        cur.execute(_ROLL_UP_ORDERS.format(placeholders=', '.join(['%s'] * len(order_ids))),
+                    order_ids)
+
+
+def pending_lines(conn, order_ids):
+    """order_item_ids of the still pending lines of these orders, ascending."""
+    order_ids = sorted({int(order_id) for order_id in order_ids})
+    if not order_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT order_item_id
+            FROM order_items
+            WHERE order_id IN ({placeholders}) AND status = 'pending'
+            ORDER BY order_item_id
+        """, order_ids)
+        return [row['order_item_id'] if isinstance(row, dict) else row[0] for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def _lock_lines(cur, order_item_ids):
+    """Order lines by id, locked (with their orders) in id order."""
+    placeholders = ', '.join(['%s'] * len(order_item_ids))
+    cur.execute(f"""
+        SELECT {_LINE_COLUMNS}
+        FROM order_items oi
+        INNER JOIN orders o ON oi.order_id = o.order_id
+        WHERE oi.order_item_id IN ({placeholders})
+        ORDER BY oi.order_item_id
+        FOR UPDATE
+    """, list(order_item_ids))
+    return {line['order_item_id']: line for line in cur.fetchall()}
+
+
+def _accept_quantity(line, quantity):
+    if quantity in (None, ''):
+        return line['quantity']
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        raise AcceptError(f"Quantity '{quantity}' is not a whole number")
+    return quantity if quantity > 0 else line['quantity']
+
+
+def _result(line, quantity, total):
+    return {
+        'order_item_id': line['order_item_id'],
+        'order_id': line['order_id'],
+        'distributor_id': line['distributor_id'],
+        'product_id': line['product_id'],
+        'product_name': line['product_name'] or 'Product',
+        'variant_size': line['variant_size'] or '',
+        'quantity': quantity,
+        'total': float(total),
+        'ok': True,
+    }
+
+
+def _failed(order_item_id, error):
+    return {'order_item_id': order_item_id, 'ok': False, 'error': str(error)}
+
+
+def _with_retries(conn, label, work):
+    """Run work(cur) as one transaction, retrying deadlocks / lock wait timeouts."""
+    cur = conn.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                return work(cur)
+            except Exception as e:
+                conn.rollback()
+                if not is_retryable(e) or attempt == MAX_ATTEMPTS:
+                    raise
+                print(f"{label}: retrying after {e.args[1] if len(e.args) > 1 else e}")
+                time.sleep(RETRY_BASE_SECONDS * attempt * (1 + random.random()))
+    finally:
+        cur.close()
+
+
+def _accept_once(conn, cur, order_item_id, quantity, admin_id, message_for):
+    line = _lock_lines(cur, [order_item_id]).get(order_item_id)
+    if not line:
+        raise AcceptError("Order not found")
+    if line['status'] == 'accepted':
+        raise AcceptError("Order has already been accepted")
+
+    accept_quantity = _accept_quantity(line, quantity)
+    unit_price = (_take_stock(cur, line['product_id'], line['variant_size'], accept_quantity)
+                  or line['unit_price'] or 0)
+    total = unit_price * accept_quantity
+
+    refresh_stock_summary(cur, line['product_id'], line['variant_size'])
+    upsert_distributor_stock(cur, line['distributor_id'], line['product_id'],
+                             line['variant_size'], accept_quantity, unit_price)
+    cur.execute(_MARK_ACCEPTED, (accept_quantity, total, order_item_id))
+    roll_up_orders(cur, [line['order_id']])
+    result = _result(line, accept_quantity, total)
+    if message_for:
+        record_notification(cur, line['order_id'], line['distributor_id'], admin_id,
+                            message_for(result), 'accept')
+    conn.commit()
+    return result
+
+
+def accept_order_line(conn, order_item_id, quantity=None, admin_id=None, message_for=None):
+    """
+    Accept one order line for ``quantity`` units (default: as ordered).
+    ``message_for`` builds the distributor's notification from the result.
+    Commits on success and returns a summary dict; raises AcceptError
+    (after rolling back) when it cannot be accepted.
+    """
+    return _with_retries(conn, f"Order accept {order_item_id}",
+                         lambda cur: _accept_once(conn, cur, order_item_id, quantity, admin_id, message_for))
+
+
+# ── Bulk actions ────────────────────────────────────────────────────────────
+def _accept_many_once(conn, cur, quantities, admin_id, message_for):
+    ids = sorted(quantities)
+    lines = _lock_lines(cur, ids)
+    results, wanted = {}, []
+    for order_item_id in ids:
+        line = lines.get(order_item_id)
+        try:
+            if not line:
+                raise AcceptError("Order not found")
+            if line['status'] == 'accepted':
+                raise AcceptError("Order has already been accepted")
+            wanted.append((line, _accept_quantity(line, quantities[order_item_id])))
+        except AcceptError as e:
+            results[order_item_id] = _failed(order_item_id, e)
+
+    # Lock every batch of the products / variants involved, (product_id, stock_id) order
+    batches = {}
+    keys = sorted({(line['product_id'], line['variant_size'] or '') for line, _quantity in wanted})
+    if keys:
+        placeholders = ', '.join(['(%s, %s)'] * len(keys))
+        cur.execute(f"""
+            SELECT stock_id, product_id, variant_size, quantity, unit_price
+            FROM stock
+            WHERE (product_id, variant_size) IN ({placeholders}) AND quantity > 0
+            ORDER BY product_id, stock_id
+            FOR UPDATE
+        """, [value for key in keys for value in key])
+        for row in cur.fetchall():
+            batches.setdefault((row['product_id'], row['variant_size'] or ''), []).append(
+                [row['stock_id'], row['quantity'], row['unit_price']])
+
+    # Allocate FIFO in memory, line by line
+    taken, touched, accepted = {}, set(), []
+    for line, quantity in wanted:
+        key = (line['product_id'], line['variant_size'] or '')
+        available = sum(left for _stock_id, left, _price in batches.get(key, []))
+        if available < quantity:
+            results[line['order_item_id']] = _failed(
+                line['order_item_id'], f"Insufficient stock! Available: {available}, Requested: {quantity}")
+            continue
+        remaining, unit_price = quantity, None
+        for batch in batches[key]:
+            take = min(batch[1], remaining)
+            if take:
+                if unit_price is None:
+                    unit_price = batch[2]
+                batch[1] -= take
+                taken[batch[0]] = taken.get(batch[0], 0) + take
+                remaining -= take
+        touched.add(key)
+        unit_price = unit_price or line['unit_price'] or 0
+        total = unit_price * quantity
+        accepted.append((line, quantity, unit_price, total))
+        results[line['order_item_id']] = _result(line, quantity, total)
+
+    if accepted:
+        cur.executemany("UPDATE stock SET quantity = quantity - %s WHERE stock_id = %s",
+                        [(take, stock_id) for stock_id, take in sorted(taken.items())])
+        for product_id, variant_size in sorted(touched):
+            refresh_stock_summary(cur, product_id, variant_size)
+        cur.executemany(_UPSERT_DISTRIBUTOR_STOCK, [
+            (line['distributor_id'], line['variant_size'] or '', quantity, unit_price,
+             line['product_id'])
+            for line, quantity, unit_price, _total in sorted(accepted, key=lambda a: (a[0]['distributor_id'],
+                                                                                      a[0]['product_id'],
+                                                                                      a[0]['variant_size'] or ''))
+        ])
+        cur.executemany(_MARK_ACCEPTED, [
+            (quantity, total, line['order_item_id'])
+            for line, quantity, _unit_price, total in accepted
+        ])
+        roll_up_orders(cur, [line['order_id'] for line, _quantity, _unit_price, _total in accepted])
+        if message_for:
+            record_notifications(cur, [
+                (line['order_id'], line['distributor_id'], admin_id,
+                 message_for(results[line['order_item_id']]), 'accept')
+                for line, _quantity, _unit_price, _total in accepted
+            ])
+    conn.commit()
+    return [results[order_item_id] for order_item_id in ids]
+
+
+def accept_order_lines(conn, quantities, admin_id=None, message_for=None):
+    """
+    Accept several order lines in one transaction. ``quantities`` maps
+    order_item_id -> quantity (None / '' for as ordered); ``message_for``
+    builds each distributor's message from its result. Returns one result
+    dict per line: ok + the accepted quantity / total, or ok=False + error.
+    """
+    if len(quantities) > MAX_BULK_LINES:
+        raise AcceptError(f"Select at most {MAX_BULK_LINES} order lines at a time")
+    if not quantities:
+        return []
+    return _with_retries(conn, f"Bulk accept of {len(quantities)} lines",
+                         lambda cur: _accept_many_once(conn, cur, quantities, admin_id, message_for))
+
+
+def _reject_many_once(conn, cur, order_item_ids, admin_id, message_for):
+    ids = sorted(order_item_ids)
+    lines = _lock_lines(cur, ids)
+    results, rejected = {}, []
+    for order_item_id in ids:
+        line = lines.get(order_item_id)
+        if not line:
+            results[order_item_id] = _failed(order_item_id, "Order not found")
+        elif line['status'] == 'accepted':
+            results[order_item_id] = _failed(order_item_id, "Order has already been accepted")
+        else:
+            rejected.append(line)
+            results[order_item_id] = _result(line, line['quantity'],
+                                             (line['unit_price'] or 0) * line['quantity'])
+
+    if rejected:
+        cur.executemany("UPDATE order_items SET status = 'rejected' WHERE order_item_id = %s",
+                        [(line['order_item_id'],) for line in rejected])
+        roll_up_orders(cur, [line['order_id'] for line in rejected])
+        if message_for:
+            record_notifications(cur, [
+                (line['order_id'], line['distributor_id'], admin_id,
+                 message_for(results[line['order_item_id']]), 'reject')
+                for line in rejected
+            ])
+    conn.commit()
+    return [results[order_item_id] for order_item_id in ids]
+
+
+def reject_order_lines(conn, order_item_ids, admin_id=None, message_for=None):
+    """Reject several order lines in one transaction; results as accept_order_lines."""
+    if len(order_item_ids) > MAX_BULK_LINES:
+        raise AcceptError(f"Select at most {MAX_BULK_LINES} order lines at a time")
+    if not order_item_ids:
+        return []
+    return _with_retries(conn, f"Bulk reject of {len(order_item_ids)} lines",
+                         lambda cur: _reject_many_once(conn, cur, order_item_ids, admin_id, message_for))
@@ -0,0 +1,240 @@
+"""
+Keyset (seek) pagination helpers shared by the list pages
+Pages are addressed by an opaque cursor holding the (sort value, id) of the
+row at the page edge, so page N costs the same as page 1. Sort keys must be
+NOT NULL columns (rows with NULL in the sort column would be skipped).
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+
+PAGE_SIZES = (25, 50, 100, 200)
+DEFAULT_PAGE_SIZE = 50
+
+
+class SortOption:
+    """A sortable column: SQL expression, row key and display label."""
+
+    __slots__ = ('column', 'key', 'label')
+
+    def __init__(self, column, key, label):
+        self.column = column
+        self.key = key
+        self.label = label
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=str, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Cursor values, or None for a missing / tampered token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    return values
+
+
+class PageRequest:
+    """Parsed ?sort=&dir=&size=&after=&before= query arguments."""
+
+    def __init__(self, sort, option, direction, size, after=None, before=None):
+        self.sort = sort
+        self.option = option
+        self.direction = direction
+        self.size = size
+        self.after = after
+        self.before = before
+
+    @classmethod
+    def from_args(cls, args, sort_options, default_sort, default_dir='desc'):
+        sort = args.get('sort', default_sort)
+        if sort not in sort_options:
+            sort = default_sort
+        direction = args.get('dir', default_dir)
+        if direction not in ('asc', 'desc'):
+            direction = default_dir
+        try:
+            size = int(args.get('size', DEFAULT_PAGE_SIZE))
+        except (TypeError, ValueError):
+            size = DEFAULT_PAGE_SIZE
+        size = max(1, min(size, PAGE_SIZES[-1]))
+
+        before = decode_cursor(args.get('before'))
+        after = None if before else decode_cursor(args.get('after'))
+        return cls(sort, sort_options[sort], direction, size, after, before)
+
+    def link_args(self):
+        return {'sort': self.sort, 'dir': self.direction, 'size': self.size}
+
+
+class Page:
+    """One page of rows plus the cursors for its neighbours."""
+
+    def __init__(self, items, request, has_prev, has_next, id_key, total=None, extra_args=None):
+        self.items = items
+        self.request = request
+        self.total = total
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.extra_args = extra_args or {}
+
+        sort_key = request.option.key
+        self.prev_cursor = encode_cursor((items[0][sort_key], items[0][id_key])) if items and has_prev else None
+        self.next_cursor = encode_cursor((items[-1][sort_key], items[-1][id_key])) if items and has_next else None
+
+    def link_args(self, **overrides):
+        args = dict(self.extra_args)
+        args.update(self.request.link_args())
+        args.update(overrides)
+        return args
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _order_clause(option, id_column, order):
+    if option.column == id_column:
+        return f" ORDER BY {id_column} {order}"
+    return f" ORDER BY {option.column} {order}, {id_column} {order}"
+
+
+def fetch_page(cur, select_sql, page_request, id_column, id_key,
+               where=None, params=(), total=None, extra_args=None):
+    """
+    Run ``select_sql`` (SELECT ... FROM ... JOIN ..., no WHERE/ORDER) as a
+    keyset page. ``where`` is a list of extra SQL conditions using ``params``.
+    """
+    option = page_request.option
+    descending = page_request.direction == 'desc'
+    cursor = page_request.before or page_request.after
+    backwards = page_request.before is not None
+
+    # Walking backwards flips the comparison and sort order; rows are
+    # reversed again after fetching.
+    seek_desc = descending != backwards
+    op = '<' if seek_desc else '>'
+    order = 'DESC' if seek_desc else 'ASC'
+
+    conditions = list(where or [])
+    params = list(params)
+    if cursor is not None:
+        if option.column == id_column:
+            conditions.append(f"{id_column} {op} %s")
+            params.append(cursor[1])
+        else:
+            conditions.append(f"({option.column} {op} %s OR ({option.column} = %s AND {id_column} {op} %s))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+
+    sql = select_sql
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += _order_clause(option, id_column, order)
+    sql += " LIMIT %s"
+    params.append(page_request.size + 1)
+
+    cur.execute(sql, params)
+    rows = list(cur.fetchall())
+    has_more = len(rows) > page_request.size
+    rows = rows[:page_request.size]
+
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = cursor is not None, has_more
+
+    return Page(rows, page_request, has_prev, has_next, id_key, total, extra_args)
+
+
+STREAM_BATCH = 500
+
+
+def stream_rows(cur, select_sql, page_request, id_column, where=None, params=(),
+                batch=STREAM_BATCH):
+    """
+    Yield every row of ``select_sql`` in the page request's sort order.
+    Meant for an unbuffered cursor (SSCursor / SSDictCursor) so rows are
+    read from the server as they are rendered rather than held in memory.
+    The cursor is closed when the generator finishes or is closed.
+    """
+    order = 'DESC' if page_request.direction == 'desc' else 'ASC'
+    sql = select_sql
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += _order_clause(page_request.option, id_column, order)
+    try:
+        cur.execute(sql, list(params))
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        # Closing an unbuffered cursor drains whatever is left unread, so the
+        # pooled connection is usable again.
+        cur.close()
+
+
+# ==========================================
+# CACHED COUNTS / STATS
+# ==========================================
+# Per process and not invalidated on writes: every worker, including the
+# one that just wrote, may show totals / stat cards up to
+# COUNT_TTL_SECONDS old. That staleness bound is accepted for list totals
+# and page counts; the rows on a page are always read fresh.
+_cache_lock = threading.Lock()
+_cache = OrderedDict()   # (key, params, fetch) -> (expires_at, result), LRU order
+
+COUNT_TTL_SECONDS = 60
+
+# Keys include per-request params (distributor ids, search terms): keep the newest few
+CACHE_MAX_ENTRIES = 1000
+
+
+def _cached(cur, key, sql, params, ttl, fetch):
+    now = time.monotonic()
+    cache_key = (key, tuple(params), fetch)
+    with _cache_lock:
+        hit = _cache.get(cache_key)
+        if hit and hit[0] > now:
+            _cache.move_to_end(cache_key)
+            return hit[1]
+
+    cur.execute(sql, params)
+    result = getattr(cur, fetch)()
+    with _cache_lock:
+        _cache[cache_key] = (now + ttl, result)
+        _cache.move_to_end(cache_key)
+        if len(_cache) > CACHE_MAX_ENTRIES:
+            for expired in [k for k, (expires, _result) in _cache.items() if expires <= now]:
+                del _cache[expired]
+            while len(_cache) > CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return result
+
+
+def cached_row(cur, key, sql, params=(), ttl=COUNT_TTL_SECONDS):
+    """
+    fetchone() of an aggregate query, cached in-process for ``ttl`` seconds
+    so list pages do not run COUNT(*) on every request. Writes do not clear
+    it; the result may be up to ``ttl`` seconds old.
+    """
+    return _cached(cur, key, sql, params, ttl, 'fetchone')
+
+
+def cached_rows(cur, key, sql, params=(), ttl=COUNT_TTL_SECONDS):
+    """fetchall() counterpart of cached_row, for GROUP BY counts."""
+    return _cached(cur, key, sql, params, ttl, 'fetchall')
@@ -0,0 +1,107 @@
+"""
+In-process publish / subscribe
+Topics are any hashable key, e.g. ('unread', distributor_id). Subscribers
+only ever need the newest value (a count, a version), so a subscription
+keeps the latest published value instead of a queue: a burst of publishes
+wakes a waiting subscriber once, and a slow one never falls behind.
+
+Subscriptions are plain threading.Condition waits, so an idle Server-Sent
+Events stream costs one sleeping thread and no database connection.
+Publishing only reaches subscribers in the same process; streams that must
+also see other worker processes' changes re-read their value now and then
+(see the distributor unread_stream).
+"""
+import threading
+
+_NOTHING = object()
+
+
+class Subscription:
+    """Latest value published on one topic since the last get()."""
+
+    def __init__(self, hub, topic):
+        self.hub = hub
+        self.topic = topic
+        self._cond = threading.Condition()
+        self._value = _NOTHING
+        self.closed = False
+
+    def _put(self, value):
+        with self._cond:
+            self._value = value
+            self._cond.notify()
+
+    def get(self, timeout=None, default=None):
+        """Wait up to ``timeout`` seconds for a new value; ``default`` if none arrives."""
+        with self._cond:
+            if self._value is _NOTHING:
+                self._cond.wait(timeout)
+            value, self._value = self._value, _NOTHING
+        return default if value is _NOTHING else value
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.hub._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PubSub:
+    """Thread-safe topic -> subscriptions registry for one process."""
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._topics = {}   # topic -> set of Subscription
+        self.published = 0
+        self.delivered = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['pubsub'] = self
+
+    def subscribe(self, topic):
+        subscription = Subscription(self, topic)
+        with self._lock:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._topics.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic, value):
+        """Hand ``value`` to every current subscriber of ``topic``; returns how many."""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+            self.published += 1
+            self.delivered += len(subscribers)
+        for subscription in subscribers:
+            subscription._put(value)
+        return len(subscribers)
+
+    def has_subscribers(self, topic):
+        with self._lock:
+            return topic in self._topics
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._topics.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                'topics': len(self._topics),
+                'subscribers': sum(len(subscribers) for subscribers in self._topics.values()),
+                'published': self.published,
+                'delivered': self.delivered,
+            }
@@ -0,0 +1,569 @@
+"""
+In-process search index
+Replaces LIKE '%q%' scans with a trigram index over the short names the
+admin and distributor pages search on: product / category names, variant
+sizes, distributor names and districts, and sale customer names.
+
+Each index maps distinct *terms* (normalised strings) to the ids of the
+rows that carry them, so 100k stock rows sharing a few thousand product
+names cost a few thousand trigram entries. Searches return ranked ids that
+the routes then fetch by primary key.
+
+Built on startup in a background thread and kept current by the add /
+update / delete routes (refresh / remove). Writers also call
+record_search_change() in the same transaction; at most once every
+SEARCH_INDEX_CHECK_SECONDS each worker process re-reads the rows behind the
+changes newer than the last one it applied, so other processes' writes show
+up without a rebuild. change_ids are handed out at INSERT but become visible
+at COMMIT, so ids skipped over are polled again for a while (a later commit
+of a lower id is not lost), and reapplying a change is harmless. Old changes
+are pruned by the pollers, never by the writers. Without the search_changes
+table the index is instead rebuilt when older than SEARCH_INDEX_MAX_AGE
+seconds.
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+
+import MySQLdb
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Ranking of one query word against one term
+SCORE_EXACT = 5.0
+SCORE_WORD = 4.0
+SCORE_PREFIX = 3.0
+SCORE_WORD_PREFIX = 2.0
+SCORE_SUBSTRING = 1.0
+
+# Share of a word's trigrams a term must contain to count as a typo match
+FUZZY_THRESHOLD = 0.6
+
+# Keep this many changes; older ones are pruned by the pollers
+CHANGE_LOG_KEEP = 10000
+
+# Each process prunes at most this often, this many rows per statement
+PRUNE_SECONDS = 600
+PRUNE_BATCH = 5000
+
+# More new changes than this in one check rebuilds the whole index
+MAX_CHANGES_PER_CHECK = 1000
+
+# Ids skipped by a check (writer not committed yet) are polled again for
+# this long, at most MAX_GAPS of them; rolled-back ids never turn up
+GAP_SECONDS = 60
+MAX_GAPS = 1000
+
+# A rebuild replays this many changes before its snapshot, for the same reason
+REBUILD_OVERLAP = 100
+
+# MySQL error for a missing table (search_changes not migrated yet)
+ER_NO_SUCH_TABLE = 1146
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(str(text).lower())) if text else ''
+
+
+def trigrams(text, padded=True):
+    """Character trigrams; padding adds word-start / word-end grams."""
+    if padded:
+        text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TermIndex:
+    """Trigram index of terms, each term posting to a set of doc ids."""
+
+    def __init__(self):
+        self._grams = defaultdict(set)      # trigram -> terms
+        self._postings = defaultdict(set)   # term -> doc ids
+        self._doc_terms = {}                # doc id -> terms
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, doc_id, *texts):
+        """(Re)index ``doc_id`` under the given texts."""
+        self.remove(doc_id)
+        terms = tuple({normalize(t) for t in texts if t} - {''})
+        if not terms:
+            return
+        self._doc_terms[doc_id] = terms
+        for term in terms:
+            if term not in self._postings:
+                for gram in trigrams(term):
+                    self._grams[gram].add(term)
+            self._postings[term].add(doc_id)
+
+    def remove(self, doc_id):
+        for term in self._doc_terms.pop(doc_id, ()):
+            docs = self._postings.get(term)
+            if docs is None:
+                continue
+            docs.discard(doc_id)
+            if not docs:
+                del self._postings[term]
+                for gram in trigrams(term):
+                    bucket = self._grams.get(gram)
+                    if bucket is not None:
+                        bucket.discard(term)
+                        if not bucket:
+                            del self._grams[gram]
+
+    def _match_terms(self, word):
+        """{term: score} for every term matching one query word."""
+        if len(word) < 3:
+            # Too short for a reliable trigram filter: scan the vocabulary
+            candidates = (t for t in self._postings if word in t)
+        else:
+            # Unpadded grams, so the word may sit anywhere inside a term
+            grams = [self._grams.get(g, ()) for g in trigrams(word, padded=False)]
+            grams.sort(key=len)
+            candidates = set(grams[0]).intersection(*grams[1:]) if grams else set()
+
+        matches = {}
+        for term in candidates:
+            if term == word:
+                matches[term] = SCORE_EXACT
+            elif f" {word} " in f" {term} ":
+                matches[term] = SCORE_WORD
+            elif term.startswith(word):
+                matches[term] = SCORE_PREFIX
+            elif f" {word}" in f" {term}":
+                matches[term] = SCORE_WORD_PREFIX
+            elif word in term:
+                matches[term] = SCORE_SUBSTRING
+
+        if not matches and len(word) >= 4:
+            # Nothing contains the word: fall back to trigram overlap
+            query_grams = trigrams(word)
+            overlap = defaultdict(int)
+            for gram in query_grams:
+                for term in self._grams.get(gram, ()):
+                    overlap[term] += 1
+            for term, hits in overlap.items():
+                share = hits / len(query_grams)
+                if share >= FUZZY_THRESHOLD:
+                    matches[term] = share
+        return matches
+
+    def search(self, query, limit=None, accept=None):
+        """
+        Doc ids matching every word of ``query`` (in any of their terms),
+        best first; ties go to the highest (newest) id. ``accept`` filters
+        doc ids before the limit is applied.
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+
+        scores = None
+        for word in words:
+            word_scores = {}
+            for term, score in self._match_terms(word).items():
+                for doc_id in self._postings.get(term, ()):
+                    if score > word_scores.get(doc_id, 0):
+                        word_scores[doc_id] = score
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {d: s + word_scores[d] for d, s in scores.items() if d in word_scores}
+            if not scores:
+                return []
+
+        if accept is not None:
+            scores = {d: s for d, s in scores.items() if accept(d)}
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        ids = [doc_id for doc_id, _score in ranked]
+        return ids[:limit] if limit else ids
+
+
+# ==========================================
+# INDEXED TABLES
+# ==========================================
+# kind -> SQL returning (id, text, text, ...); "{where}" takes an id filter
+SOURCES = {
+    'stock': """
+        SELECT s.stock_id, s.product_name, s.category_name, s.variant_size
+        FROM stock s
+        {where}
+    """,
+    'product': """
+        SELECT p.product_id, p.product_name, c.category_name, p.variant_size
+        FROM products p
+        LEFT JOIN category c ON p.category_id = c.category_id
+        {where}
+    """,
+    'distributor': """
+        SELECT distributor_id, distributor_name, district
+        FROM distributor
+        {where}
+    """,
+    # Customer names are a vocabulary per distributor: the id *is*
+    # (distributor_id, name), so one distributor's matches are never
+    # crowded out by another's
+    'customer': """
+        SELECT DISTINCT distributor_id, customer_name, customer_name
+        FROM sales
+        {where}
+    """,
+}
+
+# Id column(s) per kind; a tuple makes the doc id the tuple of those values
+ID_COLUMNS = {
+    'stock': 's.stock_id',
+    'product': 'p.product_id',
+    'distributor': 'distributor_id',
+    'customer': ('distributor_id', 'customer_name'),
+}
+
+
+# change kind -> (index kind, row filter, whether doc_id is that index's id)
+CHANGE_KINDS = {
+    'stock': ('stock', "s.stock_id = %s", True),
+    'product': ('product', "p.product_id = %s", True),
+    'distributor': ('distributor', "distributor_id = %s", True),
+    'sale': ('customer', "sale_id = %s", False),
+    'stock_product': ('stock', "s.product_id = %s", False),
+    'stock_category': ('stock', "s.category_id = %s", False),
+    'category': ('product', "p.category_id = %s", False),
+}
+
+
+def record_search_changes(cur, kind, doc_ids):
+    """Queue a re-read of the rows ``kind`` selects for each of ``doc_ids`` (see CHANGE_KINDS); call before commit."""
+    doc_ids = sorted(set(doc_ids))
+    if doc_ids:
+        cur.executemany("INSERT INTO search_changes (kind, doc_id) VALUES (%s, %s)",
+                        [(kind, doc_id) for doc_id in doc_ids])
+
+
+def record_search_change(cur, kind, doc_id):
+    """Queue a re-read of the rows ``kind`` / ``doc_id`` select (see CHANGE_KINDS); call before commit."""
+    record_search_changes(cur, kind, [doc_id])
+
+
+def _split_row(kind, row):
+    """(doc id, texts) for one row of SOURCES[kind]."""
+    width = len(ID_COLUMNS[kind]) if isinstance(ID_COLUMNS[kind], tuple) else 1
+    doc_id = tuple(row[:width]) if width > 1 else row[0]
+    return doc_id, row[width:]
+
+
+class SearchService:
+    """Owns one TermIndex per kind; shared by every request in the process."""
+
+    def __init__(self, app=None, mysql=None):
+        self.mysql = mysql
+        self.indexes = {kind: TermIndex() for kind in SOURCES}
+        self.built_at = None
+        self.max_age = 0
+        self.check_interval = 2.0
+        self._last_change = None  # newest search_changes row applied
+        self._gaps = {}           # change_id skipped over -> when first missed
+        self._checked_at = 0.0
+        self._pruned_at = time.monotonic()
+        self._change_log = True
+        self._lock = threading.RLock()
+        self._rebuilding = False
+        self._touched = set()  # (kind, id) changed while a rebuild is running
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.mysql = mysql
+        self.max_age = float(app.config.get('SEARCH_INDEX_MAX_AGE', 300))
+        self.check_interval = float(app.config.get('SEARCH_INDEX_CHECK_SECONDS', 2))
+        app.extensions['search_index'] = self
+        if app.config.get('SEARCH_INDEX_BUILD_ON_STARTUP', True):
+            self._rebuild_in_background()
+
+    # ── Building ────────────────────────────────────────────────────────────
+    def _load(self, conn, kind, doc_id=None):
+        where, params = '', ()
+        if doc_id is not None:
+            columns = ID_COLUMNS[kind]
+            if isinstance(columns, tuple):
+                where = 'WHERE ' + ' AND '.join(f"{column} = %s" for column in columns)
+                params = tuple(doc_id)
+            else:
+                where, params = f"WHERE {columns} = %s", (doc_id,)
+        elif kind == 'customer':
+            where = "WHERE customer_name IS NOT NULL AND customer_name <> ''"
+        return self._query(conn, kind, where, params, streaming=doc_id is None)
+
+    def _query(self, conn, kind, where, params, streaming=False):
+        cur = conn.cursor(MySQLdb.cursors.SSCursor) if streaming else conn.cursor()
+        try:
+            cur.execute(SOURCES[kind].format(where=where), params)
+            while True:
+                rows = cur.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cur.close()
+
+    def rebuild(self, conn=None):
+        """Build every index from scratch and swap them in."""
+        started = time.time()
+        fresh = {kind: TermIndex() for kind in SOURCES}
+        with self._lock:
+            self._touched.clear()
+        if conn is None:
+            with self.mysql.pool.connection() as pooled:
+                version = self._change_version(pooled)
+                self._fill(pooled, fresh)
+                self._swap(pooled, fresh, version)
+        else:
+            version = self._change_version(conn)
+            self._fill(conn, fresh)
+            self._swap(conn, fresh, version)
+        print(f"Search index built in {time.time() - started:.1f}s: "
+              + ', '.join(f"{kind}={len(index)}" for kind, index in fresh.items()))
+
+    def _change_version(self, conn):
+        """Newest change before a build reads its snapshot (None without the table)."""
+        if not self._change_log:
+            return None
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT COALESCE(MAX(change_id), 0) FROM search_changes")
+            return cur.fetchone()[0]
+        except MySQLdb.Error as e:
+            self._change_log_failed(e)
+            return None
+        finally:
+            cur.close()
+
+    def _change_log_failed(self, e):
+        if e.args and e.args[0] == ER_NO_SUCH_TABLE:
+            # Not migrated yet: fall back to rebuilding every max_age seconds
+            print(f"Search index change log disabled: {e}")
+            self._change_log = False
+        else:
+            print(f"Search index change check failed (retrying): {e}")
+
+    def _swap(self, conn, fresh, version=None):
+        # Rows written while the snapshot was being read are re-read so the
+        # new indexes do not lose those updates.
+        with self._lock:
+            for kind, doc_id in self._touched:
+                rows = list(self._load(conn, kind, doc_id))
+                if rows:
+                    row_id, texts = _split_row(kind, rows[0])
+                    fresh[kind].add(row_id, *texts)
+                else:
+                    fresh[kind].remove(doc_id)
+            self._touched.clear()
+            self.indexes = fresh
+            self.built_at = time.time()
+            self._last_change = max(0, version - REBUILD_OVERLAP) if version is not None else None
+            self._gaps = {}
+            self._checked_at = time.monotonic()
+
+    def _fill(self, conn, indexes):
+        for kind, index in indexes.items():
+            for row in self._load(conn, kind):
+                doc_id, texts = _split_row(kind, row)
+                index.add(doc_id, *texts)
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Search index rebuild failed: {e}")
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+
+        threading.Thread(target=run, name='search-index-rebuild', daemon=True).start()
+
+    def schedule_rebuild(self):
+        """Rebuild in the background (after bulk changes made outside the app)."""
+        self._rebuild_in_background()
+
+    def _ensure_built(self):
+        if self.built_at is None:
+            # First search before the startup build finished (or it failed)
+            with self._lock:
+                if self.built_at is None and not self._rebuilding:
+                    self.rebuild(self.mysql.connection)
+                    return
+            while self.built_at is None and self._rebuilding:
+                time.sleep(0.05)
+        elif self._change_log and self._last_change is not None:
+            self._catch_up(self.mysql.connection)
+        elif self.max_age and time.time() - self.built_at > self.max_age:
+            self._rebuild_in_background()
+
+    def _catch_up(self, conn):
+        """Re-read the rows behind changes committed by any process since the last check."""
+        now = time.monotonic()
+        with self._lock:
+            if self._rebuilding or now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            since = self._last_change
+            gaps = sorted(self._gaps)
+
+        cur = conn.cursor()
+        try:
+            gap_filter = f" OR change_id IN ({', '.join(['%s'] * len(gaps))})" if gaps else ''
+            cur.execute(f"""
+                SELECT change_id, kind, doc_id
+                FROM search_changes
+                WHERE change_id > %s{gap_filter}
+                ORDER BY change_id
+                LIMIT %s
+            """, [since] + gaps + [MAX_CHANGES_PER_CHECK])
+            changes = cur.fetchall()
+        except MySQLdb.Error as e:
+            self._change_log_failed(e)
+            return
+        finally:
+            cur.close()
+
+        if len(changes) >= MAX_CHANGES_PER_CHECK:
+            self._rebuild_in_background()
+            return
+        self._prune(since)
+        if not changes:
+            self._expire_gaps(since, now)
+            return
+
+        reread = {}
+        for _change_id, kind, doc_id in changes:
+            if kind in CHANGE_KINDS:
+                reread[(kind, doc_id)] = None
+        try:
+            loaded = [(kind, doc_id, list(self._query(
+                          conn, CHANGE_KINDS[kind][0], f"WHERE {CHANGE_KINDS[kind][1]}", (doc_id,))))
+                      for kind, doc_id in reread]
+        except Exception as e:
+            print(f"Search index catch-up failed (retrying): {e}")
+            return
+
+        with self._lock:
+            if self._last_change != since:
+                # A rebuild swapped in meanwhile and already covers these
+                return
+            # Every change is a plain re-read of current rows, so one seen
+            # twice (a filled gap, a rebuild's overlap) is simply reapplied
+            for kind, doc_id, rows in loaded:
+                index_kind, _where, by_id = CHANGE_KINDS[kind]
+                index = self.indexes[index_kind]
+                if rows:
+                    for row in rows:
+                        row_id, texts = _split_row(index_kind, row)
+                        index.add(row_id, *texts)
+                elif by_id:
+                    index.remove(doc_id)
+
+            seen = {change_id for change_id, _kind, _doc_id in changes}
+            newest = max(since, changes[-1][0])
+            for change_id in seen:
+                self._gaps.pop(change_id, None)
+            # Ids passed over are uncommitted (or rolled back): poll them again
+            for change_id in range(max(since, newest - MAX_GAPS) + 1, newest):
+                if change_id not in seen:
+                    self._gaps.setdefault(change_id, now)
+            self._last_change = newest
+            self._expire_gaps(newest, now)
+
+    def _expire_gaps(self, since, now):
+        with self._lock:
+            for change_id, missed_at in list(self._gaps.items()):
+                if now - missed_at > GAP_SECONDS:
+                    del self._gaps[change_id]
+            if len(self._gaps) > MAX_GAPS:
+                for change_id in sorted(self._gaps)[:len(self._gaps) - MAX_GAPS]:
+                    del self._gaps[change_id]
+
+    def _prune(self, applied):
+        """Delete changes far behind the newest applied one, at most every PRUNE_SECONDS."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at < PRUNE_SECONDS:
+                return
+            self._pruned_at = now
+        if applied <= CHANGE_LOG_KEEP:
+            return
+        # Own short transaction, away from the writers' inserts at the top
+        try:
+            with self.mysql.pool.connection() as conn:
+                cur = conn.cursor()
+                try:
+                    cur.execute("""
+                        DELETE FROM search_changes
+                        WHERE change_id <= %s
+                        ORDER BY change_id
+                        LIMIT %s
+                    """, (applied - CHANGE_LOG_KEEP, PRUNE_BATCH))
+                    conn.commit()
+                finally:
+                    cur.close()
+        except MySQLdb.Error as e:
+            print(f"Search change log prune failed: {e}")
+
+    # ── Incremental updates (call after commit) ─────────────────────────────
+    def refresh(self, kind, doc_id):
+        """Re-read one row and reindex it (removes it if the row is gone)."""
+        if doc_id is None:
+            return
+        try:
+            rows = list(self._load(self.mysql.connection, kind, doc_id))
+        except Exception as e:
+            print(f"Search index refresh failed for {kind} {doc_id}: {e}")
+            return
+        with self._lock:
+            if self._rebuilding:
+                self._touched.add((kind, doc_id))
+            index = self.indexes[kind]
+            if rows:
+                row_id, texts = _split_row(kind, rows[0])
+                index.add(row_id, *texts)
+            else:
+                index.remove(doc_id)
+
+    def refresh_many(self, kind, doc_ids):
+        for doc_id in doc_ids:
+            self.refresh(kind, doc_id)
+
+    def remove(self, kind, doc_id):
+        with self._lock:
+            if self._rebuilding:
+                self._touched.add((kind, doc_id))
+            self.indexes[kind].remove(doc_id)
+
+    def add_customer(self, distributor_id, name):
+        if name:
+            doc_id = (distributor_id, name)
+            with self._lock:
+                if self._rebuilding:
+                    self._touched.add(('customer', doc_id))
+                self.indexes['customer'].add(doc_id, name)
+
+    # ── Queries ─────────────────────────────────────────────────────────────
+    def search(self, kind, query, limit=None):
+        """Ranked ids of ``kind`` matching ``query``."""
+        self._ensure_built()
+        with self._lock:
+            return self.indexes[kind].search(query, limit)
+
+    def search_customers(self, distributor_id, query, limit=None):
+        """Ranked customer names of one distributor matching ``query``."""
+        self._ensure_built()
+        with self._lock:
+            docs = self.indexes['customer'].search(
+                query, limit, accept=lambda doc: doc[0] == distributor_id)
+        return [name for _distributor_id, name in docs]
@@ -0,0 +1,235 @@
+"""
+Bulk stock import
+Parses a delivery sheet (CSV, or XLSX when openpyxl is installed), resolves
+every product in one batched lookup, validates each line and inserts the
+good ones with executemany in chunked transactions. Lines that fail are
+returned with their line number and reason instead of aborting the file.
+
+Recognised columns (header names are case-insensitive):
+    product_id or product_name   which product (one of them is required)
+    quantity                     required, whole number > 0
+    unit_price                   defaults to the product's price
+    variant_size                 defaults to the product's variant
+    shelf_life_days              defaults to the product's shelf life
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+try:
+    import openpyxl
+except ImportError:  # XLSX import is optional
+    openpyxl = None
+
+from modules.common.search_index import record_search_change
+from modules.common.stock_summary import refresh_stock_summary
+
+MAX_ROWS = 50000
+INSERT_CHUNK = 1000
+LOOKUP_CHUNK = 1000
+
+_HEADER_ALIASES = {
+    'product': 'product_name',
+    'name': 'product_name',
+    'qty': 'quantity',
+    'price': 'unit_price',
+    'variant': 'variant_size',
+    'size': 'variant_size',
+    'shelf_life': 'shelf_life_days',
+}
+
+_INSERT = """
+    INSERT INTO stock (
+        product_id, product_name, category_id, category_name,
+        unit_price, variant_size, shelf_life_days, quantity
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+class ImportFileError(ValueError):
+    """The upload as a whole could not be read."""
+
+
+def _header(name):
+    key = str(name or '').strip().lower().replace(' ', '_').replace('-', '_')
+    return _HEADER_ALIASES.get(key, key)
+
+
+def _clean(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_rows(filename, stream):
+    """Yield (line_no, {column: text}) from an uploaded CSV / XLSX file."""
+    name = (filename or '').lower()
+    if name.endswith('.xlsx'):
+        if openpyxl is None:
+            raise ImportFileError("XLSX import needs the openpyxl package; upload a CSV instead.")
+        try:
+            workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFileError(f"Could not read the XLSX file: {e}")
+        rows = workbook.active.iter_rows(values_only=True)
+    elif name.endswith('.csv') or name.endswith('.txt'):
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        rows = csv.reader(text)
+    else:
+        raise ImportFileError("Upload a .csv or .xlsx file.")
+
+    headers = None
+    for line_no, values in enumerate(rows, start=1):
+        values = [_clean(v) for v in values]
+        if not any(values):
+            continue
+        if headers is None:
+            headers = [_header(v) for v in values]
+            if 'quantity' not in headers or not ({'product_id', 'product_name'} & set(headers)):
+                raise ImportFileError("The header row needs quantity and product_id or product_name columns.")
+            continue
+        if line_no > MAX_ROWS + 1:
+            raise ImportFileError(f"Files are limited to {MAX_ROWS} lines; split the delivery.")
+        yield line_no, dict(zip(headers, values))
+
+    if headers is None:
+        raise ImportFileError("The file is empty.")
+
+
+def _chunks(values, size):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def resolve_products(cur, product_ids, product_names):
+    """
+    Product rows (with their category and defaults) for every referenced
+    id / name, in a handful of IN (...) queries. Returns (by_id, by_name);
+    names are matched case-insensitively.
+    """
+    select = """
+        SELECT p.product_id, p.product_name, p.unit_price, p.variant_size,
+               p.shelf_life_days, c.category_id, c.category_name
+        FROM products p
+        JOIN category c ON p.category_id = c.category_id
+        WHERE {column} IN ({placeholders})
+    """
+    by_id, by_name = {}, {}
+    for column, values in (('p.product_id', product_ids), ('p.product_name', product_names)):
+        for chunk in _chunks(values, LOOKUP_CHUNK):
+            cur.execute(select.format(column=column, placeholders=', '.join(['%s'] * len(chunk))), chunk)
+            for row in cur.fetchall():
+                by_id[row['product_id']] = row
+                by_name.setdefault(row['product_name'].lower(), row)
+    return by_id, by_name
+
+
+def validate_rows(rows, by_id, by_name):
+    """
+    Split parsed lines into (line_no, insert tuple) pairs and
+    {'line', 'error', 'values'} reports.
+    """
+    valid, errors = [], []
+    for line_no, row in rows:
+        def fail(message):
+            errors.append({'line': line_no, 'error': message, 'values': row})
+
+        product = None
+        if row.get('product_id'):
+            try:
+                product = by_id.get(int(row['product_id']))
+            except ValueError:
+                fail(f"product_id '{row['product_id']}' is not a number")
+                continue
+        elif row.get('product_name'):
+            product = by_name.get(row['product_name'].lower())
+        else:
+            fail("product_id or product_name is required")
+            continue
+        if product is None:
+            fail(f"Unknown product '{row.get('product_id') or row.get('product_name') or ''}'")
+            continue
+
+        try:
+            quantity = int(row.get('quantity', ''))
+        except ValueError:
+            fail(f"quantity '{row.get('quantity', '')}' is not a whole number")
+            continue
+        if quantity <= 0:
+            fail("quantity must be greater than 0")
+            continue
+
+        try:
+            unit_price = Decimal(row['unit_price']) if row.get('unit_price') else product['unit_price'] or Decimal(0)
+        except InvalidOperation:
+            fail(f"unit_price '{row['unit_price']}' is not a number")
+            continue
+        if unit_price < 0:
+            fail("unit_price cannot be negative")
+            continue
+
+        try:
+            shelf_life = int(row['shelf_life_days']) if row.get('shelf_life_days') else product['shelf_life_days'] or 0
+        except ValueError:
+            fail(f"shelf_life_days '{row['shelf_life_days']}' is not a whole number")
+            continue
+
+        variant_size = row.get('variant_size') or product['variant_size'] or 'Standard'
+        if len(variant_size) > 50:
+            fail("variant_size is longer than 50 characters")
+            continue
+
+        valid.append((line_no, (product['product_id'], product['product_name'], product['category_id'],
+                                product['category_name'], unit_price, variant_size, shelf_life, quantity)))
+    return valid, errors
+
+
+def insert_stock_rows(conn, cur, rows, chunk_size=INSERT_CHUNK):
+    """
+    executemany() the validated rows, one transaction per chunk, keeping
+    stock_summary in step. A chunk the database rejects is rolled back and
+    its lines reported. Returns (inserted, errors).
+    """
+    inserted, errors = 0, []
+    for chunk in _chunks(rows, chunk_size):
+        values = [row for _line, row in chunk]
+        try:
+            cur.executemany(_INSERT, values)
+            for product_id, variant_size in {(row[0], row[5]) for row in values}:
+                refresh_stock_summary(cur, product_id, variant_size)
+            for product_id in {row[0] for row in values}:
+                record_search_change(cur, 'stock_product', product_id)
+            conn.commit()
+            inserted += len(chunk)
+        except Exception as e:
+            conn.rollback()
+            print(f"Stock import chunk failed: {e}")
+            errors.extend({'line': line_no, 'error': f"Not saved: {e}", 'values': {}}
+                          for line_no, _row in chunk)
+    return inserted, errors
+
+
+def import_stock_file(conn, cur, filename, stream, dry_run=False):
+    """
+    Parse, resolve, validate and (unless dry_run) insert one upload.
+    Returns a report dict: total, inserted, errors.
+    """
+    rows = list(read_rows(filename, stream))
+    product_ids, product_names = set(), set()
+    for _line, row in rows:
+        if row.get('product_id', '').isdigit():
+            product_ids.add(int(row['product_id']))
+        elif row.get('product_name'):
+            product_names.add(row['product_name'])
+
+    by_id, by_name = resolve_products(cur, product_ids, product_names)
+    valid, errors = validate_rows(rows, by_id, by_name)
+    inserted = 0
+    if not dry_run:
+        inserted, failed = insert_stock_rows(conn, cur, valid)
+        errors.extend(failed)
+    return {'total': len(rows), 'valid': len(valid), 'inserted': inserted,
+            'errors': errors, 'dry_run': dry_run}
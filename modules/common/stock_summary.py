@@ -0,0 +1,136 @@
+"""
+Stock summary maintenance
+stock_summary holds SUM(quantity) / SUM(quantity * price) per
+(product_id, variant_size) for stock rows with quantity > 0. Every write
+to `stock` calls refresh_stock_summary() with the keys it touched, on the
+same cursor and before the commit, so the summary changes atomically with
+the stock rows. ``flask stock-summary rebuild`` recomputes it from scratch
+if it ever drifts (e.g. after manual SQL against `stock`).
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+_AGGREGATE = """
+    SELECT s.product_id,
+           COALESCE(s.variant_size, '') as variant_size,
+           COALESCE(MAX(s.product_name), MAX(p.product_name), 'Unknown Product') as product_name,
+           COALESCE(MAX(s.category_id), MAX(p.category_id)) as category_id,
+           COALESCE(MAX(s.category_name), MAX(c.category_name), 'Uncategorized') as category_name,
+           SUM(s.quantity) as total_quantity,
+           SUM(s.quantity * COALESCE(s.unit_price, p.unit_price, 0)) as total_value,
+           COUNT(*) as stock_rows
+    FROM stock s
+    LEFT JOIN products p ON s.product_id = p.product_id
+    LEFT JOIN category c ON p.category_id = c.category_id
+    WHERE s.quantity > 0 {where}
+    GROUP BY s.product_id, COALESCE(s.variant_size, '')
+"""
+
+_INSERT = """
+    INSERT INTO stock_summary (product_id, variant_size, product_name, category_id, category_name,
+                               total_quantity, total_value, stock_rows)
+"""
+
+
+def refresh_stock_summary(cur, product_id, variant_size):
+    """
+    Recompute one (product, variant) summary row from `stock`. Call inside
+    the transaction that changed those stock rows, before commit.
+    """
+    if product_id is None:
+        return
+    variant_size = variant_size or ''
+    cur.execute("""
+        DELETE FROM stock_summary
+        WHERE product_id = %s AND variant_size = %s
+    """, (product_id, variant_size))
+    cur.execute(_INSERT + _AGGREGATE.format(
+        where="AND s.product_id = %s AND s.variant_size = %s"
+    ), (product_id, variant_size))
+
+
+def stock_key(cur, stock_id):
+    """(product_id, variant_size) of a stock row, or None if it is gone."""
+    cur.execute("SELECT product_id, variant_size FROM stock WHERE stock_id = %s", (stock_id,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    if isinstance(row, dict):
+        return row['product_id'], row['variant_size']
+    return row[0], row[1]
+
+
+def rebuild_stock_summary(conn):
+    """Replace the whole summary in one transaction; returns the row count."""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM stock_summary")
+        cur.execute(_INSERT + _AGGREGATE.format(where=''))
+        count = cur.rowcount
+        conn.commit()
+        return count
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def summary_drift(conn):
+    """Keys whose stored totals differ from a fresh aggregate of `stock`."""
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT COALESCE(fresh.product_id, ss.product_id),
+                   COALESCE(fresh.variant_size, ss.variant_size),
+                   ss.total_quantity, fresh.total_quantity,
+                   ss.total_value, fresh.total_value
+            FROM ({_AGGREGATE.format(where='')}) fresh
+            LEFT JOIN stock_summary ss
+                ON ss.product_id = fresh.product_id AND ss.variant_size = fresh.variant_size
+            WHERE ss.product_id IS NULL
+               OR ss.total_quantity <> fresh.total_quantity
+               OR ss.total_value <> fresh.total_value
+            UNION ALL
+            SELECT ss.product_id, ss.variant_size, ss.total_quantity, NULL, ss.total_value, NULL
+            FROM stock_summary ss
+            WHERE NOT EXISTS (
+                SELECT 1 FROM stock s
+                WHERE s.product_id = ss.product_id
+                  AND COALESCE(s.variant_size, '') = ss.variant_size
+                  AND s.quantity > 0
+            )
+        """)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+# ==========================================
+# CLI: flask stock-summary ...
+# ==========================================
+stock_summary_cli = AppGroup('stock-summary', help='Maintain the stock_summary aggregate table.')
+
+
+def _connection():
+    return current_app.extensions['mysql_pool'].connection
+
+
+@stock_summary_cli.command('rebuild')
+def rebuild_command():
+    """Recompute stock_summary from the stock table."""
+    count = rebuild_stock_summary(_connection())
+    click.echo(f"stock_summary rebuilt: {count} product/variant rows.")
+
+
+@stock_summary_cli.command('check')
+def check_command():
+    """Report keys where stock_summary has drifted from stock."""
+    drift = summary_drift(_connection())
+    for product_id, variant, qty, fresh_qty, value, fresh_value in drift:
+        click.echo(f"  product {product_id} [{variant or '-'}]: quantity {qty} vs {fresh_qty}, "
+                   f"value {value} vs {fresh_value}")
+    click.echo(f"{len(drift)} drifted row(s)." if drift else "stock_summary matches stock.")
+    if drift:
+        raise SystemExit(1)
@@ -1,10 +1,19 @@
 # File: order_routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+import time
+
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, session, jsonify
 import MySQLdb
+from modules.common.catalog_cache import document_response
+from modules.common.http_cache import conditional
+from modules.common.notifications import unread_topic, publish_unread
+from modules.common.message_counters import unread_counts, mark_read, record_question
+from modules.common.pagination import SortOption, PageRequest, fetch_page, cached_rows
 
 # These will be injected from app.py
 bcrypt = None
 mysql = None
+catalog = None
+pubsub = None
 
 # Create Blueprint for distributor order management
 distributor_order_bp = Blueprint(
@@ -15,6 +24,61 @@ distributor_order_bp = Blueprint(
     static_url_path='/distributor_static'
 )
 
+# Order headers only; lines are loaded per order (order_lines) when a row is expanded
+ORDER_SELECT = """
+    SELECT 
+        o.order_id,
+        o.order_date,
+        o.status,
+        o.total_amount,
+        muc.unread as unread_messages
+    FROM orders o
+    LEFT JOIN message_unread_counters muc
+        ON muc.distributor_id = o.distributor_id AND muc.order_id = o.order_id
+"""
+
+# Keyset on (order_date, order_id) within one distributor: idx_orders_distributor_date
+ORDER_SORTS = {
+    'date': SortOption('o.order_date', 'order_date', 'Order Date'),
+}
+
+ORDER_STATUSES = ('pending', 'accepted', 'rejected', 'cancelled')
+
+def _order_stats(cur, distributor_id):
+    """Order counts / amounts per status for the stat cards (cached briefly)"""
+    stats = {'total': 0, 'amount': 0}
+    stats.update(dict.fromkeys(ORDER_STATUSES, 0))
+    rows = cached_rows(cur, 'orders', """
+        SELECT status, COUNT(*) as orders, COALESCE(SUM(total_amount), 0) as amount
+        FROM orders
+        WHERE distributor_id = %s
+        GROUP BY status
+    """, (distributor_id,))
+    for row in rows:
+        stats[row['status']] = int(row['orders'])
+        stats['total'] += int(row['orders'])
+        stats['amount'] += row['amount']
+    return stats
+
+def _line_totals(cur, orders):
+    """Add item_count / total_quantity to one page of orders, one grouped query"""
+    for order in orders:
+        order['item_count'] = 0
+        order['total_quantity'] = 0
+    if not orders:
+        return
+    by_id = {order['order_id']: order for order in orders}
+    placeholders = ', '.join(['%s'] * len(by_id))
+    cur.execute(f"""
+        SELECT order_id, COUNT(*) as item_count, COALESCE(SUM(quantity), 0) as total_quantity
+        FROM order_items
+        WHERE order_id IN ({placeholders})
+        GROUP BY order_id
+    """, list(by_id))
+    for row in cur.fetchall():
+        by_id[row['order_id']]['item_count'] = int(row['item_count'])
+        by_id[row['order_id']]['total_quantity'] = int(row['total_quantity'])
+
 @distributor_order_bp.route('/manage_orders')
 def manage_orders():
     distributor_id = session.get('distributor_id')
@@ -22,34 +86,73 @@ def manage_orders():
         flash("Please log in first", "error")
         return redirect(url_for('distributor_bp.login'))
 
+    status = request.args.get('status', 'all')
+    if status not in ORDER_STATUSES:
+        status = 'all'
+    page_request = PageRequest.from_args(request.args, ORDER_SORTS, 'date')
+
+    where, params = ["o.distributor_id = %s"], [distributor_id]
+    if status != 'all':
+        where.append("o.status = %s")
+        params.append(status)
+
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    
-    # Fetch orders with aggregated quantity information
-    cur.execute("""
-        SELECT 
-            o.order_id,
-            o.order_date,
-            o.status,
-            o.total_amount,
-            COUNT(oi.order_item_id) as item_count,
-            COALESCE(SUM(oi.quantity), 0) as total_quantity,
-            GROUP_CONCAT(
-                CONCAT(oi.product_name, ' (Qty: ', oi.quantity, ')')
-                SEPARATOR ', '
-            ) as products_with_qty,
-            GROUP_CONCAT(oi.product_name SEPARATOR ', ') as products,
-            GROUP_CONCAT(oi.quantity SEPARATOR ', ') as quantities
-        FROM orders o
-        LEFT JOIN order_items oi ON o.order_id = oi.order_id
-        WHERE o.distributor_id = %s
-        GROUP BY o.order_id
-        ORDER BY o.order_date DESC
-    """, (distributor_id,))
-    
-    orders = cur.fetchall()
-    cur.close()
+    try:
+        stats = _order_stats(cur, distributor_id)
+        page = fetch_page(cur, ORDER_SELECT, page_request,
+                          id_column='o.order_id', id_key='order_id',
+                          where=where, params=params,
+                          total=stats['total'] if status == 'all' else stats[status],
+                          extra_args={'status': status} if status != 'all' else None)
+        _line_totals(cur, page.items)
+    except Exception as e:
+        print(f"Error loading orders: {str(e)}")
+        flash("Error loading orders", "error")
+        stats, page = None, None
+    finally:
+        cur.close()
 
-    return render_template('manage_orders.html', orders=orders)
+    return render_template('manage_orders.html',
+                           orders=page.items if page else [],
+                           page=page,
+                           sorts=ORDER_SORTS,
+                           stats=stats,
+                           filtered_status=status)
+
+# Lines of one order, fetched when its row is expanded in manage_orders
+@distributor_order_bp.route('/order_lines/<int:order_id>')
+def order_lines(order_id):
+    distributor_id = session.get('distributor_id')
+    if not distributor_id:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        if not _own_order(cur, order_id, distributor_id):
+            return jsonify({'error': 'Order not found'}), 404
+        cur.execute("""
+            SELECT order_item_id, product_id, product_name, category_name, variant_size,
+                   quantity, unit_price, subtotal, status
+            FROM order_items
+            WHERE order_id = %s
+            ORDER BY order_item_id
+        """, (order_id,))
+        lines = [{
+            'order_item_id': line['order_item_id'],
+            'product_id': line['product_id'],
+            'product_name': line['product_name'] or 'Product',
+            'category_name': line['category_name'] or '',
+            'variant_size': line['variant_size'] or '',
+            'quantity': line['quantity'],
+            'unit_price': float(line['unit_price'] or 0),
+            'subtotal': float(line['subtotal'] or 0),
+            'status': line['status'],
+        } for line in cur.fetchall()]
+        return jsonify({'order_id': order_id, 'lines': lines})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cur.close()
 
 # NEW: Get unread message count
 @distributor_order_bp.route('/unread_count')
@@ -61,18 +164,8 @@ def unread_count():
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     
     try:
-        # Count unread admin messages for this distributor
-        cur.execute("""
-            SELECT COUNT(*) as count
-            FROM messages m
-            JOIN orders o ON m.order_id = o.order_id
-            WHERE o.distributor_id = %s 
-            AND m.admin_id IS NOT NULL 
-            AND m.is_read = 0
-        """, (distributor_id,))
-        
-        result = cur.fetchone()
-        count = result['count'] if result else 0
+        # Unread admin messages: one counter row per distributor
+        count = unread_counts(cur, [distributor_id])[int(distributor_id)]
         
         return jsonify({'count': count})
         
@@ -81,57 +174,247 @@ def unread_count():
     finally:
         cur.close()
 
-# NEW: Get messages for an order
-@distributor_order_bp.route('/get_messages/<int:order_id>')
-def get_messages(order_id):
+def _recheck_unread(distributor_id):
+    """Unread count on a short-lived pool connection (the stream holds none)"""
+    with mysql.pool.connection() as conn:
+        cur = conn.cursor()
+        try:
+            count = unread_counts(cur, [distributor_id])[int(distributor_id)]
+            conn.commit()
+            return count
+        finally:
+            cur.close()
+
+# Server-Sent Events: unread count pushed as it changes
+@distributor_order_bp.route('/unread_stream')
+def unread_stream():
     distributor_id = session.get('distributor_id')
     if not distributor_id:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    
-    # Verify order belongs to distributor
-    cur.execute("""
-        SELECT order_id FROM orders 
-        WHERE order_id = %s AND distributor_id = %s
-    """, (order_id, distributor_id))
+    config = current_app.config
+    if pubsub.subscriber_count() >= config.get('UNREAD_SSE_MAX_STREAMS', 200):
+        # The page falls back to polling /unread_count
+        return jsonify({'error': 'Too many open streams'}), 503
+    keepalive = config.get('UNREAD_SSE_KEEPALIVE', 15)
+    recheck = config.get('UNREAD_SSE_RECHECK', 120)
+    lifetime = config.get('UNREAD_SSE_LIFETIME', 600)
     
-    if not cur.fetchone():
+    # Subscribe before reading, so a change in between is not missed
+    subscription = pubsub.subscribe(unread_topic(distributor_id))
+    cur = mysql.connection.cursor()
+    try:
+        count = unread_counts(cur, [distributor_id])[int(distributor_id)]
+    except Exception:
+        subscription.close()
+        raise
+    finally:
         cur.close()
-        return jsonify({'error': 'Order not found'}), 404
     
-    # Get all messages for this order
-    cur.execute("""
+    def generate():
+        # Runs after the request's pooled connection went back to the pool;
+        # waiting for a publish holds no database connection
+        last = count
+        started = rechecked = time.monotonic()
+        try:
+            yield f"retry: 5000\nevent: unread\ndata: {count}\n\n"
+            # Streams end after UNREAD_SSE_LIFETIME; the browser reconnects
+            while time.monotonic() - started < lifetime:
+                value = subscription.get(keepalive)
+                if value is None and time.monotonic() - rechecked >= recheck:
+                    # Picks up changes published in other worker processes
+                    value = _recheck_unread(distributor_id)
+                    rechecked = time.monotonic()
+                if value is None or value == last:
+                    yield ": keepalive\n\n"
+                    continue
+                last = value
+                yield f"event: unread\ndata: {value}\n\n"
+        finally:
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _messages_version(order_id):
+    """ETag validator for get_messages: new messages and read flags change it"""
+    distributor_id = session.get('distributor_id')
+    if not distributor_id:
+        return None
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT COUNT(m.message_id), MAX(m.message_id), SUM(m.is_read)
+            FROM orders o
+            LEFT JOIN messages m ON m.order_id = o.order_id
+            WHERE o.order_id = %s AND o.distributor_id = %s
+            GROUP BY o.order_id
+        """, (order_id, distributor_id))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    # Not this distributor's order: let the view answer 404
+    return f"{distributor_id}:{row[0]}:{row[1]}:{row[2]}" if row else None
+
+# Messages per get_messages / sync_messages page
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_PAGE_MAX = 200
+
+def _message_cursor(source, name):
+    """Positive message id from request args / JSON, else None"""
+    try:
+        value = int(source.get(name) or 0)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+def _page_limit(source):
+    try:
+        limit = int(source.get('limit') or MESSAGE_PAGE_SIZE)
+    except (TypeError, ValueError):
+        limit = MESSAGE_PAGE_SIZE
+    return max(1, min(limit, MESSAGE_PAGE_MAX))
+
+def _message_page(cur, order_id, since_id=None, before_id=None, limit=MESSAGE_PAGE_SIZE):
+    """
+    One page of an order's messages, oldest first, walked on
+    (order_id, message_id): newer than since_id, older than before_id, or
+    the latest ones. Returns (messages, has_more); has_more means newer
+    messages remain after a since_id page, older ones otherwise.
+    """
+    if since_id is not None:
+        cursor, direction = "AND message_id > %s", "ASC"
+        params = [order_id, since_id, limit + 1]
+    elif before_id is not None:
+        cursor, direction = "AND message_id < %s", "DESC"
+        params = [order_id, before_id, limit + 1]
+    else:
+        cursor, direction = "", "DESC"
+        params = [order_id, limit + 1]
+    cur.execute(f"""
         SELECT 
             message_id,
-            order_id,
-            distributor_id,
-            admin_id,
             message,
             message_type,
-            created_at,
+            DATE_FORMAT(created_at, '%%Y-%%m-%%d %%H:%%i:%%s') as created_at,
+            admin_id IS NOT NULL as is_from_admin,
             is_read
         FROM messages
-        WHERE order_id = %s
-        ORDER BY created_at ASC
-    """, (order_id,))
+        WHERE order_id = %s {cursor}
+        ORDER BY message_id {direction}
+        LIMIT %s
+    """, params)
+    
+    messages = list(cur.fetchall())
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if direction == "DESC":
+        messages.reverse()
+    for msg in messages:
+        msg['created_at'] = msg['created_at'] or ''
+        msg['is_from_admin'] = bool(msg['is_from_admin'])
+    return messages, has_more
+
+def _own_order(cur, order_id, distributor_id):
+    cur.execute("""
+        SELECT order_id FROM orders 
+        WHERE order_id = %s AND distributor_id = %s
+    """, (order_id, distributor_id))
+    return cur.fetchone() is not None
+
+def _page_response(messages, has_more, **extra):
+    return jsonify({
+        'messages': messages,
+        'has_more': has_more,
+        'first_message_id': messages[0]['message_id'] if messages else None,
+        'last_message_id': messages[-1]['message_id'] if messages else None,
+        **extra
+    })
+
+# NEW: Get messages for an order
+# ?since_message_id= / ?before_message_id= / ?limit= page through the conversation
+@distributor_order_bp.route('/get_messages/<int:order_id>')
+@conditional(_messages_version)
+def get_messages(order_id):
+    distributor_id = session.get('distributor_id')
+    if not distributor_id:
+        return jsonify({'error': 'Not authenticated'}), 401
     
-    messages = cur.fetchall()
-    cur.close()
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        # Verify order belongs to distributor
+        if not _own_order(cur, order_id, distributor_id):
+            return jsonify({'error': 'Order not found'}), 404
+        
+        messages, has_more = _message_page(cur, order_id,
+                                           _message_cursor(request.args, 'since_message_id'),
+                                           _message_cursor(request.args, 'before_message_id'),
+                                           _page_limit(request.args))
+    finally:
+        cur.close()
     
-    # Format messages for JSON
-    formatted_messages = []
-    for msg in messages:
-        formatted_messages.append({
-            'message_id': msg['message_id'],
-            'message': msg['message'],
-            'message_type': msg['message_type'],
-            'created_at': msg['created_at'].strftime('%Y-%m-%d %H:%M:%S') if msg['created_at'] else '',
-            'is_from_admin': msg['admin_id'] is not None,
-            'is_read': msg['is_read']
-        })
+    return _page_response(messages, has_more)
+
+def _mark_order_read(cur, distributor_id, order_id, up_to_message_id=None, from_message_id=None):
+    """
+    Mark admin messages of one order read, optionally only those with ids
+    from_message_id..up_to_message_id (inclusive); returns how many
+    """
+    bounds, params = "", [order_id, distributor_id]
+    if from_message_id is not None:
+        bounds += " AND message_id >= %s"
+        params.append(from_message_id)
+    if up_to_message_id is not None:
+        bounds += " AND message_id <= %s"
+        params.append(up_to_message_id)
+    cur.execute(f"""
+        UPDATE messages 
+        SET is_read = 1 
+        WHERE order_id = %s 
+        AND distributor_id = %s 
+        AND admin_id IS NOT NULL
+        AND is_read = 0
+        {bounds}
+    """, params)
+    marked = cur.rowcount
+    mark_read(cur, distributor_id, order_id, marked)
+    return marked
+
+# Fetch new messages and mark them read in one round-trip
+@distributor_order_bp.route('/sync_messages/<int:order_id>', methods=['POST'])
+def sync_messages(order_id):
+    distributor_id = session.get('distributor_id')
+    if not distributor_id:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.get_json(silent=True) or request.form
+    since_id = _message_cursor(data, 'since_message_id')
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     
-    return jsonify({'messages': formatted_messages})
+    try:
+        if not _own_order(cur, order_id, distributor_id):
+            return jsonify({'error': 'Order not found'}), 404
+        
+        messages, has_more = _message_page(cur, order_id, since_id, limit=_page_limit(data))
+        # Only the messages returned here; newer pages and the older ones
+        # behind "load earlier" stay unread until the client shows them
+        marked = _mark_order_read(cur, distributor_id, order_id,
+                                  messages[-1]['message_id'], messages[0]['message_id']) if messages else 0
+        unread = unread_counts(cur, [distributor_id])[int(distributor_id)]
+        
+        mysql.connection.commit()
+        if marked:
+            # Other open pages of this distributor drop their badge too
+            publish_unread(cur, pubsub, [distributor_id])
+        return _page_response(messages, has_more, marked_read=marked, unread=unread)
+        
+    except Exception as e:
+        mysql.connection.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        cur.close()
 
 # NEW: Send message
 @distributor_order_bp.route('/send_message', methods=['POST'])
@@ -165,6 +448,8 @@ def send_message():
             (order_id, distributor_id, message, message_type, created_at, is_read)
             VALUES (%s, %s, %s, 'question', NOW(), 0)
         """, (order_id, distributor_id, message))
+        # Shows up in the admin inbox as awaiting a reply
+        record_question(cur, order_id, distributor_id, message)
         
         mysql.connection.commit()
         
@@ -180,26 +465,26 @@ def send_message():
         cur.close()
 
 # NEW: Mark messages as read
+# from_message_id / up_to_message_id limit it to the messages the client displayed
 @distributor_order_bp.route('/mark_messages_read/<int:order_id>', methods=['POST'])
 def mark_messages_read(order_id):
     distributor_id = session.get('distributor_id')
     if not distributor_id:
         return jsonify({'error': 'Not authenticated'}), 401
     
+    data = request.get_json(silent=True) or request.form
     cur = mysql.connection.cursor()
     
     try:
         # Mark admin messages as read for this order
-        cur.execute("""
-            UPDATE messages 
-            SET is_read = 1 
-            WHERE order_id = %s 
-            AND distributor_id = %s 
-            AND admin_id IS NOT NULL
-            AND is_read = 0
-        """, (order_id, distributor_id))
+        marked = _mark_order_read(cur, distributor_id, order_id,
+                                  _message_cursor(data, 'up_to_message_id'),
+                                  _message_cursor(data, 'from_message_id'))
         
         mysql.connection.commit()
+        if marked:
+            # Other open pages of this distributor drop their badge too
+            publish_unread(cur, pubsub, [distributor_id])
         return jsonify({'success': True})
         
     except Exception as e:
@@ -208,6 +493,89 @@ def mark_messages_read(order_id):
     finally:
         cur.close()
 
+# ── Carts: one order, many lines ────────────────────────────────────────────
+# Most lines one order may hold
+MAX_ORDER_LINES = 100
+
+_INSERT_ORDER_LINE = """
+    INSERT INTO order_items 
+    (order_id, product_id, category_id, product_name, category_name, 
+     unit_price, variant_size, quantity, subtotal)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _cart_from_form(form):
+    """
+    [(product_id, variant_size, quantity)] from the cart's repeated
+    product_id / variant_size / quantity fields. The same product and
+    variant twice becomes one line. Raises ValueError for a bad cart.
+    """
+    product_ids = form.getlist('product_id')
+    variants = form.getlist('variant_size')
+    quantities = form.getlist('quantity')
+    cart = {}
+    for i, product_id in enumerate(product_ids):
+        if not product_id:
+            continue
+        try:
+            product_id = int(product_id)
+            quantity = int(quantities[i]) if i < len(quantities) and quantities[i] else 1
+        except ValueError:
+            raise ValueError("Quantities must be whole numbers")
+        if quantity < 1:
+            raise ValueError("Quantities must be at least 1")
+        key = (product_id, (variants[i] if i < len(variants) else '').strip())
+        cart[key] = cart.get(key, 0) + quantity
+    if not cart:
+        raise ValueError("Add at least one product to the order")
+    if len(cart) > MAX_ORDER_LINES:
+        raise ValueError(f"An order can hold at most {MAX_ORDER_LINES} products")
+    return [(product_id, variant_size, quantity)
+            for (product_id, variant_size), quantity in cart.items()]
+
+def _price_cart(cur, cart):
+    """Order lines priced from the catalog (every product in one lookup) and their total."""
+    products = catalog.products_by_id(cur, [product_id for product_id, _variant, _quantity in cart])
+    lines, total = [], 0
+    for product_id, variant_size, quantity in cart:
+        product = products.get(product_id)
+        if not product:
+            raise ValueError(f"Product {product_id} not found")
+        subtotal = product['unit_price'] * quantity
+        lines.append({
+            'product_id': product_id,
+            'category_id': product['category_id'],
+            'product_name': product['product_name'],
+            'category_name': product['category_name'] or "Uncategorized",
+            'unit_price': product['unit_price'],
+            'variant_size': variant_size,
+            'quantity': quantity,
+            'subtotal': subtotal,
+        })
+        total += subtotal
+    return lines, total
+
+def _insert_lines(cur, order_id, lines):
+    if lines:
+        cur.executemany(_INSERT_ORDER_LINE, [
+            (order_id, line['product_id'], line['category_id'], line['product_name'],
+             line['category_name'], line['unit_price'], line['variant_size'],
+             line['quantity'], line['subtotal'])
+            for line in lines
+        ])
+
+def _editable_order(cur, order_id, distributor_id):
+    """The distributor's order while every line is still pending, else None."""
+    cur.execute("""
+        SELECT * FROM orders o
+        WHERE o.order_id = %s AND o.distributor_id = %s AND o.status = 'pending'
+        AND NOT EXISTS (
+            SELECT 1 FROM order_items oi
+            WHERE oi.order_id = o.order_id AND oi.status <> 'pending'
+        )
+    """, (order_id, distributor_id))
+    return cur.fetchone()
+
 # Route to add a new order
 @distributor_order_bp.route('/add_order', methods=["GET", "POST"])
 def add_order():
@@ -217,52 +585,27 @@ def add_order():
         return redirect(url_for('distributor_bp.login'))
 
     if request.method == "POST":
-        category_id = request.form.get("category_id")
-        product_id = request.form.get("product_id")
-        quantity = int(request.form.get("quantity", 1))
-        variant_size = request.form.get("variant_size", "")
+        try:
+            cart = _cart_from_form(request.form)
+        except ValueError as e:
+            flash(str(e), "error")
+            return redirect(url_for('distributor_order_bp.add_order'))
         
         cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
         
         try:
-            cur.execute("""
-                SELECT unit_price, product_name FROM products 
-                WHERE product_id = %s
-            """, (product_id,))
-            product = cur.fetchone()
-            
-            if not product:
-                flash("Product not found", "error")
-                return redirect(url_for('distributor_order_bp.add_order'))
-            
-            unit_price = product['unit_price']
-            product_name = product['product_name']
-            subtotal = unit_price * quantity
-            
-            cur.execute("""
-                SELECT category_name FROM category 
-                WHERE category_id = %s
-            """, (category_id,))
-            category = cur.fetchone()
-            category_name = category['category_name'] if category else "Uncategorized"
+            lines, total = _price_cart(cur, cart)
             
+            # Header, every line and the total in one transaction
             cur.execute("""
                 INSERT INTO orders (distributor_id, order_date, status, total_amount)
                 VALUES (%s, NOW(), 'pending', %s)
-            """, (distributor_id, subtotal))
+            """, (distributor_id, total))
             
-            order_id = cur.lastrowid
-            
-            cur.execute("""
-                INSERT INTO order_items 
-                (order_id, product_id, category_id, product_name, category_name, 
-                 unit_price, variant_size, quantity, subtotal)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (order_id, product_id, category_id, product_name, 
-                  category_name, unit_price, variant_size, quantity, subtotal))
+            _insert_lines(cur, cur.lastrowid, lines)
             
             mysql.connection.commit()
-            flash("Order requested successfully!", "success")
+            flash(f"Order requested successfully! ({len(lines)} product{'s' if len(lines) != 1 else ''})", "success")
             return redirect(url_for('distributor_order_bp.manage_orders'))
             
         except Exception as e:
@@ -273,11 +616,11 @@ def add_order():
             cur.close()
 
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("SELECT category_id, category_name FROM category ORDER BY category_name")
-    categories = cur.fetchall()
+    categories = catalog.categories(cur)
+    catalog_url = url_for('distributor_order_bp.catalog_json', v=catalog.document_etag(cur))
     cur.close()
     
-    return render_template('add_order.html', categories=categories)
+    return render_template('add_order.html', categories=categories, catalog_url=catalog_url)
 
 # Route to update an order
 @distributor_order_bp.route('/update_order/<int:order_id>', methods=["GET", "POST"])
@@ -289,11 +632,7 @@ def update_order(order_id):
 
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     
-    cur.execute("""
-        SELECT * FROM orders 
-        WHERE order_id = %s AND distributor_id = %s AND status = 'pending'
-    """, (order_id, distributor_id))
-    order = cur.fetchone()
+    order = _editable_order(cur, order_id, distributor_id)
     
     if not order:
         flash("Order cannot be updated or not found", "error")
@@ -301,52 +640,68 @@ def update_order(order_id):
         return redirect(url_for('distributor_order_bp.manage_orders'))
 
     if request.method == "POST":
-        category_id = request.form.get("category_id")
-        product_id = request.form.get("product_id")
-        quantity = int(request.form.get("quantity", 1))
-        variant_size = request.form.get("variant_size", "")
+        try:
+            cart = _cart_from_form(request.form)
+        except ValueError as e:
+            cur.close()
+            flash(str(e), "error")
+            return redirect(url_for('distributor_order_bp.update_order', order_id=order_id))
         
         try:
+            # Lock the order, then recheck its lines: the admin may have started on it
+            cur.execute("SELECT order_id FROM orders WHERE order_id = %s AND status = 'pending' FOR UPDATE",
+                        (order_id,))
+            locked = cur.fetchone()
             cur.execute("""
-                SELECT unit_price, product_name FROM products 
-                WHERE product_id = %s
-            """, (product_id,))
-            product = cur.fetchone()
-            
-            if not product:
-                flash("Product not found", "error")
-                return redirect(url_for('distributor_order_bp.update_order', order_id=order_id))
+                SELECT order_item_id, product_id, variant_size, quantity, unit_price, status
+                FROM order_items
+                WHERE order_id = %s
+                ORDER BY order_item_id
+                FOR UPDATE
+            """, (order_id,))
+            current = cur.fetchall()
+            if not locked or any(line['status'] != 'pending' for line in current):
+                mysql.connection.rollback()
+                flash("Order is already being processed and can no longer be changed", "error")
+                return redirect(url_for('distributor_order_bp.manage_orders'))
             
-            unit_price = product['unit_price']
-            product_name = product['product_name']
-            subtotal = unit_price * quantity
+            lines, total = _price_cart(cur, cart)
             
-            cur.execute("""
-                SELECT category_name FROM category 
-                WHERE category_id = %s
-            """, (category_id,))
-            category = cur.fetchone()
-            category_name = category['category_name'] if category else "Uncategorized"
+            # Only lines that differ are written
+            existing, removed = {}, []
+            for line in current:
+                key = (line['product_id'], line['variant_size'] or '')
+                if key in existing:
+                    removed.append(line['order_item_id'])
+                else:
+                    existing[key] = line
+            changed, added = [], []
+            for line in lines:
+                old = existing.pop((line['product_id'], line['variant_size']), None)
+                if old is None:
+                    added.append(line)
+                elif old['quantity'] != line['quantity'] or old['unit_price'] != line['unit_price']:
+                    changed.append((line['unit_price'], line['quantity'], line['subtotal'],
+                                    old['order_item_id']))
+            removed.extend(line['order_item_id'] for line in existing.values())
             
-            cur.execute("""
-                UPDATE orders 
-                SET total_amount = %s 
-                WHERE order_id = %s
-            """, (subtotal, order_id))
+            if removed:
+                cur.executemany("DELETE FROM order_items WHERE order_item_id = %s",
+                                [(order_item_id,) for order_item_id in sorted(removed)])
+            if changed:
+                cur.executemany("""
+                    UPDATE order_items 
+                    SET unit_price = %s, quantity = %s, subtotal = %s
+                    WHERE order_item_id = %s
+                """, changed)
+            _insert_lines(cur, order_id, added)
             
-            cur.execute("""
-                UPDATE order_items 
-                SET product_id = %s, 
-                    category_id = %s, 
-                    product_name = %s, 
-                    category_name = %s, 
-                    unit_price = %s, 
-                    variant_size = %s,
-                    quantity = %s, 
-                    subtotal = %s
-                WHERE order_id = %s
-            """, (product_id, category_id, product_name, category_name, 
-                  unit_price, variant_size, quantity, subtotal, order_id))
+            if total != order['total_amount']:
+                cur.execute("""
+                    UPDATE orders 
+                    SET total_amount = %s 
+                    WHERE order_id = %s
+                """, (total, order_id))
             
             mysql.connection.commit()
             flash("Order updated successfully!", "success")
@@ -362,29 +717,20 @@ def update_order(order_id):
     cur.execute("""
         SELECT * FROM order_items 
         WHERE order_id = %s
+        ORDER BY order_item_id
     """, (order_id,))
-    order_item = cur.fetchone()
+    items = cur.fetchall()
     
-    cur.execute("SELECT category_id, category_name FROM category ORDER BY category_name")
-    categories = cur.fetchall()
-    
-    current_category_id = order_item['category_id'] if order_item else None
-    products = []
-    if current_category_id:
-        cur.execute("""
-            SELECT product_id, product_name, unit_price 
-            FROM products 
-            WHERE category_id = %s
-        """, (current_category_id,))
-        products = cur.fetchall()
+    categories = catalog.categories(cur)
+    catalog_url = url_for('distributor_order_bp.catalog_json', v=catalog.document_etag(cur))
     
     cur.close()
     
     return render_template('update_order.html', 
                          order=order, 
-                         order_item=order_item, 
+                         items=items, 
                          categories=categories, 
-                         products=products)
+                         catalog_url=catalog_url)
 
 # Route to cancel an order
 @distributor_order_bp.route('/cancel_order/<int:order_id>', methods=["POST"])
@@ -397,17 +743,23 @@ def cancel_order(order_id):
     cur = mysql.connection.cursor()
     
     try:
+        # Only while no line has been accepted or rejected yet
         cur.execute("""
-            UPDATE orders 
-            SET status = 'cancelled' 
-            WHERE order_id = %s 
-            AND distributor_id = %s 
-            AND status = 'pending'
+            UPDATE orders o
+            SET o.status = 'cancelled' 
+            WHERE o.order_id = %s 
+            AND o.distributor_id = %s 
+            AND o.status = 'pending'
+            AND NOT EXISTS (
+                SELECT 1 FROM order_items oi
+                WHERE oi.order_id = o.order_id AND oi.status <> 'pending'
+            )
         """, (order_id, distributor_id))
         
         if cur.rowcount == 0:
             flash("Order cannot be cancelled or not found", "error")
         else:
+            cur.execute("UPDATE order_items SET status = 'cancelled' WHERE order_id = %s", (order_id,))
             mysql.connection.commit()
             flash("Order cancelled successfully", "success")
             
@@ -449,16 +801,29 @@ def order_details(order_id):
     
     return render_template('order_details.html', order=order, items=items)
 
+# Whole catalog for the order form's dropdowns, fetched once per catalog version
+@distributor_order_bp.route('/catalog.json', methods=['GET'])
+def catalog_json():
+    cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+    try:
+        return document_response(catalog, cur)
+    finally:
+        cur.close()
+
+def _catalog_version(*_args, **_kwargs):
+    """ETag validator for get_products"""
+    cur = mysql.connection.cursor()
+    try:
+        return catalog.version(cur)
+    finally:
+        cur.close()
+
 # Route to get products based on selected category
 @distributor_order_bp.route('/get_products/<category_id>', methods=['GET'])
+@conditional(_catalog_version)
 def get_products(category_id):
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-    cur.execute("""
-        SELECT product_id, product_name, unit_price 
-        FROM products 
-        WHERE category_id = %s
-    """, (category_id,))
-    products = cur.fetchall()
+    products = catalog.products_by_category(cur, category_id)
     cur.close()
     
     return jsonify({'products': products})
\ No newline at end of file
@@ -4,6 +4,8 @@ from werkzeug.security import generate_password_hash, check_password_hash
 import os
 import re
 
+from modules.common.search_index import record_search_change
+
 # ── Blueprint ─────────────────────────────────────────────────────────────────
 distributor_profile_bp = Blueprint(
     'distributor_profile_bp',
@@ -15,6 +17,7 @@ distributor_profile_bp = Blueprint(
 # Injected from app.py (same pattern as all other routes in this project)
 mysql  = None
 bcrypt = None
+search_index = None
 
 # ── Config ────────────────────────────────────────────────────────────────────
 UPLOAD_FOLDER  = 'static/uploads/distributors'
@@ -127,8 +130,10 @@ def edit_profile():
             province, contact_no, address,
             image_filename, session['distributor_id']
         ))
+        record_search_change(cursor, 'distributor', session['distributor_id'])
         mysql.connection.commit()
         cursor.close()
+        search_index.refresh('distributor', session['distributor_id'])
 
         session['distributor_name'] = distributor_name
         flash('Profile updated successfully!', 'success')
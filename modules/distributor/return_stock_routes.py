@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 import MySQLdb.cursors
 
+from modules.common.exports import export_response, iter_query
+
 mysql = None
 bcrypt = None
 
@@ -41,6 +43,44 @@ def return_stock():
     return render_template('return_stock.html', return_history=return_history)
 
 
+# ── Export history ────────────────────────────────────────────────────────────
+
+RETURN_EXPORT_COLUMNS = [
+    ('Return ID', 'return_id'),
+    ('Requested', 'created_at'),
+    ('Product ID', 'product_id'),
+    ('Product', 'product_name'),
+    ('Variant', 'variant_size'),
+    ('Quantity Returned', 'quantity_returned'),
+    ('Reason', 'reason'),
+    ('Status', 'status'),
+]
+
+
+@distributor_return_stock_bp.route('/return-stock/export', methods=['GET'])
+def export_returns():
+    distributor_id = get_distributor_id()
+    if not distributor_id:
+        return redirect(url_for('distributor_bp.login'))
+
+    query = """
+        SELECT sr.return_id, sr.created_at, sr.product_id, p.product_name,
+               sr.variant_size, sr.quantity_returned, sr.reason, sr.status
+        FROM stock_returns sr
+        JOIN products p ON sr.product_id = p.product_id
+        WHERE sr.distributor_id = %s
+    """
+    params = [distributor_id]
+    status = request.args.get('status', '').strip()
+    if status and status != 'all':
+        query += " AND sr.status = %s"
+        params.append(status)
+    query += " ORDER BY sr.created_at DESC, sr.return_id DESC"
+
+    return export_response(request.args.get('format', 'csv'), 'stock_returns', RETURN_EXPORT_COLUMNS,
+                           iter_query(mysql, query, params))
+
+
 # ── New return form page ──────────────────────────────────────────────────────
 
 @distributor_return_stock_bp.route('/return-stock/new', methods=['GET'])
@@ -1,10 +1,20 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 
+from modules.common.exports import export_response, iter_query
+from modules.common.http_cache import conditional
+from modules.common.search_index import record_search_change
+
 distributor_sell_bp = Blueprint('distributor_sell_bp', __name__,
                                  template_folder='templates')
 
 bcrypt = None
 mysql = None
+search_index = None
+catalog = None
+
+# Most product ids a search expands into for the IN (...) lookup; broader
+# searches fall back to LIKE on this distributor's sales
+SEARCH_LIMIT = 500
 
 # ── Helper ────────────────────────────────────────────────────────────────────
 
@@ -21,6 +31,46 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def _sales_filter_args():
+    return (request.args.get('search', '').strip(),
+            request.args.get('status', '').strip(),
+            request.args.get('date_from', '').strip(),
+            request.args.get('date_to', '').strip())
+
+def _sales_filters(distributor_id, search, status, date_from, date_to):
+    """WHERE clause (and params) for the manage_sales filters, shared with the export"""
+    where  = " WHERE s.distributor_id = %s"
+    params = [distributor_id]
+
+    if search:
+        # Resolve the text to product ids / customer names via the search
+        # index instead of scanning with LIKE '%...%'. Customer names are
+        # indexed per distributor, so all of this distributor's are used.
+        product_ids = search_index.search('product', search, SEARCH_LIMIT + 1)
+        customers   = search_index.search_customers(distributor_id, search)
+        matches = []
+        if len(product_ids) > SEARCH_LIMIT:
+            # Too broad for an IN list: the distributor filter bounds the scan
+            matches.append("s.product_name LIKE %s")
+            params.append(f"%{search}%")
+        elif product_ids:
+            matches.append(f"s.product_id IN ({', '.join(['%s'] * len(product_ids))})")
+            params += product_ids
+        if customers:
+            matches.append(f"s.customer_name IN ({', '.join(['%s'] * len(customers))})")
+            params += customers
+        where  += f" AND ({' OR '.join(matches)})" if matches else " AND 1 = 0"
+    if status:
+        where  += " AND s.status = %s"
+        params.append(status)
+    if date_from:
+        where  += " AND DATE(s.sale_date) >= %s"
+        params.append(date_from)
+    if date_to:
+        where  += " AND DATE(s.sale_date) <= %s"
+        params.append(date_to)
+    return where, params
+
 # ── List / Manage Sales ───────────────────────────────────────────────────────
 
 @distributor_sell_bp.route('/manage_sales')
@@ -29,10 +79,8 @@ def manage_sales():
     distributor_id = get_distributor_id()
     cur = mysql.connection.cursor()
 
-    search    = request.args.get('search', '').strip()
-    status    = request.args.get('status', '').strip()
-    date_from = request.args.get('date_from', '').strip()
-    date_to   = request.args.get('date_to', '').strip()
+    search, status, date_from, date_to = _sales_filter_args()
+    where, params = _sales_filters(distributor_id, search, status, date_from, date_to)
 
     query = """
         SELECT s.sale_id, s.product_name, s.quantity_sold, s.unit_price,
@@ -41,22 +89,7 @@ def manage_sales():
                s.variant_size, p.product_name AS cat_name
         FROM   sales s
         LEFT JOIN products p ON s.product_id = p.product_id
-        WHERE  s.distributor_id = %s
-    """
-    params = [distributor_id]
-
-    if search:
-        query  += " AND (s.product_name LIKE %s OR s.customer_name LIKE %s)"
-        params += [f'%{search}%', f'%{search}%']
-    if status:
-        query  += " AND s.status = %s"
-        params.append(status)
-    if date_from:
-        query  += " AND DATE(s.sale_date) >= %s"
-        params.append(date_from)
-    if date_to:
-        query  += " AND DATE(s.sale_date) <= %s"
-        params.append(date_to)
+    """ + where
 
     query += " ORDER BY s.sale_date DESC"
 
@@ -88,6 +121,37 @@ def manage_sales():
                            search=search, status=status,
                            date_from=date_from, date_to=date_to)
 
+# ── Export Sales ──────────────────────────────────────────────────────────────
+
+SALES_EXPORT_COLUMNS = [
+    ('Sale ID', 'sale_id'),
+    ('Sale Date', 'sale_date'),
+    ('Product ID', 'product_id'),
+    ('Product', 'product_name'),
+    ('Variant', 'variant_size'),
+    ('Quantity', 'quantity_sold'),
+    ('Unit Price', 'unit_price'),
+    ('Total', 'total_amount'),
+    ('Customer', 'customer_name'),
+    ('Contact', 'customer_contact'),
+    ('Status', 'status'),
+    ('Notes', 'notes'),
+]
+
+@distributor_sell_bp.route('/export_sales')
+@login_required
+def export_sales():
+    """Download the sales list, with the page's current filters, as CSV / XLSX"""
+    where, params = _sales_filters(get_distributor_id(), *_sales_filter_args())
+    query = """
+        SELECT s.sale_id, s.sale_date, s.product_id, s.product_name, s.variant_size,
+               s.quantity_sold, s.unit_price, s.total_amount,
+               s.customer_name, s.customer_contact, s.status, s.notes
+        FROM   sales s
+    """ + where + " ORDER BY s.sale_date DESC, s.sale_id DESC"
+    return export_response(request.args.get('format', 'csv'), 'sales', SALES_EXPORT_COLUMNS,
+                           iter_query(mysql, query, params))
+
 # ── Record New Sale ───────────────────────────────────────────────────────────
 
 @distributor_sell_bp.route('/sell_product', methods=['GET', 'POST'])
@@ -133,6 +197,7 @@ def sell_product():
             """, [distributor_id, ds_stock_id, stock[5], stock[1],
                   stock[4], quantity_sold, unit_price, total_amount,
                   customer_name, customer_contact, notes, status])
+            record_search_change(cur, 'sale', cur.lastrowid)
 
             # Deduct from distributor_stock (has distributor_id)
             cur.execute("""
@@ -143,6 +208,7 @@ def sell_product():
 
             mysql.connection.commit()
             cur.close()
+            search_index.add_customer(distributor_id, customer_name)
             flash(f'Sale recorded successfully! Total: LKR {total_amount:,.2f}', 'success')
             return redirect(url_for('distributor_sell_bp.manage_sales'))
 
@@ -168,8 +234,28 @@ def sell_product():
 
 # ── AJAX: Get stock details ───────────────────────────────────────────────────
 
+def _stock_details_version(stock_id):
+    """ETag validator for get_stock_details: the stock row plus the catalog version"""
+    distributor_id = get_distributor_id()
+    cur = mysql.connection.cursor()
+    try:
+        version = catalog.version(cur)
+        if version is None:
+            return None
+        cur.execute("""
+            SELECT last_updated, quantity, unit_price
+            FROM   distributor_stock
+            WHERE  stock_id = %s AND distributor_id = %s
+        """, [stock_id, distributor_id])
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    # Not this distributor's stock: let the view answer 404
+    return f"{distributor_id}:{version}:{row[0]}:{row[1]}:{row[2]}" if row else None
+
 @distributor_sell_bp.route('/get_stock_details/<int:stock_id>')
 @login_required
+@conditional(_stock_details_version)
 def get_stock_details(stock_id):
     distributor_id = get_distributor_id()
     cur = mysql.connection.cursor()
@@ -284,6 +370,7 @@ def update_sale(sale_id):
         """, [new_quantity, new_price, total_amount,
               customer_name, customer_contact, notes,
               status, sale_id, distributor_id])
+        record_search_change(cur, 'sale', sale_id)
 
         # Adjust distributor_stock
         cur.execute("""
@@ -293,6 +380,7 @@ def update_sale(sale_id):
         """, [qty_diff, sale[10], distributor_id])
 
         mysql.connection.commit()
+        search_index.add_customer(distributor_id, customer_name)
         cur.close()
         flash('Sale updated successfully!', 'success')
         return redirect(url_for('distributor_sell_bp.manage_sales'))
@@ -5,6 +5,8 @@ Handles distributor's personal inventory management
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 import MySQLdb
 from datetime import datetime
+from modules.common.http_cache import conditional
+from modules.common.order_acceptance import upsert_distributor_stock
 
 # Injected from app.py
 mysql = None
@@ -33,7 +35,8 @@ def get_distributor_stock(distributor_id):
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     
     try:
-        # Join with stock table to get product and category info
+        # Product / category names are copied onto distributor_stock
+        # (kept current by modules/common/name_sync.py)
         query = """
             SELECT 
                 ds.stock_id,
@@ -43,12 +46,10 @@ def get_distributor_stock(distributor_id):
                 ds.quantity,
                 ds.unit_price,
                 ds.last_updated,
-                COALESCE(s.product_name, 'Unknown Product') as product_name,
-                COALESCE(s.category_name, 'Uncategorized') as category_name,
+                COALESCE(ds.product_name, 'Unknown Product') as product_name,
+                COALESCE(ds.category_name, 'Uncategorized') as category_name,
                 (ds.quantity * ds.unit_price) as total_value
             FROM distributor_stock ds
-            LEFT JOIN stock s ON ds.product_id = s.product_id 
-                AND ds.variant_size = s.variant_size
             WHERE ds.distributor_id = %s
             ORDER BY ds.last_updated DESC
         """
@@ -101,45 +102,17 @@ def add_distributor_stock(distributor_id, product_id, variant_size, quantity, un
     """
     Add or update stock for a distributor
     If product+variant exists, add to existing quantity
-    Otherwise create new stock entry
+    Otherwise create new stock entry (one upsert on the unique key)
     """
     cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
     
     try:
-        # Check if this product+variant already exists for distributor
-        cur.execute("""
-            SELECT stock_id, quantity 
-            FROM distributor_stock 
-            WHERE distributor_id = %s 
-              AND product_id = %s 
-              AND variant_size = %s
-        """, (distributor_id, product_id, variant_size or ''))
-        
-        existing = cur.fetchone()
-        
-        if existing:
-            # Update existing stock - ADD to current quantity
-            new_quantity = existing['quantity'] + quantity
-            cur.execute("""
-                UPDATE distributor_stock 
-                SET quantity = %s,
-                    unit_price = %s,
-                    last_updated = NOW()
-                WHERE stock_id = %s
-            """, (new_quantity, unit_price, existing['stock_id']))
-            
-            mysql.connection.commit()
-            return True, f"Added {quantity} units. New total: {new_quantity}"
-        else:
-            # Insert new stock entry
-            cur.execute("""
-                INSERT INTO distributor_stock 
-                (distributor_id, product_id, variant_size, quantity, unit_price)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (distributor_id, product_id, variant_size or '', quantity, unit_price))
-            
-            mysql.connection.commit()
+        upsert_distributor_stock(cur, distributor_id, product_id, variant_size, quantity, unit_price)
+        mysql.connection.commit()
+        # rowcount is 1 for a new row, 2 when an existing one was updated
+        if cur.rowcount == 1:
             return True, f"New product added with {quantity} units"
+        return True, f"Added {quantity} units"
             
     except Exception as e:
         mysql.connection.rollback()
@@ -317,7 +290,28 @@ def update_stock(stock_id):
     
     return redirect(url_for('distributor_stock_bp.my_stock'))
 
+def _stock_status_version(product_id):
+    """ETag validator for api_stock_status: the row's last update, quantity and price"""
+    distributor_id = session.get('distributor_id')
+    if not distributor_id:
+        return None
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute("""
+            SELECT MAX(last_updated), SUM(quantity), MAX(unit_price)
+            FROM distributor_stock
+            WHERE distributor_id = %s
+              AND product_id = %s
+              AND variant_size = %s
+        """, (distributor_id, product_id, request.args.get('variant_size', '')))
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    # last_updated has 1s resolution: the values catch same-second updates
+    return f"{distributor_id}:{row[0]}:{row[1]}:{row[2]}"
+
 @distributor_stock_bp.route('/api/stock_status/<int:product_id>')
+@conditional(_stock_status_version)
 def api_stock_status(product_id):
     """API endpoint to check stock status for a product"""
     if not check_distributor_session():
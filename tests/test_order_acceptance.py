@@ -0,0 +1,187 @@
+"""
+Order acceptance against a fake cursor: FIFO depletion across stock
+batches, insufficient stock, batch pricing and the deadlock / lock wait
+retries. Run with ``python -m pytest tests``.
+"""
+import MySQLdb
+import pytest
+
+from modules.common import order_acceptance
+from modules.common.order_acceptance import AcceptError, accept_order_line, accept_order_lines
+
+
+class FakeCursor:
+    """Just enough of a DictCursor for the statements order_acceptance runs."""
+
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+        self._rows = []
+
+    def execute(self, query, params=()):
+        params = list(params or ())
+        self.db.statements.append(query)
+        if self.db.errors and 'FOR UPDATE' in query:
+            raise self.db.errors.pop(0)
+        self._rows, self.rowcount = [], 1
+        if 'FROM order_items oi' in query:
+            self._rows = [dict(self.db.lines[i]) for i in sorted(params) if i in self.db.lines]
+        elif 'FROM stock' in query and 'FOR UPDATE' in query:
+            keys = set(zip(params[0::2], params[1::2]))
+            self._rows = [dict(batch) for _id, batch in sorted(self.db.stock.items())
+                          if (batch['product_id'], batch['variant_size']) in keys
+                          and batch['quantity'] > 0]
+        elif query.startswith('UPDATE stock SET quantity = quantity - %s'):
+            take, stock_id = params
+            self.db.stock[stock_id]['quantity'] -= take
+        elif 'INSERT INTO distributor_stock' in query:
+            self.db.distributor_stock.append(params)
+        elif "status = 'accepted'" in query and 'UPDATE order_items' in query:
+            quantity, subtotal, order_item_id = params
+            self.db.lines[order_item_id].update(status='accepted', quantity=quantity, subtotal=subtotal)
+
+    def executemany(self, query, rows):
+        for row in rows:
+            self.execute(query, row)
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def close(self):
+        pass
+
+
+class FakeDb:
+    def __init__(self, stock, lines):
+        self.stock = {batch['stock_id']: batch for batch in stock}
+        self.lines = {line['order_item_id']: line for line in lines}
+        self.distributor_stock = []
+        self.statements = []
+        self.errors = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, cursorclass=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def _batch(stock_id, quantity, unit_price=10, variant_size='1kg'):
+    return {'stock_id': stock_id, 'product_id': 7, 'variant_size': variant_size,
+            'quantity': quantity, 'unit_price': unit_price}
+
+
+def _line(order_item_id, quantity, unit_price=12, variant_size='1kg'):
+    return {'order_item_id': order_item_id, 'order_id': 100 + order_item_id, 'product_id': 7,
+            'product_name': 'Honey', 'variant_size': variant_size, 'quantity': quantity,
+            'unit_price': unit_price, 'status': 'pending', 'distributor_id': 3,
+            'order_status': 'pending'}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(order_acceptance.time, 'sleep', lambda seconds: None)
+
+
+def test_accept_takes_oldest_batches_first():
+    db = FakeDb([_batch(1, 3, unit_price=9), _batch(2, 5), _batch(3, 4)], [_line(1, 6)])
+
+    result = accept_order_line(db, 1)
+
+    assert result['ok'] and result['quantity'] == 6
+    assert [db.stock[i]['quantity'] for i in (1, 2, 3)] == [0, 2, 4]
+    assert db.lines[1]['status'] == 'accepted'
+    assert db.commits == 1
+
+
+def test_accept_prices_at_the_first_batch_taken():
+    db = FakeDb([_batch(1, 0, unit_price=5), _batch(2, 5, unit_price=9)], [_line(1, 2, unit_price=12)])
+
+    result = accept_order_line(db, 1)
+
+    assert result['total'] == 18
+    assert db.lines[1]['subtotal'] == 18
+    distributor_id, variant_size, quantity, unit_price, product_id = db.distributor_stock[0]
+    assert (distributor_id, variant_size, quantity, unit_price, product_id) == (3, '1kg', 2, 9, 7)
+
+
+def test_accept_falls_back_to_the_line_price():
+    db = FakeDb([_batch(1, 5, unit_price=None)], [_line(1, 2, unit_price=12)])
+
+    assert accept_order_line(db, 1)['total'] == 24
+
+
+def test_accept_only_reads_the_lines_variant():
+    db = FakeDb([_batch(1, 5, variant_size='500g'), _batch(2, 1)], [_line(1, 2)])
+
+    with pytest.raises(AcceptError, match='Available: 1, Requested: 2'):
+        accept_order_line(db, 1)
+    assert db.stock[1]['quantity'] == 5
+
+
+def test_insufficient_stock_changes_nothing():
+    db = FakeDb([_batch(1, 2), _batch(2, 1)], [_line(1, 5)])
+
+    with pytest.raises(AcceptError, match='Insufficient stock'):
+        accept_order_line(db, 1)
+    assert [db.stock[i]['quantity'] for i in (1, 2)] == [2, 1]
+    assert db.lines[1]['status'] == 'pending'
+    assert (db.commits, db.rollbacks) == (0, 1)
+
+
+def test_already_accepted_line_is_refused():
+    line = _line(1, 1)
+    line['status'] = 'accepted'
+    db = FakeDb([_batch(1, 5)], [line])
+
+    with pytest.raises(AcceptError, match='already been accepted'):
+        accept_order_line(db, 1)
+    assert db.stock[1]['quantity'] == 5
+
+
+@pytest.mark.parametrize('code', [1213, 1205])
+def test_accept_retries_deadlocks_and_lock_waits(code):
+    db = FakeDb([_batch(1, 5)], [_line(1, 2)])
+    db.errors = [MySQLdb.OperationalError(code, 'try restarting transaction')] * 2
+
+    assert accept_order_line(db, 1)['ok']
+    assert db.stock[1]['quantity'] == 3
+    assert (db.commits, db.rollbacks) == (1, 2)
+
+
+def test_accept_gives_up_after_max_attempts():
+    db = FakeDb([_batch(1, 5)], [_line(1, 2)])
+    db.errors = [MySQLdb.OperationalError(1213, 'Deadlock found')] * order_acceptance.MAX_ATTEMPTS
+
+    with pytest.raises(MySQLdb.OperationalError):
+        accept_order_line(db, 1)
+    assert db.rollbacks == order_acceptance.MAX_ATTEMPTS
+    assert db.stock[1]['quantity'] == 5
+
+
+def test_other_errors_are_not_retried():
+    db = FakeDb([_batch(1, 5)], [_line(1, 2)])
+    db.errors = [MySQLdb.OperationalError(2013, 'Lost connection')]
+
+    with pytest.raises(MySQLdb.OperationalError):
+        accept_order_line(db, 1)
+    assert db.rollbacks == 1
+
+
+def test_bulk_accept_allocates_fifo_and_reports_shortfalls():
+    db = FakeDb([_batch(1, 3), _batch(2, 4)], [_line(1, 5), _line(2, 1), _line(3, 2)])
+
+    results = accept_order_lines(db, {1: None, 2: None, 3: None})
+
+    assert [r['ok'] for r in results] == [True, True, False]
+    assert 'Available: 1, Requested: 2' in results[2]['error']
+    assert [db.stock[i]['quantity'] for i in (1, 2)] == [0, 1]
+    assert db.commits == 1